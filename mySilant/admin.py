@@ -2,7 +2,8 @@ from django.contrib import admin
 
 from .models import (
     Equipment, Engine, Transmission, DrivingAxle, SteeringAxle, Client, ServiceCompany, MaintenanceCompany,
-    TypeMaintenance, RefusalNode, RecoveryMethod, Machine, Maintenance, Claim, MaintenanceAdmin, ClaimAdmin
+    TypeMaintenance, RefusalNode, RecoveryMethod, Machine, Maintenance, Claim, MachineAdmin, MaintenanceAdmin,
+    ClaimAdmin
 )
 
 admin.site.register(Equipment)
@@ -16,6 +17,6 @@ admin.site.register(MaintenanceCompany)
 admin.site.register(TypeMaintenance)
 admin.site.register(RefusalNode)
 admin.site.register(RecoveryMethod)
-admin.site.register(Machine)
+admin.site.register(Machine, MachineAdmin)
 admin.site.register(Maintenance, MaintenanceAdmin)
 admin.site.register(Claim, ClaimAdmin)
\ No newline at end of file
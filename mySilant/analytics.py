@@ -0,0 +1,114 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Avg, Count, Sum
+
+from .generations import get_generation, bump_generation, generation_cache_timeout
+from .models import Machine, Claim
+from .roles import scope_queryset
+
+# Время хранения рассчитанной аналитики в кэше (в секундах), по умолчанию - сутки.
+# При изменении машин, ТО и рекламаций кэш сбрасывается сменой поколения
+# (только с общим для процессов кэшем, см. generation_cache_timeout)
+ANALYTICS_CACHE_TIMEOUT = generation_cache_timeout(
+    getattr(settings, 'SILANT_ANALYTICS_CACHE_TIMEOUT', 60 * 60 * 24)
+)
+
+# Модели узлов машины, по которым группируется надежность: ключ в ответе -> поле машины
+COMPONENTS = {
+    'equipment': 'model_equipment',
+    'engine': 'model_engine',
+    'transmission': 'model_transmission',
+    'driving_axle': 'model_driving_axle',
+    'steering_axle': 'model_steering_axle',
+}
+
+
+def invalidate_reliability():
+    """
+    Сбрасывает закэшированную аналитику всех ролей
+    """
+    bump_generation('analytics')
+
+
+def _row(pk, title, machines, operating_time, failures, mean_downtime):
+    return {
+        'id': pk,
+        'title': title,
+        'machines': machines,
+        'failures': failures,
+        'operating_time': operating_time,
+        # Средняя наработка на отказ: наработка машин группы, деленная на число отказов
+        'mtbf': round(operating_time / failures, 1) if failures else None,
+        'mean_downtime': round(mean_downtime, 1) if mean_downtime is not None else None,
+    }
+
+
+def _by_mtbf(row):
+    # По возрастанию наработки на отказ (наименее надежные - первыми), группы без отказов - в конце
+    return row['mtbf'] is None, row['mtbf'] or 0, row['title']
+
+
+def _components(machines, claims):
+    # Отказы модели узла - все рекламации машин с этой моделью, какой бы узел ни отказал: рекламация не указывает
+    # модель отказавшего узла, поэтому это надежность машин в комплектации с моделью, а не самой модели узла
+    result = {}
+    for name, field in COMPONENTS.items():
+        fleet = machines.order_by().values(field, f'{field}__title').annotate(
+            machine_count=Count('pk'), operating_time=Sum('summary__operating_time'),
+        )
+        failures = {
+            row[f'machine__{field}']: row
+            for row in claims.order_by().values(f'machine__{field}').annotate(
+                failure_count=Count('pk'), mean_downtime=Avg('downtime'),
+            )
+        }
+        rows = []
+        for group in fleet:
+            failure = failures.get(group[field], {})
+            rows.append(_row(
+                group[field], group[f'{field}__title'], group['machine_count'], group['operating_time'] or 0,
+                failure.get('failure_count', 0), failure.get('mean_downtime'),
+            ))
+        result[name] = sorted(rows, key=_by_mtbf)
+    return result
+
+
+def _refusal_nodes(machines, claims):
+    # Каждый узел есть на всех машинах, поэтому наработка - общая наработка машин
+    fleet = machines.order_by().aggregate(machine_count=Count('pk'), operating_time=Sum('summary__operating_time'))
+    rows = [
+        _row(
+            row['refusal_node'], row['refusal_node__title'], fleet['machine_count'], fleet['operating_time'] or 0,
+            row['failure_count'], row['mean_downtime'],
+        )
+        for row in claims.order_by().values('refusal_node', 'refusal_node__title').annotate(
+            failure_count=Count('pk'), mean_downtime=Avg('downtime'),
+        )
+    ]
+    return sorted(rows, key=_by_mtbf)
+
+
+def compute_reliability(role):
+    """
+    Надежность по моделям узлов машины и по узлам отказа: число отказов, средняя наработка на отказ (м/час)
+    и средний простой (дней). Считается в базе запросами с группировкой по машинам и рекламациям, доступным роли
+    """
+    machines = scope_queryset(Machine.objects.all(), role)
+    claims = scope_queryset(Claim.objects.all(), role)
+    return {
+        'components': _components(machines, claims),
+        'refusal_nodes': _refusal_nodes(machines, claims),
+    }
+
+
+def get_reliability(role):
+    """
+    Аналитика надежности из кэша: ключ - поколение данных и область видимости роли
+    """
+    generation = get_generation('analytics')
+    key = f'silant:analytics:reliability:{generation}:{role.role}:{role.client_id}:{role.service_company_id}'
+    result = cache.get(key)
+    if result is None:
+        result = compute_reliability(role)
+        cache.set(key, result, ANALYTICS_CACHE_TIMEOUT)
+    return result
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class MysilantConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'mySilant'
+
+    def ready(self):
+        # Подключаем обработчики сигналов и проверки настроек
+        from . import signals  # noqa: F401
+        from . import checks  # noqa: F401
@@ -0,0 +1,89 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import namedtuple
+
+from django.conf import settings
+from django.db.models import Q
+
+from .models import Machine, MAX_ID, normalize_number_machine
+from .references import REFERENCE_MODELS
+from .roles import scope_queryset
+
+# Вариантов на странице подсказок, если не задан ?page_size=, и наибольшее число вариантов на странице
+AUTOCOMPLETE_PAGE_SIZE = getattr(settings, 'SILANT_AUTOCOMPLETE_PAGE_SIZE', 20)
+AUTOCOMPLETE_MAX_PAGE_SIZE = 100
+
+# Источник подсказок: модель, поле сортировки и курсора, поле подписи, ограничивать ли записи ролью
+Source = namedtuple('Source', ['model', 'field', 'label', 'scoped'])
+
+# Источники: машины - по индексу нормализованного заводского номера в пределах роли, справочники - по названию
+AUTOCOMPLETE_SOURCES = {
+    'machine': Source(Machine, 'number_machine_normalized', 'number_machine', True),
+    **{name: Source(model, 'title', 'title', False) for name, model in REFERENCE_MODELS.items()},
+}
+
+
+def _search(source, text):
+    # Машины - по началу номера, диапазоном по индексу (как в MachinePreviewFilter); справочники невелики -
+    # по вхождению в название. SQLite не учитывает регистр только для латиницы, поэтому кириллица ищется
+    # в нескольких написаниях ("ооо", "ООО", "Ооо")
+    if source.model is Machine:
+        number = normalize_number_machine(text)
+        return Q(number_machine_normalized__gte=number, number_machine_normalized__lt=number + chr(0x10FFFF))
+    condition = Q()
+    for variant in {text, text.lower(), text.upper(), text.capitalize()}:
+        condition |= Q(title__icontains=variant)
+    return condition
+
+
+def _after(source, cursor):
+    """
+    Условие "после курсора": варианты упорядочены по (поле сортировки, id)
+    """
+    if cursor is None:
+        return Q()
+    key, cursor_id = cursor
+    return Q(**{f'{source.field}__gt': key}) | Q(**{source.field: key, 'id__gt': cursor_id})
+
+
+def encode_cursor(key, pk):
+    return urlsafe_b64encode(json.dumps([key, pk], separators=(',', ':')).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(encoded):
+    """
+    (значение поля сортировки, id) из курсора; ValueError - если курсор некорректен
+    """
+    try:
+        key, pk = json.loads(urlsafe_b64decode(encoded.encode('ascii')))
+        pk = int(pk)
+        if not isinstance(key, str) or not 0 < pk <= MAX_ID:
+            raise TypeError
+        return key, pk
+    except (TypeError, ValueError, UnicodeEncodeError, AttributeError):
+        raise ValueError('Некорректный курсор')
+
+
+def autocomplete_queryset(source, role, text=''):
+    """
+    Записи источника, доступные роли и подходящие под введенный текст, в порядке (поле сортировки, id)
+    """
+    queryset = source.model.objects.all()
+    if source.scoped:
+        queryset = scope_queryset(queryset, role)
+    if text:
+        queryset = queryset.filter(_search(source, text))
+    return queryset.order_by(source.field, 'id')
+
+
+def get_autocomplete_page(source, role, text, encoded_cursor, page_size):
+    """
+    Страница подсказок: варианты (id и подпись) и курсор следующей страницы (None - страница последняя).
+    Из базы читаются только id, поле сортировки и подпись
+    """
+    cursor = decode_cursor(encoded_cursor) if encoded_cursor else None
+    queryset = autocomplete_queryset(source, role, text).filter(_after(source, cursor))
+    rows = list(queryset.values_list('id', source.field, source.label)[:page_size + 1])
+    results = [{'id': pk, 'text': label} for pk, key, label in rows[:page_size]]
+    next_cursor = encode_cursor(rows[page_size - 1][1], rows[page_size - 1][0]) if len(rows) > page_size else None
+    return results, next_cursor
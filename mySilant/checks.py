@@ -0,0 +1,52 @@
+from django.core.checks import Error, Tags, Warning, register
+from django.db import connections
+
+from .generations import is_shared_cache
+from .search import CLAIM_FTS_TABLE, CLAIM_FTS_TRIGGERS
+
+
+@register()
+def shared_cache_check(app_configs, **kwargs):
+    """
+    Сброс закэшированных ролей и смена поколений данных выполняются в том процессе, который изменил запись, -
+    остальным процессам сервера они видны только через общий кэш
+    """
+    if is_shared_cache():
+        return []
+    return [Warning(
+        'Кэш по умолчанию (CACHES) не общий для процессов сервера',
+        hint='Задайте SILANT_REDIS_URL (Redis) или Memcached в CACHES. С LocMemCache роли пользователей хранятся '
+             'в кэше не дольше нескольких секунд, а кэши на поколениях данных (таблицы списков, аналитика, '
+             'справочники, хронология машин) отключены',
+        id='mySilant.W001',
+    )]
+
+
+@register(Tags.database)
+def claim_search_triggers_check(app_configs, databases=None, **kwargs):
+    """
+    Индекс поиска рекламаций в SQLite обновляют триггеры. Пересоздание таблицы рекламаций миграцией (в SQLite так
+    выполняются AlterField, RemoveField и др.) удаляет их молча - поиск перестает видеть новые и измененные рекламации
+    """
+    errors = []
+    for alias in databases or []:
+        connection = connections[alias]
+        if connection.vendor != 'sqlite':
+            continue
+        names = (CLAIM_FTS_TABLE, *CLAIM_FTS_TRIGGERS)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT name FROM sqlite_master WHERE name IN ({", ".join(["%s"] * len(names))})', names
+            )
+            found = {name for name, in cursor.fetchall()}
+        if CLAIM_FTS_TABLE not in found:
+            continue  # миграция 0005_claim_search еще не применена
+        missing = [name for name in CLAIM_FTS_TRIGGERS if name not in found]
+        if missing:
+            errors.append(Error(
+                f'Нет триггеров индекса поиска рекламаций в базе {alias}: {", ".join(missing)}',
+                hint='Таблицу рекламаций пересоздала миграция. Добавьте после нее миграцию, которая заново создает '
+                     'триггеры из 0005_claim_search и перестраивает индекс (INSERT ... VALUES (\'rebuild\'))',
+                id='mySilant.E001',
+            ))
+    return errors
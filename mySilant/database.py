@@ -0,0 +1,77 @@
+import functools
+import random
+import time
+
+from django.conf import settings
+from django.db import OperationalError, connections, router, transaction
+
+
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    """
+    Настраивает каждое новое соединение с SQLite в производственном режиме (SILANT_SQLITE_PRODUCTION)
+    """
+    if connection.vendor != 'sqlite' or not getattr(settings, 'SILANT_SQLITE_PRODUCTION', False):
+        return
+    with connection.cursor() as cursor:
+        for name, value in getattr(settings, 'SILANT_SQLITE_PRAGMAS', {}).items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def is_lock_error(error):
+    # SQLite: "database is locked", "database table is locked"
+    return isinstance(error, OperationalError) and 'locked' in str(error)
+
+
+def retry_on_lock(func, *args, using='default', **kwargs):
+    """
+    Выполняет запись в отдельной транзакции и при блокировке базы повторяет ее с растущей задержкой
+    (не более SILANT_DB_LOCK_RETRIES попыток). Внутри внешней транзакции повтор невозможен - запись выполняется
+    один раз, ошибку обрабатывает внешний код
+    """
+    if connections[using].in_atomic_block:
+        return func(*args, **kwargs)
+    attempts = getattr(settings, 'SILANT_DB_LOCK_RETRIES', 10)
+    delay = getattr(settings, 'SILANT_DB_LOCK_RETRY_DELAY', 0.05)
+    max_delay = getattr(settings, 'SILANT_DB_LOCK_RETRY_MAX_DELAY', 0.5)
+    for attempt in range(1, attempts + 1):
+        try:
+            with transaction.atomic(using=using):
+                return func(*args, **kwargs)
+        except OperationalError as error:
+            if not is_lock_error(error) or attempt == attempts:
+                raise
+        # Случайная часть задержки - чтобы одновременно ожидавшие записи не повторялись одновременно
+        time.sleep(delay * random.uniform(0.5, 1.0))
+        delay = min(delay * 2, max_delay)
+
+
+def lock_retry(method):
+    """
+    Декоратор save и delete модели: запись с повтором при блокировке базы (retry_on_lock).
+    Перед повтором восстанавливает состояние объекта, измененное откатившейся попыткой.
+    Повторяет только запись без внешней транзакции (формы сайта, API). Внутри transaction.atomic запись
+    выполняется один раз - повторять нужно всю транзакцию, как LockRetryAdminMixin в админке
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        pk, adding = self.pk, self._state.adding
+
+        def attempt():
+            self.pk, self._state.adding = pk, adding
+            return method(self, *args, **kwargs)
+
+        return retry_on_lock(attempt, using=using)
+    return wrapper
+
+
+class LockRetryAdminMixin:
+    """
+    Для ModelAdmin: админка сохраняет и удаляет записи в своей транзакции, где lock_retry не повторяет запись, -
+    поэтому при блокировке базы повторяется вся транзакция формы изменения и удаления
+    """
+    def changeform_view(self, request, *args, **kwargs):
+        return retry_on_lock(super().changeform_view, request, *args, using=router.db_for_write(self.model), **kwargs)
+
+    def delete_view(self, request, *args, **kwargs):
+        return retry_on_lock(super().delete_view, request, *args, using=router.db_for_write(self.model), **kwargs)
@@ -0,0 +1,117 @@
+import csv
+import datetime
+import json
+
+from django.conf import settings
+
+# Количество строк, которые выбираются из базы за один раз при выгрузке
+EXPORT_CHUNK_SIZE = getattr(settings, 'SILANT_EXPORT_CHUNK_SIZE', 2000)
+
+# Колонки выгрузок: имя колонки -> поле запроса. Имена колонок совпадают с полями загрузки import_data,
+# справочники выгружаются по названию, машина - по заводскому номеру
+MACHINE_EXPORT_COLUMNS = {
+    'number_machine': 'number_machine',
+    'model_equipment': 'model_equipment__title',
+    'model_engine': 'model_engine__title',
+    'number_engine': 'number_engine',
+    'model_transmission': 'model_transmission__title',
+    'number_transmission': 'number_transmission',
+    'model_driving_axle': 'model_driving_axle__title',
+    'number_driving_axle': 'number_driving_axle',
+    'model_steering_axle': 'model_steering_axle__title',
+    'number_steering_axle': 'number_steering_axle',
+    'supply_contract': 'supply_contract',
+    'shipment_date': 'shipment_date',
+    'end_consumer': 'end_consumer',
+    'shipping_address': 'shipping_address',
+    'options': 'options',
+    'client': 'client__title',
+    'service_company': 'service_company__title',
+}
+
+MAINTENANCE_EXPORT_COLUMNS = {
+    'machine': 'machine__number_machine',
+    'type': 'type__title',
+    'maintenance_date': 'maintenance_date',
+    'operating_time': 'operating_time',
+    'order_number': 'order_number',
+    'order_date': 'order_date',
+    'maintenance_company': 'maintenance_company__title',
+    'service_company': 'service_company__title',
+}
+
+CLAIM_EXPORT_COLUMNS = {
+    'machine': 'machine__number_machine',
+    'refusal_date': 'refusal_date',
+    'operating_time': 'operating_time',
+    'refusal_node': 'refusal_node__title',
+    'refusal_description': 'refusal_description',
+    'recovery_method': 'recovery_method__title',
+    'repair_parts': 'repair_parts',
+    'recovery_date': 'recovery_date',
+    'downtime': 'downtime',
+    'service_company': 'service_company__title',
+}
+
+
+# Начала значений, которые табличные редакторы выполняют как формулу (CSV/formula injection). В CSV перед таким
+# значением ставится апостроф - ячейка выводится текстом. Апостроф в начале значения тоже экранируется, чтобы
+# import_data однозначно снимал экранирование и выгрузка загружалась обратно без изменений
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+ESCAPED_PREFIXES = (*FORMULA_PREFIXES, "'")
+
+
+def escape_formula(value):
+    if isinstance(value, str) and value.startswith(ESCAPED_PREFIXES):
+        return "'" + value
+    return value
+
+
+def unescape_formula(value):
+    if isinstance(value, str) and value.startswith("'") and value[1:].startswith(ESCAPED_PREFIXES):
+        return value[1:]
+    return value
+
+
+class Echo:
+    """
+    Объект с интерфейсом файла для csv.writer: возвращает записанную строку, а не сохраняет ее
+    """
+    def write(self, value):
+        return value
+
+
+def export_rows(queryset, columns):
+    """
+    Строки выгрузки одним запросом с соединением справочников, без создания объектов моделей.
+    Результат читается из базы частями по EXPORT_CHUNK_SIZE строк
+    """
+    return queryset.values_list(*columns.values()).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def stream_csv(rows, columns):
+    # BOM - чтобы Excel правильно определил кодировку UTF-8
+    yield '\ufeff'
+    writer = csv.writer(Echo())
+    yield writer.writerow(list(columns))
+    for row in rows:
+        yield writer.writerow([escape_formula(value) for value in row])
+
+
+def _json_default(value):
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} не сериализуется в JSON')
+
+
+def stream_jsonl(rows, columns):
+    names = list(columns)
+    for row in rows:
+        yield json.dumps(dict(zip(names, row)), ensure_ascii=False, default=_json_default) + '\n'
+
+
+# Форматы выгрузки: генератор строк, тип содержимого, расширение файла
+EXPORT_FORMATS = {
+    'csv': (stream_csv, 'text/csv; charset=utf-8', 'csv'),
+    'jsonl': (stream_jsonl, 'application/x-ndjson; charset=utf-8', 'jsonl'),
+}
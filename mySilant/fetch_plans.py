@@ -0,0 +1,137 @@
+from collections import namedtuple
+
+from .serializers import MachineSerializer, MachinePublicSerializer, MaintenanceSerializer, ClaimSerializer
+
+# План выборки: связанные объекты, загружаемые одним запросом (select_related),
+# и поля, которые реально выводятся в шаблоне или сериализаторе (only)
+FetchPlan = namedtuple('FetchPlan', ['select_related', 'only'], defaults=[(), ()])
+
+
+def apply_fetch_plan(queryset, plan):
+    """
+    Применяет план выборки к queryset
+    """
+    if plan is None:
+        return queryset
+    if plan.select_related:
+        queryset = queryset.select_related(*plan.select_related)
+    if plan.only:
+        queryset = queryset.only(*plan.only)
+    return queryset
+
+
+def fieldset_fetch_plan(plan, fieldset, keep=()):
+    """
+    Ограничивает план выборки API выводимыми полями (?fields=, ?omit=) и полями из keep,
+    которые нужны постраничному выводу
+    """
+    plan = plan or FetchPlan()
+    if fieldset is None or not plan.only:
+        return plan
+    only = tuple(field for field in plan.only if field.split('__')[0] in fieldset or field in keep)
+    return FetchPlan(select_related=plan.select_related, only=only or ('id',))
+
+
+def expand_fetch_plan(plan, serializer_class, expand):
+    """
+    Дополняет план выборки API развернутыми связанными объектами (?expand=): они загружаются тем же запросом,
+    что и страница, и только с выводимыми полями
+    """
+    plan = plan or FetchPlan()
+    if not expand:
+        return plan
+    related_fields = tuple(
+        f'{name}__{field}' for name in expand for field in serializer_class.expandable_fields[name]().fields
+    )
+    return FetchPlan(
+        select_related=plan.select_related + tuple(expand),
+        only=plan.only + related_fields if plan.only else (),
+    )
+
+
+# Технические характеристики машины, доступные незарегистрированным пользователям
+MACHINE_PUBLIC_FIELDS = (
+    'number_machine',
+    'model_equipment__title',
+    'model_engine__title',
+    'number_engine',
+    'model_transmission__title',
+    'number_transmission',
+    'model_driving_axle__title',
+    'number_driving_axle',
+    'model_steering_axle__title',
+    'number_steering_axle',
+)
+
+# Таблица машин для незарегистрированных пользователей (machines.html)
+MACHINE_PREVIEW_PLAN = FetchPlan(
+    select_related=('model_equipment', 'model_engine', 'model_transmission', 'model_driving_axle',
+                    'model_steering_axle'),
+    only=MACHINE_PUBLIC_FIELDS,
+)
+
+# Таблица машин (machines.html)
+MACHINE_LIST_PLAN = FetchPlan(
+    select_related=MACHINE_PREVIEW_PLAN.select_related + ('client', 'service_company'),
+    only=MACHINE_PUBLIC_FIELDS + (
+        'supply_contract',
+        'shipment_date',
+        'client__title',
+        'end_consumer',
+        'shipping_address',
+        'options',
+        'service_company__title',
+    ),
+)
+
+# Карточка машины (machine.html) - выводятся также описания справочников и сводка по машине
+MACHINE_DETAIL_PLAN = FetchPlan(
+    select_related=MACHINE_LIST_PLAN.select_related + ('summary', 'summary__last_maintenance_type'),
+)
+
+# Таблица ТО (maintenances.html)
+MAINTENANCE_LIST_PLAN = FetchPlan(
+    select_related=('machine', 'type', 'maintenance_company', 'service_company'),
+    only=(
+        'maintenance_date',
+        'machine__number_machine',
+        'type__title',
+        'operating_time',
+        'order_number',
+        'order_date',
+        'maintenance_company__title',
+        'service_company__title',
+    ),
+)
+
+# Карточка ТО (maintenance.html)
+MAINTENANCE_DETAIL_PLAN = FetchPlan(select_related=MAINTENANCE_LIST_PLAN.select_related)
+
+# Таблица рекламаций (claims.html)
+CLAIM_LIST_PLAN = FetchPlan(
+    select_related=('machine', 'refusal_node', 'recovery_method', 'service_company'),
+    only=(
+        'refusal_date',
+        'machine__number_machine',
+        'operating_time',
+        'refusal_node__title',
+        'refusal_description',
+        'recovery_method__title',
+        'repair_parts',
+        'recovery_date',
+        'downtime',
+        'service_company__title',
+    ),
+)
+
+# Карточка рекламации (claim.html)
+CLAIM_DETAIL_PLAN = FetchPlan(select_related=CLAIM_LIST_PLAN.select_related)
+
+# Удаление ТО и рекламации - в шаблоне выводится машина
+MACHINE_LINK_PLAN = FetchPlan(select_related=('machine',))
+
+# API: сериализаторы выводят только собственные поля записи и id связанных объектов
+MACHINE_API_PLAN = FetchPlan(only=tuple(MachineSerializer.Meta.fields))
+MACHINE_PUBLIC_API_PLAN = FetchPlan(only=tuple(MachinePublicSerializer.Meta.fields))
+MAINTENANCE_API_PLAN = FetchPlan(only=tuple(MaintenanceSerializer.Meta.fields))
+CLAIM_API_PLAN = FetchPlan(only=tuple(ClaimSerializer.Meta.fields))
@@ -1,62 +1,213 @@
+import datetime
+
 import django_filters
-from django_filters import FilterSet, ModelChoiceFilter
+from django import forms
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django_filters import FilterSet, ModelMultipleChoiceFilter
 
 from .models import *
+from .search import search_claims
+
+
+# Список значений из ?field=1,3 (API) и из ?field=1&field=3 (html-форма)
+class CSVSelectMultiple(forms.SelectMultiple):
+    def value_from_datadict(self, data, files, name):
+        values = super().value_from_datadict(data, files, name)
+        if values is None:
+            return []
+        if isinstance(values, str):
+            values = [values]
+        return [value for item in values for value in item.split(',') if value]
+
+
+# Поле со списком id: справочник нужен только для вывода вариантов в форме, значения не ищутся в базе
+class IdListField(forms.ModelMultipleChoiceField):
+    widget = CSVSelectMultiple
+
+    def clean(self, value):
+        try:
+            ids = [int(item) for item in value or []]
+        except (TypeError, ValueError):
+            raise ValidationError('Укажите id через запятую', code='invalid_pk_value')
+        # id вне диапазона ключей база не может даже сравнить (OverflowError)
+        if any(not 0 < pk <= MAX_ID for pk in ids):
+            raise ValidationError('Укажите id через запятую', code='invalid_pk_value')
+        return ids
+
+
+# Фильтр по id связанной записи (один или несколько через запятую), без соединения со справочником
+class IdInFilter(ModelMultipleChoiceFilter):
+    field_class = IdListField
+
+    def filter(self, qs, value):
+        if not value:
+            return qs
+        return qs.filter(**{f'{self.field_name}__in': value})
+
+
+# Сортировка по выбранным полям, затем по id: порядок записей с одинаковыми значениями однозначен,
+# страницы не пересекаются
+class StableOrderingFilter(django_filters.OrderingFilter):
+    def filter(self, qs, value):
+        qs = super().filter(qs, value)
+        if value:
+            qs = qs.order_by(*qs.query.order_by, 'id')
+        return qs
 
 
 # Для фильтрации по таблице с машинами
 class MachineFilter(FilterSet):
     # Для организации фильтрации по модели техники
-    model_equipment = ModelChoiceFilter(
-        field_name='model_equipment__title',
+    model_equipment = IdInFilter(
+        field_name='model_equipment_id',
         queryset=Equipment.objects.all(),
         label='Модель техники',
     )
 
     # Для организации фильтрации по модели двигателя
-    model_engine = ModelChoiceFilter(
-        field_name='model_engine__title',
+    model_engine = IdInFilter(
+        field_name='model_engine_id',
         queryset=Engine.objects.all(),
         label='Модель двигателя',
     )
 
     # Для организации фильтрации по модели трансмиссии
-    model_transmission = ModelChoiceFilter(
-        field_name='model_transmission__title',
+    model_transmission = IdInFilter(
+        field_name='model_transmission_id',
         queryset=Transmission.objects.all(),
         label='Модель трансмиссии',
     )
 
     # Для организации фильтрации по модели ведущего моста
-    model_driving_axle = ModelChoiceFilter(
-        field_name='model_driving_axle__title',
+    model_driving_axle = IdInFilter(
+        field_name='model_driving_axle_id',
         queryset=DrivingAxle.objects.all(),
         label='Модель вед. моста',
     )
 
     # Для организации фильтрации по модели управляемого моста
-    model_steering_axle = ModelChoiceFilter(
-        field_name='model_steering_axle__title',
+    model_steering_axle = IdInFilter(
+        field_name='model_steering_axle_id',
         queryset=SteeringAxle.objects.all(),
         label='Модель упр. моста',
     )
 
+    # Машины, у которых по прогнозу (MaintenanceForecast) ТО какого-либо вида наступает в ближайшие N дней или уже
+    # просрочено
+    due_soon = django_filters.NumberFilter(
+        method='filter_due_soon',
+        min_value=0,
+        max_value=3650,
+        label='ТО в ближайшие, дней',
+    )
+
+    # Отбор и сортировка по сводке машины (MachineSummary): по ее индексированным столбцам, без соединения с ТО
+    # и рекламациями и без агрегатов
+    open_claims = django_filters.BooleanFilter(
+        method='filter_open_claims',
+        label='Есть открытые рекламации',
+    )
+
+    min_claims = django_filters.NumberFilter(
+        field_name='summary__claim_count',
+        lookup_expr='gte',
+        min_value=0,
+        max_value=MAX_ID,
+        label='Рекламаций не меньше',
+    )
+
+    min_operating_time = django_filters.NumberFilter(
+        field_name='summary__operating_time',
+        lookup_expr='gte',
+        min_value=0,
+        max_value=MAX_ID,
+        label='Наработка от, м/час',
+    )
+
+    # Машины без ТО с указанной даты (в том числе без ТО вовсе)
+    no_maintenance_since = django_filters.DateFilter(
+        method='filter_no_maintenance_since',
+        label='Без ТО с даты',
+    )
+
+    ordering = StableOrderingFilter(
+        fields=(
+            ('shipment_date', 'shipment_date'),
+            ('summary__last_maintenance_date', 'last_maintenance_date'),
+            ('summary__operating_time', 'operating_time'),
+            ('summary__claim_count', 'claim_count'),
+        ),
+        field_labels={
+            'shipment_date': 'Дата отгрузки',
+            'summary__last_maintenance_date': 'Дата последнего ТО',
+            'summary__operating_time': 'Наработка',
+            'summary__claim_count': 'Количество рекламаций',
+        },
+        label='Сортировка',
+    )
+
+    def filter_open_claims(self, queryset, name, value):
+        # Рекламация открыта, пока не наступила дата восстановления (MachineSummary.has_open_claims)
+        open_claims = Q(summary__last_recovery_date__gt=datetime.date.today())
+        return queryset.filter(open_claims) if value else queryset.exclude(open_claims)
+
+    def filter_no_maintenance_since(self, queryset, name, value):
+        return queryset.filter(
+            Q(summary__last_maintenance_date__lt=value) | Q(summary__last_maintenance_date__isnull=True)
+        )
+
+    def filter_due_soon(self, queryset, name, value):
+        due_date = datetime.date.today() + datetime.timedelta(days=int(value))
+        return queryset.filter(
+            pk__in=MaintenanceForecast.objects.filter(due_date__lte=due_date).values('machine_id')
+        )
+
 
 # Для ограниченной фильтрации по таблице с машинами (для незарегистрированных пользователей)
 class MachinePreviewFilter(FilterSet):
-    # Для организации фильтрации по заводскому номеру машины
+    MATCH_PREFIX = 'prefix'
+    MATCH_EXACT = 'exact'
+
+    # Для организации поиска по заводскому номеру машины - по индексу нормализованного номера
     number_machine = django_filters.CharFilter(
-        field_name='number_machine',
-        lookup_expr='icontains',
+        method='filter_number_machine',
         label='Заводской № машины',
     )
 
+    # Режим поиска: по началу номера (по умолчанию) или по точному совпадению
+    match = django_filters.ChoiceFilter(
+        choices=[(MATCH_PREFIX, 'Начинается с'), (MATCH_EXACT, 'Точное совпадение')],
+        empty_label=None,
+        method='filter_match',
+        label='Совпадение',
+    )
+
+    def filter_queryset(self, queryset):
+        # Без номера машины не выдаются: номер из одних пробелов и дефисов пуст, а поиск по пустому началу номера
+        # выдал бы все машины
+        if not normalize_number_machine(self.form.cleaned_data.get('number_machine')):
+            return queryset.none()
+        return super().filter_queryset(queryset)
+
+    def filter_number_machine(self, queryset, name, value):
+        number = normalize_number_machine(value)
+        if self.form.cleaned_data.get('match') == self.MATCH_EXACT:
+            return queryset.filter(number_machine_normalized=number)
+        # Поиск по началу номера - диапазон по индексу (работает при любой сортировке строк в БД)
+        return queryset.filter(
+            number_machine_normalized__gte=number, number_machine_normalized__lt=number + chr(0x10FFFF)
+        )
+
+    def filter_match(self, queryset, name, value):
+        return queryset  # режим учитывается в filter_number_machine
+
 
 # Для фильтрации по таблице с ТО
 class MaintenanceFilter(FilterSet):
     # Для организации фильтрации по виду ТО
-    type = ModelChoiceFilter(
-        field_name='type__title',
+    type = IdInFilter(
+        field_name='type_id',
         queryset=TypeMaintenance.objects.all(),
         label='Вид ТО',
     )
@@ -69,8 +220,8 @@ class MaintenanceFilter(FilterSet):
     )
 
     # Для организации фильтрации по сервисной компании
-    service_company = ModelChoiceFilter(
-        field_name='service_company__title',
+    service_company = IdInFilter(
+        field_name='service_company_id',
         queryset=ServiceCompany.objects.all(),
         label='Сервисная компания',
     )
@@ -80,22 +231,31 @@ class MaintenanceFilter(FilterSet):
 
 class ClaimFilter(FilterSet):
     # Для организации фильтрации по узлу отказа
-    refusal_node = ModelChoiceFilter(
-        field_name='refusal_node__title',
+    refusal_node = IdInFilter(
+        field_name='refusal_node_id',
         queryset=RefusalNode.objects.all(),
         label='Узел отказа',
     )
 
     # Для организации фильтрации по способу восстановления
-    recovery_method = ModelChoiceFilter(
-        field_name='recovery_method__title',
+    recovery_method = IdInFilter(
+        field_name='recovery_method_id',
         queryset=RecoveryMethod.objects.all(),
         label='Способ восстановления',
     )
 
     # Для организации фильтрации по сервисной компании
-    service_company = ModelChoiceFilter(
-        field_name='service_company__title',
+    service_company = IdInFilter(
+        field_name='service_company_id',
         queryset=ServiceCompany.objects.all(),
         label='Сервисная компания',
     )
+
+    # Полнотекстовый поиск по описанию отказа и запасным частям: все слова, масл* - по началу слова
+    search = django_filters.CharFilter(
+        method='filter_search',
+        label='Поиск по описанию',
+    )
+
+    def filter_search(self, queryset, name, value):
+        return search_claims(queryset, value)
@@ -0,0 +1,179 @@
+import datetime
+import random
+
+from django.contrib.auth.models import User, Group
+from django.db import transaction
+
+from .models import (
+    Machine, Maintenance, Claim, Client, ServiceCompany, Equipment, Engine, Transmission, DrivingAxle, SteeringAxle,
+    MaintenanceCompany, TypeMaintenance, RefusalNode, RecoveryMethod, normalize_number_machine
+)
+from .analytics import invalidate_reliability
+from .list_cache import invalidate_all_lists
+from .forecast import refresh_forecasts
+from .references import invalidate_reference_bundle
+from .summaries import refresh_machine_summaries
+from .timeline import invalidate_timelines
+
+# Даты отгрузки синтетических машин
+SHIPMENT_START = datetime.date(2016, 1, 1)
+SHIPMENT_DAYS = 8 * 365
+
+REFUSALS = [
+    ('повышенный шум', 'прокладки, прочие материалы'),
+    ('течь масла', 'прокладки'),
+    ('проскальзывание', 'шестерня ведущая'),
+    ('блокировка колес', 'колесо'),
+    ('разрушение подшипника', 'подшипник'),
+    ('перегрев двигателя', 'термостат, охлаждающая жидкость'),
+    ('не запускается двигатель', 'стартер'),
+    ('отказ гидравлики', 'гидронасос, уплотнения'),
+]
+CONSUMERS = ['ООО "Вектор"', 'ИП Иванов А.А.', 'АО "Стройтранс"', 'ООО "Логистик-Центр"', 'ООО "Северсталь"']
+ADDRESSES = ['г. Москва', 'г. Екатеринбург', 'г. Новосибирск', 'г. Казань', 'с. Акуловка, Московская обл.']
+OPTIONS = ['Стандарт', 'Гидролинии с БРС', 'Дополнительная установка кабины', 'Стандарт']
+
+
+def _ids(model):
+    ids = list(model.objects.order_by('pk').values_list('pk', flat=True))
+    if not ids:
+        raise ValueError(f'Справочник "{model._meta.verbose_name}" пуст')
+    return ids
+
+
+class FleetGenerator:
+    """
+    Синтетический парк: клиенты и сервисные компании (с пользователями), машины, ТО и рекламации.
+    При одинаковых параметрах и seed на одной и той же базе получаются одинаковые данные.
+    Записи создаются пачками через bulk_create, сводки и кэши обновляются в конце
+    """
+
+    def __init__(self, machines, maintenances=20, claims=3, clients=200, service_companies=20, seed=1,
+                 prefix='SYN', batch_size=1000):
+        self.machines = machines
+        self.maintenances = maintenances
+        self.claims = claims
+        self.clients = clients
+        self.service_companies = service_companies
+        self.random = random.Random(seed)
+        self.prefix = prefix
+        self.batch_size = batch_size
+        self.created = {'machines': 0, 'maintenances': 0, 'claims': 0}
+
+    def run(self):
+        self.references = {
+            model: _ids(model) for model in (Equipment, Engine, Transmission, DrivingAxle, SteeringAxle,
+                                             MaintenanceCompany, TypeMaintenance, RefusalNode, RecoveryMethod)
+        }
+        self.client_ids = self.owners(Client, 'client', 'Клиент', self.clients, 'Client')
+        self.service_company_ids = self.owners(
+            ServiceCompany, 'service', 'Сервисная компания', self.service_companies, 'ServiceCompany'
+        )
+        start = Machine.objects.filter(number_machine__startswith=self.prefix).count()
+        machine_ids = []
+        for batch_start in range(start, start + self.machines, self.batch_size):
+            numbers = range(batch_start, min(batch_start + self.batch_size, start + self.machines))
+            with transaction.atomic():
+                machines = Machine.objects.bulk_create([self.machine(number) for number in numbers])
+                Maintenance.objects.bulk_create(
+                    [record for machine in machines for record in self.machine_maintenances(machine)],
+                    batch_size=self.batch_size,
+                )
+                Claim.objects.bulk_create(
+                    [record for machine in machines for record in self.machine_claims(machine)],
+                    batch_size=self.batch_size,
+                )
+            machine_ids.extend(machine.pk for machine in machines)
+            self.created['machines'] += len(machines)
+        refresh_machine_summaries(machine_ids)
+        refresh_forecasts(machine_ids)
+        invalidate_all_lists()
+        invalidate_timelines(*machine_ids)
+        invalidate_reliability()
+        invalidate_reference_bundle()
+        return self
+
+    def owners(self, model, kind, title, count, group_name):
+        """
+        id клиентов или сервисных компаний парка; недостающие создаются вместе с пользователями
+        """
+        usernames = [f'{self.prefix.lower()}-{kind}{number}' for number in range(1, count + 1)]
+        existing = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+        users = User.objects.bulk_create([
+            User(username=username, password='!') for username in usernames if username not in existing
+        ])
+        group = Group.objects.filter(name=group_name).first()
+        if group is not None and users:
+            group.user_set.add(*users)
+        model.objects.bulk_create([
+            model(title=f'{title} {user.username.rsplit(kind, 1)[1]} ({self.prefix})', user_link=user)
+            for user in users
+        ])
+        return list(model.objects.filter(user_link__username__in=usernames).order_by('pk').values_list('pk', flat=True))
+
+    def choice(self, model):
+        return self.random.choice(self.references[model])
+
+    def machine(self, number):
+        number_machine = f'{self.prefix}{number:07d}'
+        return Machine(
+            number_machine=number_machine,
+            number_machine_normalized=normalize_number_machine(number_machine),
+            model_equipment_id=self.choice(Equipment),
+            model_engine_id=self.choice(Engine),
+            number_engine=f'E{number:08d}',
+            model_transmission_id=self.choice(Transmission),
+            number_transmission=f'T{number:08d}',
+            model_driving_axle_id=self.choice(DrivingAxle),
+            number_driving_axle=f'D{number:08d}',
+            model_steering_axle_id=self.choice(SteeringAxle),
+            number_steering_axle=f'S{number:08d}',
+            supply_contract=f'№{number} от {SHIPMENT_START.year + number % 8}',
+            shipment_date=SHIPMENT_START + datetime.timedelta(days=self.random.randrange(SHIPMENT_DAYS)),
+            end_consumer=self.random.choice(CONSUMERS),
+            shipping_address=self.random.choice(ADDRESSES),
+            options=self.random.choice(OPTIONS),
+            client_id=self.random.choice(self.client_ids),
+            service_company_id=self.random.choice(self.service_company_ids),
+        )
+
+    def machine_maintenances(self, machine):
+        # ТО идут одно за другим с интервалом 1-4 месяца, наработка растет
+        date = machine.shipment_date
+        operating_time = 0
+        types = self.references[TypeMaintenance]
+        for number in range(self.maintenances):
+            date += datetime.timedelta(days=self.random.randint(30, 120))
+            operating_time += self.random.randint(50, 300)
+            yield Maintenance(
+                type_id=types[number % len(types)],
+                maintenance_date=date,
+                operating_time=operating_time,
+                order_number=f'#{date.year}-{machine.number_machine}-{number + 1}',
+                order_date=date - datetime.timedelta(days=self.random.randint(0, 5)),
+                maintenance_company_id=self.choice(MaintenanceCompany),
+                machine_id=machine.pk,
+                service_company_id=machine.service_company_id,
+                client_id=machine.client_id,
+            )
+        self.created['maintenances'] += self.maintenances
+
+    def machine_claims(self, machine):
+        for number in range(self.claims):
+            refusal_date = machine.shipment_date + datetime.timedelta(days=self.random.randint(30, 3 * 365))
+            recovery_date = refusal_date + datetime.timedelta(days=self.random.randint(1, 30))
+            description, parts = self.random.choice(REFUSALS)
+            yield Claim(
+                refusal_date=refusal_date,
+                operating_time=(refusal_date - machine.shipment_date).days * self.random.randint(2, 6),
+                refusal_node_id=self.choice(RefusalNode),
+                refusal_description=description,
+                recovery_method_id=self.choice(RecoveryMethod),
+                repair_parts=parts,
+                recovery_date=recovery_date,
+                downtime=(recovery_date - refusal_date).days,
+                machine_id=machine.pk,
+                service_company_id=machine.service_company_id,
+                client_id=machine.client_id,
+            )
+        self.created['claims'] += self.claims
@@ -0,0 +1,183 @@
+import datetime
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from django.conf import settings
+from django.db import connections, transaction
+
+from .list_cache import invalidate_all_lists
+from .models import Machine, Maintenance, MaintenanceForecast, TypeMaintenance
+
+logger = logging.getLogger('mySilant.forecast')
+
+# Наработка в сутки (м/час) для машин без истории ТО, по которой ее можно оценить
+DEFAULT_USAGE_RATE = getattr(settings, 'SILANT_FORECAST_DEFAULT_USAGE_RATE', 8.0)
+# Машин в одном наборе запросов при пересчете части парка (ограничение на число параметров в IN)
+FORECAST_CHUNK_SIZE = 500
+# Дальше этого прогноз не имеет смысла (и не помещается в дату)
+MAX_FORECAST_DAYS = 100 * 365
+
+# Пересчет всего парка при изменении вида ТО идет в фоновом потоке, а не в запросе администратора.
+# Изменения, пришедшие до начала пересчета, объединяются в один пересчет
+_fleet_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='silant-forecast')
+_fleet_lock = threading.Lock()
+_fleet_pending = False
+
+
+def _columns(queryset, *fields):
+    """
+    Столбцы выборки массивами NumPy: строки читаются курсором базы, без создания объектов и разбора дат по одной
+    """
+    sql, params = queryset.order_by().values_list(*fields).query.sql_with_params()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    if not rows:
+        return [np.empty(0, dtype=np.int64) for _ in fields]
+    return [np.array(column) for column in zip(*rows)]
+
+
+def _days(values):
+    # Даты - в порядковые номера дней (date.toordinal): разница номеров - число дней между датами
+    return np.fromiter((value.toordinal() for value in values), dtype=np.int64, count=len(values))
+
+
+def compute_forecasts(machine_ids=None):
+    """
+    Прогноз ТО по машинам: история ТО читается одним запросом в столбцы, наработка в сутки и ожидаемые даты
+    считаются операциями над массивами сразу для всех машин. Без machine_ids - весь парк.
+    Возвращает несохраненные объекты MaintenanceForecast
+    """
+    types = TypeMaintenance.objects.filter(operating_interval__gt=0).order_by('pk')
+    type_ids, intervals = _columns(types, 'pk', 'operating_interval')
+    machines, maintenances = Machine.objects.all(), Maintenance.objects.all()
+    if machine_ids is not None:
+        machines, maintenances = machines.filter(pk__in=machine_ids), maintenances.filter(machine_id__in=machine_ids)
+    machine, shipment = _columns(machines, 'pk', 'shipment_date')
+    if not len(machine) or not len(type_ids):
+        return []
+    order = np.argsort(machine)
+    machine, shipment = machine[order].astype(np.int64), _days(shipment[order])
+
+    owner, date, hours, kind = _columns(maintenances, 'machine_id', 'maintenance_date', 'operating_time', 'type_id')
+    owner, date, hours, kind = owner.astype(np.int64), _days(date), hours.astype(np.int64), kind.astype(np.int64)
+    # Строка машины для каждой записи ТО
+    row = np.searchsorted(machine, owner)
+
+    # Первое и последнее показание наработки каждой машины: без истории - дата отгрузки и 0 м/час
+    first_date, first_hours = shipment.copy(), np.zeros(len(machine), dtype=np.int64)
+    last_date, last_hours = shipment.copy(), np.zeros(len(machine), dtype=np.int64)
+    has_history = np.zeros(len(machine), dtype=bool)
+    if len(row):
+        order = np.lexsort((hours, date, row))
+        row, date, hours, kind = row[order], date[order], hours[order], kind[order]
+        starts = np.flatnonzero(np.r_[True, row[1:] != row[:-1]])
+        ends = np.r_[starts[1:], len(row)] - 1
+        rows = row[starts]
+        first_date[rows], first_hours[rows] = date[starts], hours[starts]
+        last_date[rows], last_hours[rows] = date[ends], np.maximum.reduceat(hours, starts)
+        has_history[rows] = True
+
+    # Наработка в сутки: между первым и последним ТО, а при одном ТО - от отгрузки
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rate = np.where(
+            last_date > first_date,
+            (last_hours - first_hours) / (last_date - first_date),
+            last_hours / (last_date - shipment),
+        )
+    rate = np.where(has_history & np.isfinite(rate) & (rate > 0), rate, DEFAULT_USAGE_RATE)
+
+    # Наработка при последнем ТО каждого вида (0, если вида еще не было)
+    type_ids, intervals = type_ids.astype(np.int64), intervals.astype(np.int64)
+    last_type_hours = np.zeros((len(machine), len(type_ids)), dtype=np.int64)
+    column = np.minimum(np.searchsorted(type_ids, kind), len(type_ids) - 1)
+    known = type_ids[column] == kind  # виды без периодичности не прогнозируются
+    np.maximum.at(last_type_hours, (row[known], column[known]), hours[known])
+
+    # Следующее ТО вида - через периодичность после предыдущего; дата - по наработке в сутки от последнего показания
+    due_hours = last_type_hours + intervals
+    days = np.ceil((due_hours - last_hours[:, None]) / rate[:, None])
+    due_date = last_date[:, None] + np.clip(days, -MAX_FORECAST_DAYS, MAX_FORECAST_DAYS).astype(np.int64)
+
+    forecasts = []
+    for index, machine_id in enumerate(machine.tolist()):
+        usage_rate = round(float(rate[index]), 3)
+        for column, type_id in enumerate(type_ids.tolist()):
+            forecasts.append(MaintenanceForecast(
+                machine_id=machine_id,
+                type_id=type_id,
+                usage_rate=usage_rate,
+                due_operating_time=int(due_hours[index, column]),
+                due_date=datetime.date.fromordinal(int(due_date[index, column])),
+            ))
+    return forecasts
+
+
+def refresh_forecasts(machine_ids=None):
+    """
+    Пересчитывает и сохраняет прогнозы ТО. Без machine_ids - весь парк (со сбросом кэша таблиц списков:
+    отбор ?due_soon зависит от прогнозов всех машин)
+    """
+    if machine_ids is None:
+        forecasts = compute_forecasts()
+        with transaction.atomic():
+            MaintenanceForecast.objects.all().delete()
+            MaintenanceForecast.objects.bulk_create(forecasts, batch_size=1000)
+        invalidate_all_lists()
+        return len(forecasts)
+    machine_ids = sorted(set(machine_ids))
+    count = 0
+    for start in range(0, len(machine_ids), FORECAST_CHUNK_SIZE):
+        chunk = machine_ids[start:start + FORECAST_CHUNK_SIZE]
+        forecasts = compute_forecasts(chunk)
+        with transaction.atomic():
+            MaintenanceForecast.objects.filter(machine_id__in=chunk).delete()
+            MaintenanceForecast.objects.bulk_create(forecasts, batch_size=1000)
+        count += len(forecasts)
+    return count
+
+
+def schedule_forecast_refresh(*machine_ids):
+    """
+    Пересчитывает прогнозы машин после фиксации транзакции - при изменении и удалении их ТО
+    """
+    machine_ids = [machine_id for machine_id in machine_ids if machine_id is not None]
+    if machine_ids:
+        transaction.on_commit(lambda: refresh_forecasts(machine_ids))
+
+
+def refresh_fleet_in_background():
+    """
+    Пересчет всего парка в фоновом потоке: ошибки пишутся в журнал, соединения потока с базой закрываются
+    """
+    global _fleet_pending
+    with _fleet_lock:
+        _fleet_pending = False
+    try:
+        refresh_forecasts()
+    except Exception:
+        logger.exception('Не удалось пересчитать прогнозы ТО парка')
+    finally:
+        connections.close_all()
+
+
+def submit_fleet_forecast_refresh():
+    """
+    Ставит пересчет всего парка в очередь фонового потока, если он там еще не стоит
+    """
+    global _fleet_pending
+    with _fleet_lock:
+        if _fleet_pending:
+            return
+        _fleet_pending = True
+    _fleet_executor.submit(refresh_fleet_in_background)
+
+
+def schedule_fleet_forecast_refresh():
+    """
+    Пересчитывает прогнозы всего парка в фоне после фиксации транзакции - при изменении и удалении вида ТО
+    (периодичность действует на все машины)
+    """
+    transaction.on_commit(submit_fleet_forecast_refresh)
@@ -1,7 +1,51 @@
 from django import forms
 from django.core.exceptions import ValidationError
+from django.forms.utils import flatatt
+from django.urls import reverse
+from django.utils.html import format_html
 
-from .models import Machine, Maintenance, Claim, Client, ServiceCompany
+from .models import Machine, Maintenance, Claim
+from .roles import get_user_role, scope_queryset
+
+
+# Выбор записи с подсказками: вместо списка всех вариантов (<select>) выводится только выбранное значение, а варианты
+# по мере ввода запрашиваются у AutocompleteView (источник source). В форму передается id, и поле выбора проверяет
+# только его - одним запросом по первичному ключу в пределах queryset поля
+class AutocompleteSelect(forms.Widget):
+    class Media:
+        js = ['js/autocomplete.js']
+
+    def __init__(self, source, attrs=None):
+        super().__init__(attrs)
+        self.source = source
+
+    def id_for_label(self, id_):
+        return f'{id_}_text' if id_ else id_
+
+    def selected_label(self, value):
+        # Подпись выбранной записи: choices задает поле выбора (ModelChoiceIterator с queryset поля)
+        if value in (None, ''):
+            return ''
+        try:
+            instance = self.choices.queryset.filter(pk=value).first()
+        except (ValueError, TypeError, ValidationError):
+            return ''
+        return '' if instance is None else self.choices.field.label_from_instance(instance)
+
+    def render(self, name, value, attrs=None, renderer=None):
+        attrs = self.build_attrs(self.attrs, attrs)
+        input_id = attrs.pop('id', None) or f'id_{name}'
+        value = '' if value is None else str(value)
+        return format_html(
+            '<input type="hidden" name="{}" value="{}" id="{}">'
+            '<input type="text" id="{}_text" value="{}" list="{}_list" autocomplete="off" data-autocomplete="{}" '
+            'data-target="{}" data-value="{}"{}>'
+            '<datalist id="{}_list"></datalist>',
+            name, value, input_id,
+            input_id, self.selected_label(value), input_id, reverse('autocomplete', args=[self.source]),
+            input_id, value, flatatt(attrs),
+            input_id,
+        )
 
 
 # Форма для создания/редактирования записи о машине
@@ -48,6 +92,16 @@ class MachineForm(forms.ModelForm):
             'service_company': 'Сервисная компания'
         }
 
+        widgets = {
+            'model_equipment': AutocompleteSelect('equipment'),
+            'model_engine': AutocompleteSelect('engine'),
+            'model_transmission': AutocompleteSelect('transmission'),
+            'model_driving_axle': AutocompleteSelect('driving_axle'),
+            'model_steering_axle': AutocompleteSelect('steering_axle'),
+            'client': AutocompleteSelect('client'),
+            'service_company': AutocompleteSelect('service_company'),
+        }
+
 
 # Форма для создания/редактирования записи о ТО
 class MaintenanceForm(forms.ModelForm):
@@ -74,28 +128,15 @@ class MaintenanceForm(forms.ModelForm):
             'maintenance_company': 'Организация, проводившая ТО',
         }
 
+        widgets = {
+            'machine': AutocompleteSelect('machine'),
+        }
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        # В поле 'машина' нужно выводить только машины соответствующие пользователю
-        user = kwargs['initial']['user']
-        clients = Client.objects.all()
-        companies = ServiceCompany.objects.all()
-        users_clients = []
-        users_companies = []
-        for client in clients:
-            users_clients.append(client.user_link)
-        for company in companies:
-            users_companies.append(company.user_link)
-        if user in users_clients:
-            # Если клиент - доступны только его машины
-            self.fields['machine'] = forms.ModelChoiceField(
-                queryset=Machine.objects.filter(client__user_link=user)
-            )
-        elif user in users_companies:
-            # Если сервисная компания - доступны только ее машины
-            self.fields['machine'] = forms.ModelChoiceField(
-                queryset=Machine.objects.filter(service_company__user_link=user)
-            )
+        # В поле 'машина' доступны только машины, соответствующие роли пользователя (как и в подсказках)
+        role = get_user_role(kwargs['initial']['user'])
+        self.fields['machine'].queryset = scope_queryset(Machine.objects.all(), role)
 
     def clean(self):
         cleaned_data = super().clean()
@@ -136,19 +177,15 @@ class ClaimForm(forms.ModelForm):
             'recovery_date': 'Дата восстановления',
         }
 
+        widgets = {
+            'machine': AutocompleteSelect('machine'),
+        }
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        # В поле 'машина' нужно выводить только машины соответствующие пользователю
-        user = kwargs['initial']['user']
-        companies = ServiceCompany.objects.all()
-        users_companies = []
-        for company in companies:
-            users_companies.append(company.user_link)
-        if user in users_companies:
-            # Если сервисная компания - доступны только ее машины
-            self.fields['machine'] = forms.ModelChoiceField(
-                queryset=Machine.objects.filter(service_company__user_link=user)
-            )
+        # В поле 'машина' доступны только машины, соответствующие роли пользователя (как и в подсказках)
+        role = get_user_role(kwargs['initial']['user'])
+        self.fields['machine'].queryset = scope_queryset(Machine.objects.all(), role)
 
     def clean(self):
         cleaned_data = super().clean()
@@ -0,0 +1,79 @@
+import time
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache
+
+# Кэши, которые видит только свой процесс: сброс в одном процессе сервера не доходит до остальных
+LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def is_shared_cache():
+    """
+    Общий ли кэш для всех процессов сервера (Redis, Memcached). Можно задать явно SILANT_SHARED_CACHE
+    """
+    backend = settings.CACHES.get(DEFAULT_CACHE_ALIAS, {}).get('BACKEND', '')
+    return getattr(settings, 'SILANT_SHARED_CACHE', backend not in LOCAL_CACHE_BACKENDS)
+
+
+def generation_cache_timeout(timeout):
+    """
+    Время хранения записей, ключи которых строятся на поколениях. Смена поколения в одном процессе не видна другим,
+    если кэш не общий, - тогда такие записи не кэшируются (0), чтобы процессы не отдавали устаревшие данные
+    """
+    return timeout if is_shared_cache() else 0
+
+
+def _key(name):
+    return f'silant:generation:{name}'
+
+
+def _new_generation():
+    # Начальное поколение - по часам, а не 1: счетчик может быть вытеснен из кэша, и начав заново с 1, процессы
+    # снова увидели бы записи, построенные на прежних номерах
+    return time.time_ns() // 1000
+
+
+def _initial_generation(key):
+    generation = _new_generation()
+    cache.add(key, generation, None)
+    return cache.get(key, generation)  # другой процесс мог задать поколение раньше
+
+
+def get_generation(name):
+    """
+    Текущее поколение данных: входит в ключи кэша, поэтому смена поколения делает все старые записи недоступными
+    """
+    generation = cache.get(_key(name))
+    if generation is None:
+        generation = _initial_generation(_key(name))
+    return generation
+
+
+def get_generations(*names):
+    """
+    Поколения нескольких наборов данных одним обращением к кэшу
+    """
+    keys = {_key(name): name for name in names}
+    found = cache.get_many(list(keys))
+    for key in keys.keys() - found.keys():
+        found[key] = _initial_generation(key)
+    return [found[_key(name)] for name in names]
+
+
+def bump_generation(*names):
+    """
+    Переходит к следующему поколению данных - сбрасывает все записи кэша, построенные на прежнем
+    """
+    for name in names:
+        key = _key(name)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, _new_generation(), None)
+        else:
+            # Поколение хранится бессрочно: часть кэшей (DatabaseCache) при incr задает время хранения по умолчанию,
+            # а истекший счетчик начался бы заново
+            cache.touch(key, None)
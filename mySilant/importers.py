@@ -0,0 +1,307 @@
+import csv
+import datetime
+from collections import namedtuple
+from functools import lru_cache
+
+from django.db import transaction
+
+from .models import (
+    Machine, Maintenance, Claim, Client, ServiceCompany, Equipment, Engine, Transmission, DrivingAxle, SteeringAxle,
+    MaintenanceCompany, TypeMaintenance, RefusalNode, RecoveryMethod, normalize_number_machine
+)
+from .exports import unescape_formula
+from .forecast import refresh_forecasts
+from .list_cache import invalidate_all_lists
+from .summaries import refresh_machine_summaries
+from .timeline import invalidate_timelines
+
+
+# Ошибка в строке файла: номер строки и описание
+RowError = namedtuple('RowError', ['line', 'message'])
+
+
+class InvalidRow(ValueError):
+    pass
+
+
+@lru_cache(maxsize=4096)
+def parse_date(value):
+    """
+    Разбирает дату в формате ГГГГ-ММ-ДД (как в формах) или ДД.ММ.ГГГГ (как в таблицах сайта).
+    Даты в исторических данных часто повторяются, поэтому результат кэшируется
+    """
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        pass
+    day, _, rest = value.partition('.')
+    month, _, year = rest.partition('.')
+    if len(year) != 4:
+        raise ValueError(value)
+    return datetime.date(int(year), int(month), int(day))
+
+
+def read_csv(path, delimiter=','):
+    """
+    Построчно читает CSV-файл, первая строка - заголовок с именами полей. Снимает экранирование формул,
+    добавленное выгрузкой (exports.escape_formula)
+    """
+    with open(path, newline='', encoding='utf-8-sig') as file:
+        for row in csv.DictReader(file, delimiter=delimiter):
+            yield {key: unescape_formula(value) for key, value in row.items()}
+
+
+def read_xlsx(path):
+    """
+    Построчно читает первый лист XLSX-файла (нужен пакет openpyxl), первая строка - заголовок с именами полей
+    """
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = [str(cell).strip() if cell is not None else '' for cell in next(rows, ())]
+        for values in rows:
+            if any(value is not None for value in values):
+                yield dict(zip(header, values))
+    finally:
+        workbook.close()
+
+
+def title_map(model):
+    """
+    Загружает справочник одним запросом: название -> id. Неоднозначные названия сопоставляются с None
+    """
+    titles = {}
+    for pk, title in model.objects.values_list('pk', 'title'):
+        titles[title] = None if title in titles else pk
+    return titles
+
+
+class BaseImporter:
+    """
+    Загрузка записей из файла пачками bulk_create. Справочники загружаются заранее, по одному запросу
+    на таблицу; каждая пачка сохраняется в своей транзакции. Строки с ошибками пропускаются и попадают в отчет
+    """
+    model = None
+    references = {}  # колонка -> модель справочника, значение ищется по названию
+    required = ()  # обязательные колонки
+
+    def __init__(self, batch_size=1000, dry_run=False):
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.created = 0
+        self.errors = []
+        self.machine_ids = set()  # машины, сводки которых пересчитываются после загрузки
+        self.maps = {column: title_map(model) for column, model in self.references.items()}
+
+    def run(self, rows):
+        batch = []
+        # Первая строка файла - заголовок, данные начинаются со второй
+        for line, row in enumerate(rows, start=2):
+            try:
+                batch.append(self.build(self.clean_row(row)))
+            except InvalidRow as error:
+                self.errors.append(RowError(line, str(error)))
+                continue
+            if len(batch) >= self.batch_size:
+                self.flush(batch)
+                batch = []
+        self.flush(batch)
+        # bulk_create не вызывает save и сигналы - сводки и прогнозы ТО загруженных машин пересчитываются одним
+        # проходом, отрисованные таблицы списков и хронология машин сбрасываются
+        if self.machine_ids:
+            refresh_machine_summaries(self.machine_ids)
+            refresh_forecasts(self.machine_ids)
+            invalidate_all_lists()
+            invalidate_timelines(*self.machine_ids)
+        return self
+
+    def flush(self, batch):
+        if not batch:
+            return
+        if not self.dry_run:
+            with transaction.atomic():
+                self.model.objects.bulk_create(batch, batch_size=self.batch_size)
+            self.machine_ids.update(self.summary_machine_ids(batch))
+        self.created += len(batch)
+
+    def clean_row(self, row):
+        row = {
+            (key or '').strip(): value.strip() if isinstance(value, str) else value
+            for key, value in row.items()
+        }
+        missing = [column for column in self.required if row.get(column) in (None, '')]
+        if missing:
+            raise InvalidRow(f'Не заполнены поля: {", ".join(missing)}')
+        return row
+
+    def build(self, row):
+        raise NotImplementedError
+
+    def summary_machine_ids(self, batch):
+        return [record.machine_id for record in batch]
+
+    def reference(self, row, column):
+        title = str(row[column])
+        titles = self.maps[column]
+        if title not in titles:
+            raise InvalidRow(f'{column}: нет записи справочника "{title}"')
+        if titles[title] is None:
+            raise InvalidRow(f'{column}: в справочнике несколько записей "{title}"')
+        return titles[title]
+
+    @staticmethod
+    def date(row, column):
+        value = row[column]
+        if isinstance(value, datetime.datetime):
+            return value.date()
+        if isinstance(value, datetime.date):
+            return value
+        try:
+            return parse_date(str(value))
+        except ValueError:
+            raise InvalidRow(f'{column}: некорректная дата "{value}"')
+
+    @staticmethod
+    def integer(row, column, default=0):
+        value = row.get(column)
+        if value in (None, ''):
+            return default
+        try:
+            number = int(float(value)) if isinstance(value, float) else int(value)
+        except ValueError:
+            raise InvalidRow(f'{column}: некорректное число "{value}"')
+        if number < 0:
+            raise InvalidRow(f'{column}: число должно быть положительным')
+        return number
+
+    @staticmethod
+    def text(row, column, default=''):
+        value = row.get(column)
+        return default if value is None else str(value)
+
+
+class MachineImporter(BaseImporter):
+    model = Machine
+    references = {
+        'model_equipment': Equipment,
+        'model_engine': Engine,
+        'model_transmission': Transmission,
+        'model_driving_axle': DrivingAxle,
+        'model_steering_axle': SteeringAxle,
+        'client': Client,
+        'service_company': ServiceCompany,
+    }
+    required = (
+        'number_machine', 'model_equipment', 'model_engine', 'number_engine', 'model_transmission',
+        'number_transmission', 'model_driving_axle', 'number_driving_axle', 'model_steering_axle',
+        'number_steering_axle', 'supply_contract', 'shipment_date', 'end_consumer', 'shipping_address', 'client',
+        'service_company',
+    )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Заводские номера уже загруженных машин и машин из файла - для проверки уникальности
+        self.numbers = set(Machine.objects.values_list('number_machine', flat=True))
+
+    def build(self, row):
+        number = self.text(row, 'number_machine')
+        if number in self.numbers:
+            raise InvalidRow(f'number_machine: машина "{number}" уже есть')
+        machine = Machine(
+            number_machine=number,
+            number_machine_normalized=normalize_number_machine(number),
+            number_engine=self.text(row, 'number_engine'),
+            number_transmission=self.text(row, 'number_transmission'),
+            number_driving_axle=self.text(row, 'number_driving_axle'),
+            number_steering_axle=self.text(row, 'number_steering_axle'),
+            supply_contract=self.text(row, 'supply_contract'),
+            shipment_date=self.date(row, 'shipment_date'),
+            end_consumer=self.text(row, 'end_consumer'),
+            shipping_address=self.text(row, 'shipping_address'),
+            options=self.text(row, 'options') or 'Стандарт',
+            **{f'{column}_id': self.reference(row, column) for column in self.references},
+        )
+        self.numbers.add(number)
+        return machine
+
+    def summary_machine_ids(self, batch):
+        # id присваиваются при bulk_create (SQLite 3.35+, PostgreSQL)
+        return [machine.pk for machine in batch if machine.pk is not None]
+
+
+class MachineRecordImporter(BaseImporter):
+    """
+    Общая часть загрузки ТО и рекламаций: машина ищется по заводскому номеру, клиент и сервисная
+    компания берутся у машины
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.machines = {
+            number: (pk, client_id, service_company_id)
+            for number, pk, client_id, service_company_id in Machine.objects.values_list(
+                'number_machine', 'pk', 'client_id', 'service_company_id'
+            )
+        }
+
+    def machine(self, row):
+        number = self.text(row, 'machine')
+        if number not in self.machines:
+            raise InvalidRow(f'machine: нет машины с заводским номером "{number}"')
+        machine_id, client_id, service_company_id = self.machines[number]
+        return {'machine_id': machine_id, 'client_id': client_id, 'service_company_id': service_company_id}
+
+
+class MaintenanceImporter(MachineRecordImporter):
+    model = Maintenance
+    references = {
+        'type': TypeMaintenance,
+        'maintenance_company': MaintenanceCompany,
+    }
+    required = ('machine', 'type', 'maintenance_date', 'order_number', 'order_date', 'maintenance_company')
+
+    def build(self, row):
+        return Maintenance(
+            type_id=self.reference(row, 'type'),
+            maintenance_date=self.date(row, 'maintenance_date'),
+            operating_time=self.integer(row, 'operating_time'),
+            order_number=self.text(row, 'order_number'),
+            order_date=self.date(row, 'order_date'),
+            maintenance_company_id=self.reference(row, 'maintenance_company'),
+            **self.machine(row),
+        )
+
+
+class ClaimImporter(MachineRecordImporter):
+    model = Claim
+    references = {
+        'refusal_node': RefusalNode,
+        'recovery_method': RecoveryMethod,
+    }
+    required = ('machine', 'refusal_date', 'refusal_node', 'refusal_description', 'recovery_method', 'recovery_date')
+
+    def build(self, row):
+        refusal_date = self.date(row, 'refusal_date')
+        recovery_date = self.date(row, 'recovery_date')
+        if recovery_date < refusal_date:
+            raise InvalidRow('recovery_date: дата восстановления должна быть не раньше даты отказа')
+        return Claim(
+            refusal_date=refusal_date,
+            operating_time=self.integer(row, 'operating_time'),
+            refusal_node_id=self.reference(row, 'refusal_node'),
+            refusal_description=self.text(row, 'refusal_description'),
+            recovery_method_id=self.reference(row, 'recovery_method'),
+            repair_parts=self.text(row, 'repair_parts'),
+            recovery_date=recovery_date,
+            downtime=(recovery_date - refusal_date).days,  # время простоя техники в днях, как в Claim.save
+            **self.machine(row),
+        )
+
+
+IMPORTERS = {
+    'machines': MachineImporter,
+    'maintenance': MaintenanceImporter,
+    'claims': ClaimImporter,
+}
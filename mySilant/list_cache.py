@@ -0,0 +1,89 @@
+import datetime
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.db.models import Model
+
+from .generations import get_generations, bump_generation, generation_cache_timeout
+from .roles import ROLE_ADMIN, ROLE_CLIENT, ROLE_SERVICE_COMPANY, ROLE_GUEST
+
+# Время хранения отрисованных таблиц списков в кэше (в секундах), по умолчанию - сутки.
+# При изменении машин, ТО и рекламаций кэш области видимости сбрасывается сменой поколения
+# (только с общим для процессов кэшем, см. generation_cache_timeout)
+LIST_CACHE_TIMEOUT = generation_cache_timeout(
+    getattr(settings, 'SILANT_LIST_CACHE_TIMEOUT', 60 * 60 * 24)
+)
+
+# Таблица без кэширования: тег cache в шаблоне все равно сохраняет фрагмент, поэтому ключ у таких таблиц один,
+# а время хранения 0 - запись сразу устаревает и не выдается
+UNCACHED_TABLE = ('uncached', 0)
+
+
+def role_scope(role):
+    """
+    Область видимости роли: все записи, записи клиента или записи сервисной компании
+    """
+    if role.role == ROLE_CLIENT:
+        return f'client:{role.client_id}'
+    if role.role == ROLE_SERVICE_COMPANY:
+        return f'service_company:{role.service_company_id}'
+    return role.role
+
+
+def _key_value(value):
+    if isinstance(value, Model):
+        return str(value.pk)
+    if isinstance(value, (list, tuple)):
+        return ','.join(map(_key_value, value))
+    return str(value)
+
+
+def filter_params(filterset):
+    """
+    Значения фильтров, которые распознал и проверил filterset: остальные параметры запроса на выборку не влияют
+    и в ключ не входят
+    """
+    filterset.is_valid()
+    return [
+        (name, _key_value(value)) for name, value in sorted(filterset.form.cleaned_data.items())
+        if value not in (None, '', [])
+    ]
+
+
+def table_cache(role, filterset, page_number):
+    """
+    Ключ и время хранения таблицы списка: область видимости и ее поколение, поколения всех списков и справочников,
+    значения фильтров и номер страницы. Незарегистрированный пользователь ищет машины по произвольному номеру -
+    такие таблицы не кэшируются
+    """
+    if role.role == ROLE_GUEST:
+        return UNCACHED_TABLE
+    scope = role_scope(role)
+    generations = get_generations('lists', f'lists:{scope}', 'references')
+    params = filter_params(filterset)
+    query = urlencode([*params, ('page', page_number)])
+    if any(name == 'due_soon' for name, value in params):
+        # Выборка "ТО в ближайшие N дней" отсчитывается от сегодняшней даты
+        query = f'{datetime.date.today().isoformat()}:{query}'
+    return f'{scope}:{":".join(map(str, generations))}:{query}', LIST_CACHE_TIMEOUT
+
+
+def invalidate_lists(*owners):
+    """
+    Сбрасывает таблицы областей видимости, в которые входит запись: всех записей, клиента и сервисной компании.
+    owners - пары (id клиента, id сервисной компании) записи до и после изменения
+    """
+    names = {f'lists:{ROLE_ADMIN}'}
+    for client_id, service_company_id in owners:
+        if client_id is not None:
+            names.add(f'lists:client:{client_id}')
+        if service_company_id is not None:
+            names.add(f'lists:service_company:{service_company_id}')
+    bump_generation(*names)
+
+
+def invalidate_all_lists():
+    """
+    Сбрасывает таблицы всех областей видимости - после загрузки данных в обход моделей
+    """
+    bump_generation('lists')
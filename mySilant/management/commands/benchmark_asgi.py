@@ -0,0 +1,124 @@
+import asyncio
+import io
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user_model
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+
+HOST = 'localhost'
+
+# Сравниваемые варианты: название, сервер, путь к синхронному или асинхронному представлению
+SCENARIOS = [
+    ('WSGI, синхронный ViewSet', 'wsgi', '/api/api/{path}'),
+    ('ASGI, синхронный ViewSet', 'asgi', '/api/api/{path}'),
+    ('ASGI, асинхронное чтение', 'asgi', '/api/api/async/{path}'),
+]
+
+
+def _session_cookie(username):
+    # Сессия пользователя, как после входа на сайт
+    user = get_user_model().objects.get(username=username)
+    session = SessionStore()
+    session[SESSION_KEY] = str(user.pk)
+    session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+    session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    session.save()
+    return f'{settings.SESSION_COOKIE_NAME}={session.session_key}'
+
+
+def _run_wsgi(application, url, cookie, requests, concurrency):
+    parts = urlsplit(url)
+
+    def request(_):
+        environ = {
+            'REQUEST_METHOD': 'GET', 'PATH_INFO': parts.path, 'QUERY_STRING': parts.query, 'SERVER_NAME': HOST,
+            'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1', 'HTTP_HOST': HOST, 'HTTP_COOKIE': cookie,
+            'HTTP_ACCEPT': 'application/json', 'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr,
+            'wsgi.url_scheme': 'http', 'wsgi.version': (1, 0), 'wsgi.multithread': True,
+            'wsgi.multiprocess': False, 'wsgi.run_once': False,
+        }
+        statuses = []
+        started = time.perf_counter()
+        body = application(environ, lambda status, headers, exc_info=None: statuses.append(status))
+        b''.join(body)
+        body.close()
+        return time.perf_counter() - started, int(statuses[0].split()[0])
+
+    # Потоки - как у многопоточного WSGI-сервера
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return list(executor.map(request, range(requests)))
+
+
+def _run_asgi(application, url, cookie, requests, concurrency):
+    parts = urlsplit(url)
+
+    async def request(semaphore):
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+            'path': parts.path, 'raw_path': parts.path.encode(), 'query_string': parts.query.encode(),
+            'root_path': '', 'client': ('127.0.0.1', 0), 'server': (HOST, 80),
+            'headers': [(b'host', HOST.encode()), (b'cookie', cookie.encode()), (b'accept', b'application/json')],
+        }
+        statuses = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                statuses.append(message['status'])
+
+        async with semaphore:
+            started = time.perf_counter()
+            await application(scope, receive, send)
+            return time.perf_counter() - started, statuses[0]
+
+    async def run():
+        # Один цикл событий - как у ASGI-сервера с одним рабочим процессом
+        semaphore = asyncio.Semaphore(concurrency)
+        return await asyncio.gather(*(request(semaphore) for _ in range(requests)))
+
+    return asyncio.run(run())
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность чтения API при одновременных запросах: WSGI с синхронными ViewSet, '
+        'ASGI с синхронными ViewSet и ASGI с асинхронными представлениями чтения'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='machines/', help='Путь внутри API, например claims/?page=2')
+        parser.add_argument('--user', help='Пользователь, от имени которого выполняются запросы')
+        parser.add_argument('--requests', type=int, default=500, help='Количество запросов')
+        parser.add_argument('--concurrency', type=int, default=20, help='Количество одновременных запросов')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['concurrency'] < 1:
+            raise CommandError('--requests и --concurrency должны быть больше нуля')
+        cookie = _session_cookie(options['user']) if options['user'] else ''
+        servers = {'wsgi': (get_wsgi_application(), _run_wsgi), 'asgi': (get_asgi_application(), _run_asgi)}
+
+        self.stdout.write(f'{options["requests"]} запросов, одновременно {options["concurrency"]}')
+        for name, server, url in SCENARIOS:
+            application, run = servers[server]
+            url = url.format(path=options['path'])
+            run(application, url, cookie, options['concurrency'], options['concurrency'])  # прогрев
+            started = time.perf_counter()
+            results = run(application, url, cookie, options['requests'], options['concurrency'])
+            elapsed = time.perf_counter() - started
+            latencies = sorted(latency for latency, status in results)
+            errors = sum(1 for latency, status in results if status != 200)
+            self.stdout.write(
+                f'{name:<28} {len(results) / elapsed:8.1f} запр/с  '
+                f'p50 {statistics.median(latencies) * 1000:7.1f} мс  '
+                f'p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:7.1f} мс  ошибок: {errors}'
+            )
@@ -0,0 +1,71 @@
+import copy
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from mySilant.models import Machine, Maintenance, Claim
+from mySilant.serializers import MachineSerializer, MaintenanceSerializer, ClaimSerializer, RowSerializer
+
+# Сравниваемые списки: название, модель, сериализатор
+SUBJECTS = [
+    ('Машины', Machine, MachineSerializer),
+    ('ТО', Maintenance, MaintenanceSerializer),
+    ('Рекламации', Claim, ClaimSerializer),
+]
+
+
+def _instances(model, serializer_class, count):
+    # Записи из базы со всеми развертываемыми объектами, размноженные в памяти до нужного количества
+    sample = list(model.objects.select_related(*serializer_class.expandable_fields).order_by('pk')[:100])
+    if not sample:
+        raise CommandError(f'В базе нет записей {model._meta.verbose_name_plural}')
+    instances = []
+    for number in range(count):
+        instance = copy.copy(sample[number % len(sample)])
+        instance.pk = number + 1
+        instances.append(instance)
+    return instances
+
+
+def _timing(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает вывод списков API: ModelSerializer(many=True) и быстрый вывод RowSerializer, '
+        'без развертывания и со всеми развернутыми связанными объектами (?expand=)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('rows', nargs='*', type=int, default=[1000, 10000], help='Количество записей в списке')
+        parser.add_argument('--repeat', type=int, default=5, help='Количество повторов (берется медиана)')
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1 or any(count < 1 for count in options['rows']):
+            raise CommandError('Количество записей и повторов должно быть больше нуля')
+        for name, model, serializer_class in SUBJECTS:
+            for count in options['rows']:
+                instances = _instances(model, serializer_class, count)
+                for expand in ((), tuple(serializer_class.expandable_fields)):
+                    context = {'expand': expand}
+                    rows = RowSerializer(serializer_class(context=context))
+                    if rows.many(instances) != serializer_class(instances, many=True, context=context).data:
+                        raise CommandError(f'{name}: быстрый вывод не совпадает с сериализатором')
+                    serializer = _timing(
+                        lambda: serializer_class(instances, many=True, context=context).data, options['repeat']
+                    )
+                    fast = _timing(
+                        lambda: RowSerializer(serializer_class(context=context)).many(instances), options['repeat']
+                    )
+                    self.stdout.write(
+                        f'{name:<11} {count:>6} записей {"expand" if expand else "id":<6}  '
+                        f'ModelSerializer {serializer * 1000:8.1f} мс  RowSerializer {fast * 1000:7.1f} мс  '
+                        f'x{serializer / fast:4.1f}'
+                    )
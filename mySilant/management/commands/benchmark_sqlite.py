@@ -0,0 +1,156 @@
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, close_old_connections, connections
+from django.test.utils import override_settings
+
+from mySilant.models import Machine, Maintenance, Claim, TypeMaintenance, MaintenanceCompany
+
+# Сравниваемые режимы: название, производственный режим SQLite, постоянные соединения, число попыток записи
+MODES = [
+    ('По умолчанию', False, 0, 1),
+    ('Производственный', True, None, None),
+]
+
+
+def _copy_database(source):
+    # Копия базы, чтобы нагрузка не меняла рабочие данные. Режим журнала сбрасывается на исходный (DELETE)
+    handle, path = tempfile.mkstemp(suffix='.sqlite3')
+    os.close(handle)
+    with sqlite3.connect(source) as src, sqlite3.connect(path) as dst:
+        src.backup(dst)
+        dst.execute('PRAGMA journal_mode = DELETE')
+    return path
+
+
+def _remove_database(path):
+    for suffix in ('', '-wal', '-shm', '-journal'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+def _percentile(values, share):
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[max(int(len(values) * share) - 1, 0)]
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает одновременную запись ТО и рекламаций и чтение списков на копии базы SQLite '
+        'в режиме по умолчанию и в производственном режиме (WAL, PRAGMA, постоянные соединения, повтор записи)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=4, help='Количество пишущих потоков')
+        parser.add_argument('--readers', type=int, default=8, help='Количество читающих потоков')
+        parser.add_argument('--seconds', type=float, default=5, help='Длительность нагрузки в каждом режиме, с')
+
+    def handle(self, *args, **options):
+        if connections['default'].vendor != 'sqlite':
+            raise CommandError('Сравнение выполняется только для базы SQLite')
+        if options['writers'] < 1 or options['readers'] < 0 or options['seconds'] <= 0:
+            raise CommandError('Нужен хотя бы один пишущий поток и положительная длительность')
+        machine_ids = list(Machine.objects.values_list('pk', flat=True))
+        claim_ids = list(Claim.objects.values_list('pk', flat=True))
+        type_ids = list(TypeMaintenance.objects.values_list('pk', flat=True))
+        company_ids = list(MaintenanceCompany.objects.values_list('pk', flat=True))
+        if not (machine_ids and type_ids and company_ids):
+            raise CommandError('В базе нет машин или справочников для записи ТО')
+        self.data = machine_ids, claim_ids, type_ids, company_ids
+
+        settings_dict = connections['default'].settings_dict
+        source, conn_max_age = settings_dict['NAME'], settings_dict.get('CONN_MAX_AGE', 0)
+        connections.close_all()
+        self.stdout.write(
+            f'Пишущих потоков: {options["writers"]}, читающих: {options["readers"]}, {options["seconds"]} с на режим'
+        )
+        try:
+            for name, production, max_age, retries in MODES:
+                path = _copy_database(source)
+                # Новые соединения всех потоков открываются к копии базы
+                settings_dict['NAME'], settings_dict['CONN_MAX_AGE'] = path, max_age
+                overrides = {'SILANT_SQLITE_PRODUCTION': production}
+                if retries is not None:
+                    overrides['SILANT_DB_LOCK_RETRIES'] = retries
+                try:
+                    with override_settings(**overrides):
+                        self.report(name, self.run(options))
+                finally:
+                    connections.close_all()
+                    _remove_database(path)
+        finally:
+            settings_dict['NAME'], settings_dict['CONN_MAX_AGE'] = source, conn_max_age
+
+    def write(self):
+        machine_ids, claim_ids, type_ids, company_ids = self.data
+        if claim_ids and random.random() < 0.5:
+            claim = Claim.objects.select_related('machine').get(pk=random.choice(claim_ids))
+            claim.repair_parts = f'нагрузка {random.random()}'
+            claim.save()
+        else:
+            machine = Machine.objects.get(pk=random.choice(machine_ids))
+            Maintenance(
+                type_id=random.choice(type_ids), maintenance_date=machine.shipment_date,
+                operating_time=random.randint(0, 5000), order_number='нагрузка', order_date=machine.shipment_date,
+                maintenance_company_id=random.choice(company_ids), machine=machine,
+            ).save()
+
+    def read(self):
+        machine_ids = self.data[0]
+        list(
+            Maintenance.objects.filter(machine_id=random.choice(machine_ids))
+            .select_related('type', 'maintenance_company', 'machine', 'service_company')
+            .order_by('-maintenance_date')[:50]
+        )
+        list(Machine.objects.select_related('model_equipment', 'client', 'service_company').order_by('-shipment_date')[:50])
+
+    def run(self, options):
+        deadline = time.perf_counter() + options['seconds']
+        results = {'write': [], 'read': [], 'write_errors': 0, 'read_errors': 0}
+        lock = threading.Lock()
+
+        def worker(operation, kind):
+            latencies, errors = [], 0
+            try:
+                while time.perf_counter() < deadline:
+                    started = time.perf_counter()
+                    try:
+                        operation()
+                        latencies.append(time.perf_counter() - started)
+                    except OperationalError:
+                        errors += 1
+                    # Конец «запроса»: без постоянных соединений соединение закрывается
+                    close_old_connections()
+            finally:
+                connections.close_all()
+            with lock:
+                results[kind].extend(latencies)
+                results[f'{kind}_errors'] += errors
+
+        threads = [threading.Thread(target=worker, args=(self.write, 'write')) for _ in range(options['writers'])]
+        threads += [threading.Thread(target=worker, args=(self.read, 'read')) for _ in range(options['readers'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        results['elapsed'] = time.perf_counter() - started
+        return results
+
+    def report(self, name, results):
+        elapsed = results['elapsed']
+        self.stdout.write(
+            f'{name:<17} запись {len(results["write"]) / elapsed:7.1f}/с '
+            f'(p95 {_percentile(results["write"], 0.95) * 1000:7.1f} мс, ошибок блокировки: {results["write_errors"]})  '
+            f'чтение {len(results["read"]) / elapsed:7.1f}/с '
+            f'(p50 {statistics.median(results["read"] or [0]) * 1000:6.1f} мс, '
+            f'p95 {_percentile(results["read"], 0.95) * 1000:6.1f} мс, ошибок: {results["read_errors"]})'
+        )
@@ -0,0 +1,187 @@
+import datetime
+import json
+import platform
+import statistics
+import subprocess
+import time
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client as TestClient
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from mySilant.models import Machine, Maintenance, Claim, Client, ServiceCompany, TypeMaintenance, RefusalNode
+
+# Сценарии: название, пользователь (guest, admin, client, service_company), адрес с подстановками из _fixtures
+SCENARIOS = [
+    ('guest.serial_lookup', 'guest', '/silant/machines/?number_machine={serial}'),
+    ('guest.api_serial_lookup', 'guest', '/api/api/machines/?number_machine={serial}'),
+    ('admin.machine_list', 'admin', '/silant/machines/'),
+    ('client.machine_list', 'client', '/silant/machines/'),
+    ('service_company.machine_list', 'service_company', '/silant/machines/'),
+    ('admin.maintenance_list_filtered', 'admin', '/silant/maintenances/?type={type}'),
+    ('service_company.maintenance_list_filtered', 'service_company', '/silant/maintenances/?type={type}'),
+    ('admin.claim_list_filtered', 'admin', '/silant/claims/?refusal_node={refusal_node}'),
+    ('client.claim_list_filtered', 'client', '/silant/claims/?refusal_node={refusal_node}'),
+    ('admin.api_machine_list', 'admin', '/api/api/machines/'),
+    ('admin.api_maintenance_list_cursor', 'admin', '/api/api/maintenance/?pagination=cursor&page_size=100'),
+    ('client.api_claim_list', 'client', '/api/api/claims/'),
+    ('admin.api_machine_retrieve', 'admin', '/api/api/machines/{machine}/'),
+    ('admin.api_claim_retrieve', 'admin', '/api/api/claims/{claim}/'),
+    ('admin.machine_create_form', 'admin', '/silant/machines/create/'),
+    ('admin.maintenance_create_form', 'admin', '/silant/maintenances/create/'),
+    ('admin.claim_create_form', 'admin', '/silant/claims/create/'),
+]
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+def _percentile(values, percent):
+    # Ближайший ранг: значение, не меньше которого percent% замеров
+    values = sorted(values)
+    return values[max(int(round(len(values) * percent / 100)) - 1, 0)]
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, cwd=settings.BASE_DIR, timeout=5,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _owner_user(model, related_name):
+    # Пользователь клиента (сервисной компании) с наибольшим числом машин
+    owner = model.objects.annotate(machine_count=Count(related_name)).order_by('-machine_count', 'pk').first()
+    return owner.user_link if owner is not None else None
+
+
+def _fixtures():
+    """
+    Пользователи ролей и значения для подстановки в адреса сценариев
+    """
+    machine = Machine.objects.order_by('pk').first()
+    maintenance_type = TypeMaintenance.objects.order_by('pk').first()
+    refusal_node = RefusalNode.objects.order_by('pk').first()
+    claim = Claim.objects.order_by('pk').first()
+    if None in (machine, maintenance_type, refusal_node, claim) or not Maintenance.objects.exists():
+        raise CommandError('В базе нет машин, ТО или рекламаций: создайте их командой generate_fleet')
+    users = {
+        'guest': None,
+        'admin': User.objects.filter(is_superuser=True).order_by('pk').first(),
+        'client': _owner_user(Client, 'machine'),
+        'service_company': _owner_user(ServiceCompany, 'machine'),
+    }
+    values = {
+        'serial': machine.number_machine[:max(len(machine.number_machine) - 2, 1)],
+        'type': maintenance_type.pk,
+        'refusal_node': refusal_node.pk,
+        'machine': machine.pk,
+        'claim': claim.pk,
+    }
+    return users, values
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет основные страницы и методы API (поиск машины, списки по ролям, фильтры, API, формы): '
+        'процентили времени ответа и количество SQL-запросов в JSON для сравнения между версиями'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20, help='Количество замеров каждого сценария')
+        parser.add_argument('--warmup', type=int, default=2, help='Количество запросов перед замерами')
+        parser.add_argument('--only', help='Только сценарии, в названии которых есть эта строка')
+        parser.add_argument('--no-cache', action='store_true', help='Без кэша (DummyCache)')
+        parser.add_argument('--output', help='Файл для результата (по умолчанию - вывод в консоль)')
+        parser.add_argument('--compare', help='Файл с предыдущим результатом для сравнения')
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1 or options['warmup'] < 0:
+            raise CommandError('--repeat должен быть больше нуля, --warmup - не меньше нуля')
+        previous = None
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as file:
+                previous = json.load(file)
+        users, values = _fixtures()
+        scenarios = [scenario for scenario in SCENARIOS if not options['only'] or options['only'] in scenario[0]]
+
+        overrides = {'ALLOWED_HOSTS': ['*'], 'SILANT_SLOW_REQUEST_MS': float('inf')}
+        if options['no_cache']:
+            overrides['CACHES'] = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+        results = {}
+        with override_settings(**overrides):
+            clients = {}
+            for role, user in users.items():
+                clients[role] = TestClient()
+                if user is not None:
+                    clients[role].force_login(user)
+            for name, role, url in scenarios:
+                if role != 'guest' and users[role] is None:
+                    self.stderr.write(f'{name}: нет пользователя с ролью {role}, пропущено')
+                    continue
+                results[name] = self.measure(clients[role], url.format(**values), options)
+
+        report = {
+            'meta': {
+                'commit': _git_commit(),
+                'created': datetime.datetime.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'cache': not options['no_cache'],
+                'repeat': options['repeat'],
+                'rows': {
+                    'machines': Machine.objects.count(),
+                    'maintenances': Maintenance.objects.count(),
+                    'claims': Claim.objects.count(),
+                },
+            },
+            'scenarios': results,
+        }
+        content = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(content)
+        else:
+            self.stdout.write(content)
+        if previous is not None:
+            self.compare(previous, report)
+
+    def measure(self, client, url, options):
+        for _ in range(options['warmup']):
+            client.get(url)
+        timings, queries = [], []
+        for _ in range(options['repeat']):
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = client.get(url)
+                timings.append((time.perf_counter() - started) * 1000)
+            queries.append(len(captured))
+        result = {'url': url, 'status': response.status_code}
+        result.update({f'p{percent}_ms': round(_percentile(timings, percent), 2) for percent in PERCENTILES})
+        result['mean_ms'] = round(statistics.mean(timings), 2)
+        result['max_ms'] = round(max(timings), 2)
+        result['queries'] = statistics.median_high(queries)
+        return result
+
+    def compare(self, previous, report):
+        # Вывод в stderr, чтобы не смешивать с JSON в stdout
+        before, after = previous.get('scenarios', {}), report['scenarios']
+        self.stderr.write(f'Сравнение с {previous.get("meta", {}).get("commit")} ({previous.get("meta", {}).get("created")})')
+        for name, result in after.items():
+            old = before.get(name)
+            if old is None:
+                self.stderr.write(f'{name:<44} новый сценарий')
+                continue
+            changes = '  '.join(
+                f'{key} {old[key]:.1f} -> {result[key]:.1f} ({(result[key] - old[key]) / old[key] * 100:+.0f}%)'
+                if old[key] else f'{key} {old[key]:.1f} -> {result[key]:.1f}'
+                for key in ('p50_ms', 'p95_ms')
+            )
+            self.stderr.write(f'{name:<44} {changes}  SQL {old["queries"]} -> {result["queries"]}')
@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from mySilant.fetch_plans import (
+    apply_fetch_plan, MACHINE_LIST_PLAN, MAINTENANCE_LIST_PLAN, CLAIM_LIST_PLAN
+)
+from mySilant.models import Machine, Maintenance, Claim
+from mySilant.roles import UserRole, ROLE_ADMIN, ROLE_CLIENT, ROLE_SERVICE_COMPANY, scope_queryset
+
+# Списки, для которых проверяется план запроса: модель, сортировка, план выборки, размер страницы
+LISTS = [
+    ('MachineList', Machine, ('shipment_date',), MACHINE_LIST_PLAN, 5),
+    ('MaintenanceList', Maintenance, ('maintenance_date',), MAINTENANCE_LIST_PLAN, 15),
+    ('ClaimList', Claim, ('refusal_date',), CLAIM_LIST_PLAN, 10),
+    ('MachineViewSet cursor', Machine, ('shipment_date', 'id'), None, 10),
+    ('MaintenanceViewSet cursor', Maintenance, ('maintenance_date', 'id'), None, 10),
+    ('ClaimViewSet cursor', Claim, ('refusal_date', 'id'), None, 10),
+]
+
+ROLES = [
+    UserRole(ROLE_ADMIN),
+    UserRole(ROLE_CLIENT, client_id=1),
+    UserRole(ROLE_SERVICE_COMPANY, service_company_id=1),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Выводит EXPLAIN QUERY PLAN для страниц списков машин, ТО и рекламаций по каждой роли '
+        'и проверяет, что сортировка выполняется по индексу, а не через временное B-дерево'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-plans', action='store_true', help='Выводить план запроса полностью')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Проверка рассчитана на EXPLAIN QUERY PLAN SQLite')
+        failed = []
+        for name, model, ordering, plan, page_size in LISTS:
+            for role in ROLES:
+                queryset = apply_fetch_plan(scope_queryset(model.objects.order_by(*ordering), role), plan)
+                query_plan = queryset[:page_size].explain()
+                temp_sort = 'USE TEMP B-TREE' in query_plan
+                label = f'{name} [{role.role}]'
+                if temp_sort:
+                    failed.append(label)
+                    self.stdout.write(self.style.ERROR(f'{label}: сортировка через временное B-дерево'))
+                else:
+                    self.stdout.write(self.style.SUCCESS(f'{label}: сортировка по индексу'))
+                if temp_sort or options['verbose_plans']:
+                    self.stdout.write(query_plan)
+        if failed:
+            raise CommandError(f'Запросы без индекса для сортировки: {", ".join(failed)}')
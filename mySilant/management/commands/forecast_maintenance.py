@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from mySilant.forecast import refresh_forecasts
+from mySilant.list_cache import invalidate_all_lists
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает прогноз ТО (ожидаемые наработка и дата следующего ТО каждого вида) по истории ТО машин. '
+        'Нужна после загрузки данных в обход моделей и для ежедневного пересчета всего парка'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('machines', nargs='*', type=int, help='id машин (по умолчанию - все машины)')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        count = refresh_forecasts(options['machines'] or None)
+        if options['machines']:
+            invalidate_all_lists()
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано прогнозов: {count}, за {time.monotonic() - started:.1f} с'
+        ))
@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from mySilant.fleet import FleetGenerator
+
+
+class Command(BaseCommand):
+    help = (
+        'Создает синтетический парк машин с ТО и рекламациями, распределенный по клиентам и сервисным компаниям. '
+        'Для замеров производительности: python manage.py generate_fleet --machines 50000'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--machines', type=int, default=1000, help='Количество машин')
+        parser.add_argument('--maintenances', type=int, default=20, help='Количество ТО на машину')
+        parser.add_argument('--claims', type=int, default=3, help='Количество рекламаций на машину')
+        parser.add_argument('--clients', type=int, default=200, help='Количество клиентов')
+        parser.add_argument('--service-companies', type=int, default=20, help='Количество сервисных компаний')
+        parser.add_argument('--seed', type=int, default=1, help='Начальное значение генератора случайных чисел')
+        parser.add_argument('--prefix', default='SYN', help='Начало заводских номеров и имен пользователей')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Количество машин в одной транзакции')
+
+    def handle(self, *args, **options):
+        if options['machines'] < 1 or options['batch_size'] < 1:
+            raise CommandError('--machines и --batch-size должны быть больше нуля')
+        if options['clients'] < 1 or options['service_companies'] < 1:
+            raise CommandError('Нужен хотя бы один клиент и одна сервисная компания')
+        if options['maintenances'] < 0 or options['claims'] < 0:
+            raise CommandError('Количество ТО и рекламаций не может быть отрицательным')
+        started = time.monotonic()
+        try:
+            generator = FleetGenerator(
+                options['machines'], maintenances=options['maintenances'], claims=options['claims'],
+                clients=options['clients'], service_companies=options['service_companies'], seed=options['seed'],
+                prefix=options['prefix'], batch_size=options['batch_size'],
+            ).run()
+        except ValueError as error:
+            raise CommandError(str(error))
+        created = generator.created
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано машин: {created["machines"]}, ТО: {created["maintenances"]}, рекламаций: {created["claims"]} '
+            f'за {time.monotonic() - started:.1f} с'
+        ))
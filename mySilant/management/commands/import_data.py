@@ -0,0 +1,68 @@
+import csv
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from mySilant.importers import IMPORTERS, read_csv, read_xlsx
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает машины, ТО или рекламации из CSV или XLSX. Первая строка файла - имена полей модели; '
+        'справочники указываются по названию, машина в ТО и рекламациях - по заводскому номеру'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('entity', choices=sorted(IMPORTERS), help='Что загружаем')
+        parser.add_argument('path', help='Путь к файлу .csv или .xlsx')
+        parser.add_argument('--format', choices=['csv', 'xlsx'], help='Формат файла (по умолчанию - по расширению)')
+        parser.add_argument('--delimiter', default=',', help='Разделитель полей CSV')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Количество записей в одной транзакции')
+        parser.add_argument('--errors', help='Куда записать отчет об ошибках (CSV), по умолчанию - в stderr')
+        parser.add_argument('--dry-run', action='store_true', help='Только проверить файл, ничего не записывая')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть больше нуля')
+        file_format = options['format'] or options['path'].rsplit('.', 1)[-1].lower()
+        if file_format == 'csv':
+            rows = read_csv(options['path'], delimiter=options['delimiter'])
+        elif file_format == 'xlsx':
+            try:
+                import openpyxl  # noqa: F401
+            except ImportError:
+                raise CommandError('Для загрузки XLSX установите пакет openpyxl')
+            rows = read_xlsx(options['path'])
+        else:
+            raise CommandError('Укажите формат файла: --format csv или --format xlsx')
+
+        started = time.monotonic()
+        try:
+            importer = IMPORTERS[options['entity']](
+                batch_size=options['batch_size'], dry_run=options['dry_run']
+            ).run(rows)
+        except (OSError, UnicodeDecodeError) as error:
+            raise CommandError(f'Не удалось прочитать файл: {error}')
+        elapsed = time.monotonic() - started
+
+        if importer.errors:
+            self.write_errors(importer.errors, options['errors'])
+        action = 'Проверено' if options['dry_run'] else 'Загружено'
+        self.stdout.write(self.style.SUCCESS(
+            f'{action} записей: {importer.created}, строк с ошибками: {len(importer.errors)}, за {elapsed:.1f} с'
+        ))
+
+    def write_errors(self, errors, path):
+        if path:
+            with open(path, 'w', newline='', encoding='utf-8') as file:
+                self._write_errors(file, errors)
+            self.stdout.write(f'Отчет об ошибках: {path}')
+        else:
+            self._write_errors(sys.stderr, errors)
+
+    @staticmethod
+    def _write_errors(file, errors):
+        writer = csv.writer(file)
+        writer.writerow(['line', 'error'])
+        writer.writerows(errors)
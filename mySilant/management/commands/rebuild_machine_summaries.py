@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from mySilant.summaries import refresh_machine_summaries
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает сводки по машинам (последнее ТО, наработка, рекламации, простой) из таблиц ТО и рекламаций. '
+        'Нужна после загрузки данных в обход моделей и для сверки с накопленными изменениями'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('machines', nargs='*', type=int, help='id машин (по умолчанию - все машины)')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        count = refresh_machine_summaries(options['machines'] or None)
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано сводок: {count}, за {time.monotonic() - started:.1f} с'
+        ))
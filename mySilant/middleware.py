@@ -0,0 +1,146 @@
+import json
+import logging
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.utils.functional import SimpleLazyObject
+
+from .profiling import Capture, requested_mode, requested_switch
+from .roles import get_user_role
+from .timing import start_request_timings, stop_request_timings, view_name
+
+timing_logger = logging.getLogger('mySilant.timing')
+
+
+def _is_staff(request):
+    # Пользователь загружается при первом обращении (AuthenticationMiddleware) - под ASGI только через sync_to_async
+    user = getattr(request, 'user', None)
+    return user is not None and user.is_staff
+
+
+class RoleMiddleware:
+    """
+    Привязывает к запросу роль пользователя (request.role). Роль вычисляется при первом обращении.
+    Работает и под WSGI, и под ASGI
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        request.role = SimpleLazyObject(lambda: get_user_role(request.user))
+        return self.get_response(request)
+
+
+class TimingMiddleware:
+    """
+    Замеряет каждый запрос: количество и время SQL-запросов, время представления и отрисовки шаблона
+    (или вывода ответа API). Результат - строка журнала mySilant.timing в JSON и заголовок Server-Timing
+    (для сотрудников, а при SILANT_SERVER_TIMING - для всех); для запросов дольше SILANT_SLOW_REQUEST_MS в журнал
+    пишутся самые долгие SQL-запросы.
+    Должен стоять первым в MIDDLEWARE. Работает и под WSGI, и под ASGI
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.server_timing = getattr(settings, 'SILANT_SERVER_TIMING', False)
+        self.slow_ms = getattr(settings, 'SILANT_SLOW_REQUEST_MS', 500)
+        self.slow_queries = getattr(settings, 'SILANT_SLOW_REQUEST_QUERIES', 5)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request.timings = start_request_timings()
+        try:
+            response = self.get_response(request)
+        finally:
+            stop_request_timings()
+        return self.finish(request, response, self.server_timing or _is_staff(request))
+
+    async def __acall__(self, request):
+        request.timings = start_request_timings()
+        try:
+            response = await self.get_response(request)
+        finally:
+            stop_request_timings()
+        return self.finish(request, response, self.server_timing or await sync_to_async(_is_staff)(request))
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.timings.view_start()
+
+    def process_template_response(self, request, response):
+        # Шаблон (и ответ API) отрисовывается после всех process_template_response - отмечаем начало и конец
+        request.timings.render_start()
+        response.add_post_render_callback(lambda rendered: request.timings.render_end())
+        return response
+
+    def finish(self, request, response, server_timing):
+        timings = request.timings
+        record = {
+            'view': view_name(request),
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            **timings.summary(),
+        }
+        if server_timing:
+            # Для потоковых ответов - время до начала передачи
+            response['Server-Timing'] = ', '.join([
+                f'db;dur={record["db_ms"]};desc="{record["queries"]} SQL"',
+                f'view;dur={record["view_ms"]}',
+                f'render;dur={record["render_ms"]}',
+                f'total;dur={record["total_ms"]}',
+            ])
+        # Медленный запрос - одна запись WARNING с самыми долгими SQL, остальные - INFO
+        level = logging.WARNING if record['total_ms'] >= self.slow_ms else logging.INFO
+        if timing_logger.isEnabledFor(level):
+            if level == logging.WARNING:
+                record['slow_queries'] = timings.slowest_queries(self.slow_queries)
+            timing_logger.log(level, json.dumps(record, ensure_ascii=False), extra={'timing': record})
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    Снимает профиль запроса по просьбе сотрудника (is_staff): ?_profile=cpu|memory или заголовок
+    X-Silant-Profile. Снимок сохраняется в SILANT_PROFILE_DIR, его имя - в заголовке ответа X-Silant-Profile.
+    Остальные запросы проходят без замеров. Должен стоять после AuthenticationMiddleware
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        mode = requested_mode(request)
+        if mode is None:
+            return self.get_response(request)
+        with Capture(request, mode) as capture:
+            response = self.get_response(request)
+        response['X-Silant-Profile'] = capture.save(response)
+        return response
+
+    async def __acall__(self, request):
+        mode = requested_switch(request)
+        if mode is not None and not await sync_to_async(_is_staff)(request):
+            mode = None
+        if mode is None:
+            return await self.get_response(request)
+        # Под ASGI профилируется только поток цикла событий
+        with Capture(request, mode) as capture:
+            response = await self.get_response(request)
+        response['X-Silant-Profile'] = capture.save(response)
+        return response
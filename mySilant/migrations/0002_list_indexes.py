@@ -0,0 +1,95 @@
+# Generated by Django 4.2.7 on 2026-10-18 19:11
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.db.models.deletion
+
+
+def fill_client(apps, schema_editor):
+    # Клиент записей о ТО и рекламациях - владелец машины
+    Machine = apps.get_model('mySilant', 'Machine')
+    for model_name in ('Maintenance', 'Claim'):
+        model = apps.get_model('mySilant', model_name)
+        model.objects.update(
+            client_id=Subquery(Machine.objects.filter(pk=OuterRef('machine_id')).values('client_id')[:1])
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mySilant', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='claim',
+            name='client',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='mySilant.client', verbose_name='Клиент'),
+        ),
+        migrations.AddField(
+            model_name='maintenance',
+            name='client',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='mySilant.client', verbose_name='Клиент'),
+        ),
+        migrations.RunPython(fill_client, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='claim',
+            name='client',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='mySilant.client', verbose_name='Клиент'),
+        ),
+        migrations.AlterField(
+            model_name='maintenance',
+            name='client',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='mySilant.client', verbose_name='Клиент'),
+        ),
+        migrations.AlterField(
+            model_name='machine',
+            name='model_engine',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='machines_engine', to='mySilant.engine', verbose_name='Модель двигателя'),
+        ),
+        migrations.AddIndex(
+            model_name='claim',
+            index=models.Index(fields=['refusal_date', 'id'], name='claim_refusal_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='claim',
+            index=models.Index(fields=['machine', 'refusal_date'], name='claim_machine_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='claim',
+            index=models.Index(fields=['client', 'refusal_date'], name='claim_client_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='claim',
+            index=models.Index(fields=['service_company', 'refusal_date'], name='claim_company_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='machine',
+            index=models.Index(fields=['shipment_date', 'id'], name='machine_shipment_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='machine',
+            index=models.Index(fields=['client', 'shipment_date'], name='machine_client_shipment_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='machine',
+            index=models.Index(fields=['service_company', 'shipment_date'], name='machine_company_shipment_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='maintenance',
+            index=models.Index(fields=['maintenance_date', 'id'], name='maintenance_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='maintenance',
+            index=models.Index(fields=['machine', 'maintenance_date'], name='maintenance_machine_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='maintenance',
+            index=models.Index(fields=['client', 'maintenance_date'], name='maintenance_client_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='maintenance',
+            index=models.Index(fields=['service_company', 'maintenance_date'], name='maintenance_company_date_idx'),
+        ),
+    ]
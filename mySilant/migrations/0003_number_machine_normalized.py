@@ -0,0 +1,34 @@
+import re
+
+from django.db import migrations, models
+
+
+def fill_number_machine_normalized(apps, schema_editor):
+    # Заводской номер для поиска: без пробелов и дефисов, в верхнем регистре
+    Machine = apps.get_model('mySilant', 'Machine')
+    machines = list(Machine.objects.only('pk', 'number_machine'))
+    for machine in machines:
+        machine.number_machine_normalized = re.sub(r'[\s-]+', '', machine.number_machine or '').upper()
+    Machine.objects.bulk_update(machines, ['number_machine_normalized'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mySilant', '0002_list_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='machine',
+            name='number_machine_normalized',
+            field=models.CharField(default='', editable=False, max_length=255, verbose_name='Заводской номер машины для поиска'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_number_machine_normalized, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='machine',
+            name='number_machine_normalized',
+            field=models.CharField(db_index=True, editable=False, max_length=255, verbose_name='Заводской номер машины для поиска'),
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 4.2.7 on 2026-10-18 19:23
+
+from django.db import migrations, models
+from django.db.models import Count, Max, OuterRef, Subquery, Sum
+import django.db.models.deletion
+
+
+def fill_machine_summaries(apps, schema_editor):
+    # Сводки по уже существующим машинам - теми же запросами с группировкой, что и rebuild_machine_summaries
+    Machine = apps.get_model('mySilant', 'Machine')
+    Maintenance = apps.get_model('mySilant', 'Maintenance')
+    Claim = apps.get_model('mySilant', 'Claim')
+    MachineSummary = apps.get_model('mySilant', 'MachineSummary')
+    latest = Maintenance.objects.filter(machine=OuterRef('pk')).order_by('-maintenance_date', '-pk')
+    summaries = {
+        pk: MachineSummary(machine_id=pk, last_maintenance_date=last_date, last_maintenance_type_id=last_type)
+        for pk, last_date, last_type in Machine.objects.order_by().annotate(
+            last_date=Subquery(latest.values('maintenance_date')[:1]),
+            last_type=Subquery(latest.values('type_id')[:1]),
+        ).values_list('pk', 'last_date', 'last_type')
+    }
+    for machine_id, operating_time in Maintenance.objects.order_by().values('machine_id').annotate(
+        max_operating_time=Max('operating_time')
+    ).values_list('machine_id', 'max_operating_time'):
+        summaries[machine_id].operating_time = operating_time or 0
+    for machine_id, claim_count, total_downtime, operating_time, last_recovery_date in Claim.objects.order_by().values(
+        'machine_id'
+    ).annotate(
+        claim_count=Count('pk'),
+        total_downtime=Sum('downtime'),
+        max_operating_time=Max('operating_time'),
+        last_recovery_date=Max('recovery_date'),
+    ).values_list('machine_id', 'claim_count', 'total_downtime', 'max_operating_time', 'last_recovery_date'):
+        summary = summaries[machine_id]
+        summary.claim_count = claim_count
+        summary.total_downtime = total_downtime or 0
+        summary.operating_time = max(summary.operating_time, operating_time or 0)
+        summary.last_recovery_date = last_recovery_date
+    MachineSummary.objects.bulk_create(summaries.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mySilant', '0003_number_machine_normalized'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MachineSummary',
+            fields=[
+                ('machine', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='summary', serialize=False, to='mySilant.machine', verbose_name='Машина')),
+                ('last_maintenance_date', models.DateField(db_index=True, null=True, verbose_name='Дата последнего ТО')),
+                ('operating_time', models.IntegerField(db_index=True, default=0, verbose_name='Наработка, м/час')),
+                ('claim_count', models.IntegerField(db_index=True, default=0, verbose_name='Количество рекламаций')),
+                ('total_downtime', models.IntegerField(default=0, verbose_name='Суммарное время простоя')),
+                ('last_recovery_date', models.DateField(db_index=True, null=True, verbose_name='Дата последнего восстановления')),
+                ('last_maintenance_type', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='mySilant.typemaintenance', verbose_name='Вид последнего ТО')),
+            ],
+            options={
+                'verbose_name': 'Сводка по машине',
+                'verbose_name_plural': 'Сводки по машинам',
+            },
+        ),
+        migrations.RunPython(fill_machine_summaries, migrations.RunPython.noop),
+    ]
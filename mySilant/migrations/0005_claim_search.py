@@ -0,0 +1,66 @@
+from django.db import migrations
+
+# Полнотекстовый индекс рекламаций: описание отказа и запасные части (mySilant.search).
+# SQLite - таблица FTS5 поверх mySilant_claim, которую обновляют триггеры; PostgreSQL - вычисляемый столбец
+# tsvector с GIN-индексом. Индекс обновляет сама база - в том числе при bulk_create и каскадном удалении
+SQLITE_FORWARD = [
+    '''CREATE VIRTUAL TABLE "mySilant_claim_fts" USING fts5(
+        refusal_description, repair_parts,
+        content="mySilant_claim", content_rowid="id", tokenize="unicode61 remove_diacritics 2"
+    )''',
+    '''CREATE TRIGGER "mySilant_claim_fts_insert" AFTER INSERT ON "mySilant_claim" BEGIN
+        INSERT INTO "mySilant_claim_fts" (rowid, refusal_description, repair_parts)
+        VALUES (new.id, new.refusal_description, new.repair_parts);
+    END''',
+    '''CREATE TRIGGER "mySilant_claim_fts_delete" AFTER DELETE ON "mySilant_claim" BEGIN
+        INSERT INTO "mySilant_claim_fts" ("mySilant_claim_fts", rowid, refusal_description, repair_parts)
+        VALUES ('delete', old.id, old.refusal_description, old.repair_parts);
+    END''',
+    '''CREATE TRIGGER "mySilant_claim_fts_update" AFTER UPDATE OF refusal_description, repair_parts
+    ON "mySilant_claim" BEGIN
+        INSERT INTO "mySilant_claim_fts" ("mySilant_claim_fts", rowid, refusal_description, repair_parts)
+        VALUES ('delete', old.id, old.refusal_description, old.repair_parts);
+        INSERT INTO "mySilant_claim_fts" (rowid, refusal_description, repair_parts)
+        VALUES (new.id, new.refusal_description, new.repair_parts);
+    END''',
+    # Индекс по уже существующим рекламациям
+    '''INSERT INTO "mySilant_claim_fts" ("mySilant_claim_fts") VALUES ('rebuild')''',
+]
+SQLITE_BACKWARD = [
+    'DROP TRIGGER IF EXISTS "mySilant_claim_fts_insert"',
+    'DROP TRIGGER IF EXISTS "mySilant_claim_fts_delete"',
+    'DROP TRIGGER IF EXISTS "mySilant_claim_fts_update"',
+    'DROP TABLE IF EXISTS "mySilant_claim_fts"',
+]
+POSTGRESQL_FORWARD = [
+    '''ALTER TABLE "mySilant_claim" ADD COLUMN "search_vector" tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('russian', coalesce("refusal_description", '')), 'A')
+        || setweight(to_tsvector('russian', coalesce("repair_parts", '')), 'B')
+    ) STORED''',
+    'CREATE INDEX "claim_search_vector_idx" ON "mySilant_claim" USING gin ("search_vector")',
+]
+POSTGRESQL_BACKWARD = [
+    'DROP INDEX IF EXISTS "claim_search_vector_idx"',
+    'ALTER TABLE "mySilant_claim" DROP COLUMN IF EXISTS "search_vector"',
+]
+
+
+def run_statements(statements):
+    def run(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mySilant', '0004_machine_summary'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_statements({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRESQL_FORWARD}),
+            run_statements({'sqlite': SQLITE_BACKWARD, 'postgresql': POSTGRESQL_BACKWARD}),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 4.2.7 on 2026-10-18 20:02
+
+import re
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_operating_intervals(apps, schema_editor):
+    # Периодичность из названия вида ТО: 'ТО-1 (200 м/час)' -> 200
+    TypeMaintenance = apps.get_model('mySilant', 'TypeMaintenance')
+    for maintenance_type in TypeMaintenance.objects.all():
+        match = re.search(r'(\d+)\s*м/ч', maintenance_type.title)
+        if match:
+            maintenance_type.operating_interval = int(match.group(1))
+            maintenance_type.save(update_fields=['operating_interval'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mySilant', '0005_claim_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='typemaintenance',
+            name='operating_interval',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Периодичность, м/час'),
+        ),
+        migrations.RunPython(fill_operating_intervals, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='MaintenanceForecast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('usage_rate', models.FloatField(verbose_name='Наработка в сутки, м/час')),
+                ('due_operating_time', models.IntegerField(verbose_name='Наработка к ТО, м/час')),
+                ('due_date', models.DateField(db_index=True, verbose_name='Ожидаемая дата ТО')),
+                ('machine', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='maintenance_forecasts', to='mySilant.machine', verbose_name='Машина')),
+                ('type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='mySilant.typemaintenance', verbose_name='Вид ТО')),
+            ],
+            options={
+                'verbose_name': 'Прогноз ТО',
+                'verbose_name_plural': 'Прогнозы ТО',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='maintenanceforecast',
+            constraint=models.UniqueConstraint(fields=('machine', 'type'), name='forecast_machine_type_unique'),
+        ),
+    ]
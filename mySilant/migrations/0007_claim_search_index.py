@@ -0,0 +1,27 @@
+# Generated by Django 4.2.7 on 2026-10-18 20:49
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mySilant', '0006_maintenance_forecast'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClaimSearchIndex',
+            fields=[
+                ('claim', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_index', serialize=False, to='mySilant.claim', verbose_name='Рекламация')),
+                ('document', models.TextField(db_column='mySilant_claim_fts', verbose_name='Индекс')),
+            ],
+            options={
+                'verbose_name': 'Индекс поиска рекламаций',
+                'verbose_name_plural': 'Индекс поиска рекламаций',
+                'db_table': 'mySilant_claim_fts',
+                'managed': False,
+            },
+        ),
+    ]
@@ -1,7 +1,24 @@
+import datetime
+import re
+
 from django.db import models
 from django.contrib.auth.models import User
 from django.contrib import admin
 
+from .database import LockRetryAdminMixin, lock_retry
+
+
+# Наибольший id записи: первичные ключи - знаковые 64-битные целые (SQLite, bigint в PostgreSQL). Больший id из
+# запроса не может совпасть ни с одной записью, а драйвер базы не может его передать (OverflowError)
+MAX_ID = 2 ** 63 - 1
+
+
+def normalize_number_machine(value):
+    """
+    Приводит заводской номер машины к виду для поиска: без пробелов и дефисов, в верхнем регистре
+    """
+    return re.sub(r'[\s-]+', '', value or '').upper()
+
 
 # Модель техники
 class Equipment(models.Model):
@@ -106,6 +123,8 @@ class MaintenanceCompany(models.Model):
 class TypeMaintenance(models.Model):
     title = models.CharField(default='noname', max_length=255, verbose_name='Название')
     description = models.CharField(default='Вид технического обслуживания', max_length=255, verbose_name='Описание')
+    # Через сколько моточасов после предыдущего ТО этого вида наступает следующее; пусто - вид не прогнозируется
+    operating_interval = models.PositiveIntegerField(null=True, blank=True, verbose_name='Периодичность, м/час')
 
     def __str__(self):
         return f'{self.title}'
@@ -159,6 +178,22 @@ class Machine(models.Model):
     options = models.TextField(default='Стандарт', max_length=1000, verbose_name='Комплектация (дополнительные опции)')
     client = models.ForeignKey(Client, on_delete=models.CASCADE, verbose_name='Клиент')
     service_company = models.ForeignKey(ServiceCompany, on_delete=models.CASCADE, verbose_name='Сервисная компания')
+    # Задается в save по заводскому номеру - для поиска по точному совпадению и по началу номера
+    number_machine_normalized = models.CharField(
+        max_length=255, db_index=True, editable=False, verbose_name='Заводской номер машины для поиска'
+    )
+
+    @lock_retry
+    def save(self, *args, **kwargs):
+        self.number_machine_normalized = normalize_number_machine(self.number_machine)
+        super().save(*args, **kwargs)
+        # При смене клиента переносим на него записи о ТО и рекламациях машины
+        Maintenance.objects.filter(machine=self).exclude(client_id=self.client_id).update(client_id=self.client_id)
+        Claim.objects.filter(machine=self).exclude(client_id=self.client_id).update(client_id=self.client_id)
+
+    @lock_retry
+    def delete(self, *args, **kwargs):
+        return super().delete(*args, **kwargs)
 
     def __str__(self):
             return f'{self.number_machine}'
@@ -166,6 +201,12 @@ class Machine(models.Model):
     class Meta:
         verbose_name = 'Машина'
         verbose_name_plural = 'Машины'
+        # Индексы под списки машин: все машины, машины клиента, машины сервисной компании по дате отгрузки
+        indexes = [
+            models.Index(fields=['shipment_date', 'id'], name='machine_shipment_idx'),
+            models.Index(fields=['client', 'shipment_date'], name='machine_client_shipment_idx'),
+            models.Index(fields=['service_company', 'shipment_date'], name='machine_company_shipment_idx'),
+        ]
 
 # Информация об истории проведения технического обслуживания (ТО)
 class Maintenance(models.Model):
@@ -178,17 +219,32 @@ class Maintenance(models.Model):
     machine = models.ForeignKey(Machine, on_delete=models.CASCADE, verbose_name='Машина')
     # Задается в save по машине
     service_company = models.ForeignKey(ServiceCompany, on_delete=models.CASCADE, verbose_name='Сервисная компания')
+    # Задается в save по машине - для выборки ТО клиента без соединения с таблицей машин
+    client = models.ForeignKey(Client, on_delete=models.CASCADE, verbose_name='Клиент')
 
+    @lock_retry
     def save(self, *args, **kwargs):
-        self.service_company = self.machine.service_company   # сервисная компания закреплена за каждой машиной
+        self.service_company_id = self.machine.service_company_id   # сервисная компания закреплена за каждой машиной
+        self.client_id = self.machine.client_id  # клиент - владелец машины
         super().save(*args, **kwargs)
 
+    @lock_retry
+    def delete(self, *args, **kwargs):
+        return super().delete(*args, **kwargs)
+
     def __str__(self):
         return f'{self.machine} - {self.type} - {self.maintenance_date}'
 
     class Meta:
         verbose_name = 'Техническое обслуживание'
         verbose_name_plural = 'Технические обслуживания'
+        # Индексы под списки ТО: все ТО, ТО машины, клиента и сервисной компании по дате проведения
+        indexes = [
+            models.Index(fields=['maintenance_date', 'id'], name='maintenance_date_idx'),
+            models.Index(fields=['machine', 'maintenance_date'], name='maintenance_machine_date_idx'),
+            models.Index(fields=['client', 'maintenance_date'], name='maintenance_client_date_idx'),
+            models.Index(fields=['service_company', 'maintenance_date'], name='maintenance_company_date_idx'),
+        ]
 
 # Информация о заявленных клиентами рекламациях и сроках их устранения
 class Claim(models.Model):
@@ -202,25 +258,113 @@ class Claim(models.Model):
     downtime = models.IntegerField(default=0, verbose_name='Время простоя техники')
     machine = models.ForeignKey(Machine, on_delete=models.CASCADE, verbose_name='Машина')
     service_company = models.ForeignKey(ServiceCompany, on_delete=models.CASCADE, verbose_name='Сервисная компания')
+    # Задается в save по машине - для выборки рекламаций клиента без соединения с таблицей машин
+    client = models.ForeignKey(Client, on_delete=models.CASCADE, verbose_name='Клиент')
 
+    @lock_retry
     def save(self, *args, **kwargs):
         self.downtime = (self.recovery_date - self.refusal_date).days   # время простоя техники в днях
-        self.service_company = self.machine.service_company  # сервисная компания закреплена за каждой машиной
+        self.service_company_id = self.machine.service_company_id  # сервисная компания закреплена за каждой машиной
+        self.client_id = self.machine.client_id  # клиент - владелец машины
         super().save(*args, **kwargs)
 
+    @lock_retry
+    def delete(self, *args, **kwargs):
+        return super().delete(*args, **kwargs)
+
     def __str__(self):
         return f'{self.machine} - {self.refusal_date} - {self.refusal_node}'
 
     class Meta:
         verbose_name = 'Рекламация'
         verbose_name_plural = 'Рекламации'
+        # Индексы под списки рекламаций: все рекламации, рекламации машины, клиента и сервисной компании
+        # по дате отказа
+        indexes = [
+            models.Index(fields=['refusal_date', 'id'], name='claim_refusal_date_idx'),
+            models.Index(fields=['machine', 'refusal_date'], name='claim_machine_date_idx'),
+            models.Index(fields=['client', 'refusal_date'], name='claim_client_date_idx'),
+            models.Index(fields=['service_company', 'refusal_date'], name='claim_company_date_idx'),
+        ]
+
+
+# Сводка по машине: последнее ТО, наработка, рекламации и простой. Обновляется при сохранении и удалении ТО
+# и рекламаций (mySilant/summaries.py), полностью пересчитывается командой rebuild_machine_summaries
+class MachineSummary(models.Model):
+    machine = models.OneToOneField(
+        Machine, on_delete=models.CASCADE, primary_key=True, related_name='summary', verbose_name='Машина'
+    )
+    last_maintenance_date = models.DateField(null=True, db_index=True, verbose_name='Дата последнего ТО')
+    last_maintenance_type = models.ForeignKey(
+        TypeMaintenance, on_delete=models.SET_NULL, null=True, related_name='+', verbose_name='Вид последнего ТО'
+    )
+    operating_time = models.IntegerField(default=0, db_index=True, verbose_name='Наработка, м/час')
+    claim_count = models.IntegerField(default=0, db_index=True, verbose_name='Количество рекламаций')
+    total_downtime = models.IntegerField(default=0, verbose_name='Суммарное время простоя')
+    last_recovery_date = models.DateField(null=True, db_index=True, verbose_name='Дата последнего восстановления')
+
+    @property
+    def has_open_claims(self):
+        # Рекламация открыта, пока не наступила дата восстановления
+        return self.last_recovery_date is not None and self.last_recovery_date > datetime.date.today()
+
+    def __str__(self):
+        return f'{self.machine_id}'
+
+    class Meta:
+        verbose_name = 'Сводка по машине'
+        verbose_name_plural = 'Сводки по машинам'
+
+
+# Прогноз следующего ТО каждого вида по машине: наработка в сутки по истории ТО и ожидаемая дата.
+# Рассчитывается для всего парка командой forecast_maintenance (mySilant/forecast.py), для машины - при изменении ее ТО
+class MaintenanceForecast(models.Model):
+    machine = models.ForeignKey(
+        Machine, on_delete=models.CASCADE, related_name='maintenance_forecasts', verbose_name='Машина'
+    )
+    type = models.ForeignKey(TypeMaintenance, on_delete=models.CASCADE, related_name='+', verbose_name='Вид ТО')
+    usage_rate = models.FloatField(verbose_name='Наработка в сутки, м/час')
+    due_operating_time = models.IntegerField(verbose_name='Наработка к ТО, м/час')
+    due_date = models.DateField(db_index=True, verbose_name='Ожидаемая дата ТО')
+
+    def __str__(self):
+        return f'{self.machine_id} - {self.type_id} - {self.due_date}'
+
+    class Meta:
+        verbose_name = 'Прогноз ТО'
+        verbose_name_plural = 'Прогнозы ТО'
+        constraints = [
+            models.UniqueConstraint(fields=['machine', 'type'], name='forecast_machine_type_unique'),
+        ]
+
+
+# Полнотекстовый индекс рекламаций в SQLite - таблица FTS5 из миграции 0005_claim_search, которую обновляют триггеры.
+# Модель нужна только для соединения с рекламациями при поиске (mySilant/search.py): Django таблицу не создает
+class ClaimSearchIndex(models.Model):
+    claim = models.OneToOneField(
+        Claim, on_delete=models.DO_NOTHING, primary_key=True, db_column='rowid', db_constraint=False,
+        related_name='search_index', verbose_name='Рекламация'
+    )
+    # Скрытый столбец FTS5 с именем таблицы: левая часть MATCH и первый аргумент bm25
+    document = models.TextField(db_column='mySilant_claim_fts', verbose_name='Индекс')
+
+    class Meta:
+        managed = False
+        db_table = 'mySilant_claim_fts'
+        verbose_name = 'Индекс поиска рекламаций'
+        verbose_name_plural = 'Индекс поиска рекламаций'
+
+
+# Машины в админке: запись повторяется при блокировке базы
+class MachineAdmin(LockRetryAdminMixin, admin.ModelAdmin):
+    pass
 
 
 # Исключаем из админки поля модели Maintenance, которые вычисляются автоматически или задаются в других моделях
-class MaintenanceAdmin(admin.ModelAdmin):
-    exclude = ['service_company']
+class MaintenanceAdmin(LockRetryAdminMixin, admin.ModelAdmin):
+    exclude = ['service_company', 'client']
 
 
 # Исключаем из админки поля модели Claim, которые вычисляются автоматически или задаются в других моделях
-class ClaimAdmin(admin.ModelAdmin):
-    exclude = ['downtime', 'service_company']
+class ClaimAdmin(LockRetryAdminMixin, admin.ModelAdmin):
+    exclude = ['downtime', 'service_company', 'client']
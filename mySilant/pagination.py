@@ -0,0 +1,193 @@
+import datetime
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+from rest_framework import pagination
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param, remove_query_param
+
+from .models import MAX_ID
+
+
+def requested_page_size(request, default, cutoff, param='page_size'):
+    """
+    Размер страницы из параметра запроса (?page_size=), не больше cutoff. Без параметра, при нуле,
+    отрицательном или нечисловом значении - default
+    """
+    try:
+        page_size = int(request.query_params[param])
+    except (KeyError, ValueError):
+        return default
+    return min(page_size, cutoff) if page_size > 0 else default
+
+
+class KeysetPagination(BasePagination):
+    """
+    Постраничный вывод по ключу (keyset): страница выбирается условием по (дата, id) последней
+    записи предыдущей страницы, без COUNT(*) и без OFFSET
+    """
+    ordering_field = None  # поле даты, по которому упорядочены записи; id - для однозначности порядка
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = getattr(settings, 'SILANT_API_MAX_PAGE_SIZE', 1000)
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Некорректный курсор'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.set_page(list(self.page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        То же, что paginate_queryset, но записи страницы читаются асинхронным ORM
+        """
+        return self.set_page([obj async for obj in self.page_queryset(queryset, request)])
+
+    def page_queryset(self, queryset, request):
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.cursor = self.decode_cursor(request)
+        self.reverse = self.cursor is not None and self.cursor['r']
+
+        field = self.ordering_field
+        if self.reverse:
+            queryset = queryset.order_by(f'-{field}', '-id')
+        else:
+            queryset = queryset.order_by(field, 'id')
+        if self.cursor is not None:
+            lookup = 'lt' if self.reverse else 'gt'
+            queryset = queryset.filter(
+                Q(**{f'{field}__{lookup}': self.cursor['v']})
+                | Q(**{field: self.cursor['v'], f'id__{lookup}': self.cursor['id']})
+            )
+        # Берем на одну запись больше, чтобы узнать, есть ли следующая страница
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, results):
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if self.reverse:
+            results.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.cursor is not None
+        self.page = results
+        return results
+
+    def get_page_size(self, request):
+        return requested_page_size(request, self.page_size, self.max_page_size, self.page_size_query_param)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            cursor = json.loads(urlsafe_b64decode(encoded.encode('ascii')))
+            # Курсор приходит от клиента: дата и id проверяются до запроса к базе
+            value, pk, reverse = datetime.date.fromisoformat(cursor['v']), int(cursor['id']), bool(cursor['r'])
+        except (TypeError, ValueError, KeyError, UnicodeEncodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not 0 < pk <= MAX_ID:
+            raise NotFound(self.invalid_cursor_message)
+        return {'v': value, 'id': pk, 'r': reverse}
+
+    def encode_cursor(self, obj, reverse):
+        cursor = {'v': getattr(obj, self.ordering_field).isoformat(), 'id': obj.pk, 'r': int(reverse)}
+        encoded = urlsafe_b64encode(json.dumps(cursor, separators=(',', ':')).encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if not self.page:
+            # Пустая страница при движении назад - возвращаемся к началу списка
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+# Машины - по дате отгрузки
+class MachineKeysetPagination(KeysetPagination):
+    ordering_field = 'shipment_date'
+
+
+# ТО - по дате проведения
+class MaintenanceKeysetPagination(KeysetPagination):
+    ordering_field = 'maintenance_date'
+
+
+# Рекламации - по дате отказа
+class ClaimKeysetPagination(KeysetPagination):
+    ordering_field = 'refusal_date'
+
+
+class PageNumberPagination(pagination.PageNumberPagination):
+    """
+    Постраничный вывод по номеру страницы (по умолчанию в API) с асинхронным вариантом для ASGI
+    """
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        То же, что paginate_queryset, но количество записей и записи страницы читаются асинхронным ORM
+        """
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        self.request = request
+        paginator = self.django_paginator_class(queryset, page_size)
+        paginator.count = await queryset.acount()  # дальше Paginator не обращается к базе за количеством
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(page_number=page_number, message=str(exc)))
+        self.page.object_list = [obj async for obj in self.page.object_list]
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+        return list(self.page)
+
+
+class KeysetPaginationMixin:
+    """
+    Включает постраничный вывод по ключу, если клиент API запросил его параметром ?pagination=cursor
+    (или передал курсор); иначе используется постраничный вывод по умолчанию
+    """
+    keyset_pagination_class = None
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            params = self.request.query_params
+            if self.keyset_pagination_class is not None and (
+                    params.get('pagination') == 'cursor' or KeysetPagination.cursor_query_param in params):
+                self._paginator = self.keyset_pagination_class()
+            else:
+                return super().paginator
+        return self._paginator
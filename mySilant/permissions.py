@@ -1,37 +1,59 @@
 from rest_framework import permissions
 
+from .roles import get_user_role, OWNER_FIELDS, ROLE_ADMIN
 
-class IsAdminOrManager(permissions.BasePermission):
+# Проверки прав не обращаются к базе: членство в группе менеджеров и id клиента и сервисной компании
+# пользователя берутся из его роли (один раз за запрос, между запросами - из кэша), а права на записи
+# проверяются сравнением id владельцев в уже загруженных записях
 
-    def has_permission(self, request, view):
-        return request.user.groups.filter(name='Менеджеры').exists()
 
-class IsClient(permissions.BasePermission):
+class RolePermission(permissions.BasePermission):
+    """
+    Права на загруженную запись по роли пользователя (is_allowed). Списки ограничиваются ролью отдельно -
+    scope_queryset в представлениях
+    """
+
+    def is_allowed(self, role, obj):
+        return True
 
     def has_object_permission(self, request, view, obj):
-        return obj.machine.client.user_link == request.user
+        return self.is_allowed(get_user_role(request.user), obj)
 
 
-class IsServiceCompany(permissions.BasePermission):
+class IsAdminOrManager(RolePermission):
 
-    def has_object_permission(self, request, view, obj):
-        return obj.service_company.user_link == request.user
+    def has_permission(self, request, view):
+        return get_user_role(request.user).is_manager
+
+    def is_allowed(self, role, obj):
+        return role.is_manager
+
+
+class IsClient(RolePermission):
 
-class IsAdminOrManagerOrClientOrServiceCompany(permissions.BasePermission):
+    def is_allowed(self, role, obj):
+        client_field = OWNER_FIELDS[type(obj)][0]
+        return role.client_id is not None and getattr(obj, client_field) == role.client_id
+
+
+class IsServiceCompany(RolePermission):
+
+    def is_allowed(self, role, obj):
+        company_field = OWNER_FIELDS[type(obj)][1]
+        return role.service_company_id is not None and getattr(obj, company_field) == role.service_company_id
+
+
+class IsAdminOrManagerOrClientOrServiceCompany(RolePermission):
     """
     Проверяет, является ли пользователь администратором, менеджером, клиентом или сервисной компанией.
     """
-    def has_permission(self, request, view):
-        is_admin_or_manager = IsAdminOrManager().has_permission(request, view)
-        if is_admin_or_manager:
-            return True
+    checks = (IsAdminOrManager(), IsClient(), IsServiceCompany())
 
-        is_client = IsClient().has_permission(request, view)
-        if is_client:
-            return True
-
-        is_service_company = IsServiceCompany().has_permission(request, view)
-        if is_service_company:
-            return True
+    # Чтение открыто всем, как и раньше: незарегистрированные пользователи ищут машины по номеру, остальные записи
+    # ограничены ролью (scope_queryset), поэтому доступ проверяется по записи - в has_object_permission
+    def has_permission(self, request, view):
+        return True
 
-        return False
\ No newline at end of file
+    # Администратору доступны все записи, как и в scope_queryset
+    def is_allowed(self, role, obj):
+        return role.role == ROLE_ADMIN or any(check.is_allowed(role, obj) for check in self.checks)
@@ -0,0 +1,156 @@
+import cProfile
+import datetime
+import itertools
+import json
+import os
+import re
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+
+from django.conf import settings
+
+from .timing import view_name
+
+# Каталог снимков и их наибольшее количество: при переполнении удаляются самые старые (кольцевой буфер)
+PROFILE_DIR = Path(getattr(settings, 'SILANT_PROFILE_DIR', settings.BASE_DIR / 'profiles'))
+PROFILE_LIMIT = getattr(settings, 'SILANT_PROFILE_LIMIT', 50)
+
+# Включение: ?_profile=cpu|memory или заголовок X-Silant-Profile: cpu|memory
+PROFILE_QUERY_PARAM = '_profile'
+PROFILE_HEADER = 'HTTP_X_SILANT_PROFILE'
+PROFILE_MODES = ('cpu', 'memory')
+
+# Строк распределения памяти в снимке
+MEMORY_TOP = 50
+
+# Имя снимка: время, процесс, номер, представление; файлы снимка - <имя>.prof и <имя>.json
+PROFILE_NAME = re.compile(r'^\d{8}-\d{6}-\d+-\d+-[\w.]+$')
+UNSAFE_NAME = re.compile(r'[^\w.]')
+
+_sequence = itertools.count(1)
+_memory_lock = threading.Lock()  # tracemalloc один на процесс - память снимается одним запросом за раз
+
+
+def requested_switch(request):
+    """
+    Режим снятия профиля из переключателя запроса или None. Пользователь не проверяется
+    """
+    mode = request.GET.get(PROFILE_QUERY_PARAM) or request.META.get(PROFILE_HEADER)
+    if not mode:
+        return None
+    return mode if mode in PROFILE_MODES else 'cpu'
+
+
+def requested_mode(request):
+    """
+    Режим снятия профиля, запрошенный сотрудником (is_staff), или None. Пока переключатель не передан,
+    пользователь не загружается и ничего не замеряется
+    """
+    mode = requested_switch(request)
+    if mode is None:
+        return None
+    user = getattr(request, 'user', None)
+    return mode if user is not None and user.is_staff else None
+
+
+class Capture:
+    """
+    Снятие профиля одного запроса: cProfile и, в режиме memory, распределение памяти (tracemalloc)
+    """
+
+    def __init__(self, request, mode):
+        self.request = request
+        self.profile = cProfile.Profile()
+        self.memory = mode == 'memory' and _memory_lock.acquire(blocking=False)
+        self.memory_busy = mode == 'memory' and not self.memory
+
+    def __enter__(self):
+        if self.memory:
+            tracemalloc.start()
+        self.started = time.perf_counter()
+        self.profile.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profile.disable()
+        self.elapsed = time.perf_counter() - self.started
+        self.snapshot = None
+        if self.memory:
+            self.snapshot = tracemalloc.take_snapshot()
+            self.peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            _memory_lock.release()
+
+    def save(self, response):
+        """
+        Записывает снимок в каталог PROFILE_DIR и возвращает его имя
+        """
+        request = self.request
+        view = view_name(request) or 'unknown'
+        name = f'{datetime.datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}-{next(_sequence)}-{UNSAFE_NAME.sub("_", view)}'
+        PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+        self.profile.dump_stats(PROFILE_DIR / f'{name}.prof')
+        info = {
+            'name': name,
+            'view': view,
+            'method': request.method,
+            'path': request.get_full_path(),
+            'user': request.user.get_username(),
+            'status': response.status_code,
+            'duration_ms': round(self.elapsed * 1000, 1),
+        }
+        timings = getattr(request, 'timings', None)
+        if timings is not None:
+            info.update(db_ms=timings.summary()['db_ms'], queries=len(timings.queries))
+        if self.snapshot is not None:
+            info['memory_peak_kb'] = round(self.peak / 1024, 1)
+            info['memory_top'] = [
+                {'line': str(stat.traceback), 'size_kb': round(stat.size / 1024, 1), 'count': stat.count}
+                for stat in self.snapshot.statistics('lineno')[:MEMORY_TOP]
+            ]
+        elif self.memory_busy:
+            info['memory_skipped'] = 'память уже снимается другим запросом'
+        with open(PROFILE_DIR / f'{name}.json', 'w', encoding='utf-8') as file:
+            json.dump(info, file, ensure_ascii=False, indent=2)
+        prune_profiles()
+        return name
+
+
+def list_profiles():
+    """
+    Описания снимков (из .json), новые первыми
+    """
+    if not PROFILE_DIR.is_dir():
+        return []
+    profiles = []
+    for path in sorted(PROFILE_DIR.glob('*.json'), key=os.path.getmtime, reverse=True):
+        try:
+            with open(path, encoding='utf-8') as file:
+                profiles.append(json.load(file))
+        except (OSError, ValueError):
+            continue
+    return profiles
+
+
+def prune_profiles():
+    # Оставляем PROFILE_LIMIT последних снимков
+    stems = sorted({path.stem for path in PROFILE_DIR.glob('*.prof')},
+                   key=lambda stem: os.path.getmtime(PROFILE_DIR / f'{stem}.prof'))
+    for stem in stems[:max(len(stems) - PROFILE_LIMIT, 0)]:
+        for suffix in ('.prof', '.json'):
+            try:
+                os.remove(PROFILE_DIR / f'{stem}{suffix}')
+            except FileNotFoundError:
+                pass
+
+
+def profile_path(name, suffix):
+    """
+    Путь к файлу снимка или None, если имя некорректно или снимка уже нет
+    """
+    if not PROFILE_NAME.match(name) or suffix not in ('.prof', '.json'):
+        return None
+    path = PROFILE_DIR / f'{name}{suffix}'
+    return path if path.is_file() else None
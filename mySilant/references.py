@@ -0,0 +1,85 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .generations import get_generation, bump_generation, generation_cache_timeout
+from .models import (
+    Equipment, Engine, Transmission, DrivingAxle, SteeringAxle, Client, ServiceCompany, MaintenanceCompany,
+    TypeMaintenance, RefusalNode, RecoveryMethod
+)
+from .roles import ROLE_ADMIN
+
+# Время хранения собранного набора справочников в кэше (в секундах), по умолчанию - сутки.
+# При изменении любого справочника кэш сбрасывается сменой поколения
+# (только с общим для процессов кэшем, см. generation_cache_timeout)
+REFERENCES_CACHE_TIMEOUT = generation_cache_timeout(
+    getattr(settings, 'SILANT_REFERENCES_CACHE_TIMEOUT', 60 * 60 * 24)
+)
+
+# Справочники: имя в наборе -> модель
+REFERENCE_MODELS = {
+    'equipment': Equipment,
+    'engine': Engine,
+    'transmission': Transmission,
+    'driving_axle': DrivingAxle,
+    'steering_axle': SteeringAxle,
+    'client': Client,
+    'service_company': ServiceCompany,
+    'maintenance_company': MaintenanceCompany,
+    'type_maintenance': TypeMaintenance,
+    'refusal_node': RefusalNode,
+    'recovery_method': RecoveryMethod,
+}
+
+# Справочники владельцев записей - клиенты и сервисные компании - видят только администраторы и менеджеры
+OWNER_REFERENCES = ('client', 'service_company')
+
+# Поля записи справочника в наборе
+REFERENCE_FIELDS = ('id', 'title', 'description')
+
+
+def has_owner_references(role):
+    return role.role == ROLE_ADMIN or role.is_manager
+
+
+def visible_references(role):
+    """
+    Имена справочников, доступных роли
+    """
+    if has_owner_references(role):
+        return tuple(REFERENCE_MODELS)
+    return tuple(name for name in REFERENCE_MODELS if name not in OWNER_REFERENCES)
+
+
+def build_reference_bundle(names):
+    """
+    Собирает справочники names (по одному запросу на таблицу) в JSON. Версия - хэш содержимого,
+    поэтому она меняется только при реальном изменении данных и различается у наборов с разным составом
+    """
+    references = {
+        name: list(REFERENCE_MODELS[name].objects.order_by('pk').values(*REFERENCE_FIELDS))
+        for name in names
+    }
+    content = json.dumps(references, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    version = hashlib.sha256(content.encode()).hexdigest()[:16]
+    body = f'{{"version":"{version}","references":{content}}}'.encode()
+    return version, body
+
+
+def get_reference_bundle(role):
+    """
+    Версия и тело набора справочников, доступных роли, из кэша
+    """
+    scope = 'all' if has_owner_references(role) else 'public'
+    key = f'silant:references:bundle:{scope}:{get_generation("references")}'
+    bundle = cache.get(key)
+    if bundle is None:
+        bundle = build_reference_bundle(visible_references(role))
+        cache.set(key, bundle, REFERENCES_CACHE_TIMEOUT)
+    return bundle
+
+
+def invalidate_reference_bundle():
+    bump_generation('references')
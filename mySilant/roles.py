@@ -0,0 +1,118 @@
+from collections import namedtuple
+
+from django.conf import settings
+from django.contrib.auth.models import User, Group
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef
+
+from .generations import is_shared_cache
+from .models import Machine, Maintenance, Claim
+
+# Роли пользователей сервиса
+ROLE_GUEST = 'guest'  # незарегистрированный пользователь
+ROLE_ADMIN = 'admin'  # администратор или менеджер - доступны все записи
+ROLE_CLIENT = 'client'  # клиент - доступны записи по его машинам
+ROLE_SERVICE_COMPANY = 'service_company'  # сервисная компания - доступны записи по закрепленным за ней машинам
+ROLE_NONE = 'none'  # зарегистрирован, но не связан ни с клиентом, ни с сервисной компанией
+
+# Название группы менеджеров
+MANAGERS_GROUP = 'Менеджеры'
+
+# Время хранения роли в кэше (в секундах), по умолчанию - сутки. Если кэш не общий для процессов сервера, сброс
+# роли доходит только до одного процесса - тогда роль хранится не дольше ROLE_LOCAL_CACHE_TIMEOUT секунд
+ROLE_LOCAL_CACHE_TIMEOUT = 5
+ROLE_CACHE_TIMEOUT = getattr(settings, 'SILANT_ROLE_CACHE_TIMEOUT', 60 * 60 * 24)
+if not is_shared_cache():
+    ROLE_CACHE_TIMEOUT = min(ROLE_CACHE_TIMEOUT, ROLE_LOCAL_CACHE_TIMEOUT)
+
+# Роль пользователя: название роли, id клиента и id сервисной компании, членство в группе менеджеров
+UserRole = namedtuple(
+    'UserRole', ['role', 'client_id', 'service_company_id', 'is_manager'], defaults=[None, None, False]
+)
+
+GUEST = UserRole(ROLE_GUEST)
+
+# Поля, по которым запись модели привязана к клиенту и к сервисной компании
+OWNER_FIELDS = {
+    Machine: ('client_id', 'service_company_id'),
+    Maintenance: ('client_id', 'service_company_id'),
+    Claim: ('client_id', 'service_company_id'),
+}
+
+
+def _cache_key(user_id):
+    return f'silant:role:{user_id}'
+
+
+def _resolve_role(user_id):
+    """
+    Определяет роль пользователя одним запросом по уникальным индексам user_link клиента и сервисной компании
+    """
+    row = User.objects.filter(pk=user_id).annotate(
+        is_manager=Exists(Group.objects.filter(user=OuterRef('pk'), name=MANAGERS_GROUP))
+    ).values('is_superuser', 'is_staff', 'client__id', 'servicecompany__id', 'is_manager').first()
+    if row is None:
+        return GUEST
+    client_id = row['client__id']
+    service_company_id = row['servicecompany__id']
+    if row['is_superuser'] or row['is_staff']:
+        role = ROLE_ADMIN
+    elif client_id is not None:
+        role = ROLE_CLIENT
+    elif service_company_id is not None:
+        role = ROLE_SERVICE_COMPANY
+    else:
+        role = ROLE_NONE
+    return UserRole(role, client_id, service_company_id, row['is_manager'])
+
+
+def get_user_role(user):
+    """
+    Возвращает роль пользователя. Роль запоминается в объекте пользователя (на время запроса)
+    и в кэше (до изменения клиента, сервисной компании, пользователя или его групп)
+    """
+    if user is None or not user.is_authenticated:
+        return GUEST
+    role = getattr(user, '_silant_role', None)
+    if role is None:
+        key = _cache_key(user.pk)
+        cached = cache.get(key)
+        if cached is None:
+            role = _resolve_role(user.pk)
+            cache.set(key, tuple(role), ROLE_CACHE_TIMEOUT)
+        else:
+            role = UserRole(*cached)
+        user._silant_role = role
+    return role
+
+
+def get_request_role(request):
+    """
+    Возвращает роль, привязанную к запросу в RoleMiddleware, либо вычисляет ее по пользователю
+    """
+    role = getattr(request, 'role', None)
+    if role is None:
+        role = get_user_role(getattr(request, 'user', None))
+    return role
+
+
+def invalidate_user_roles(*user_ids):
+    """
+    Сбрасывает закэшированные роли пользователей
+    """
+    cache.delete_many([_cache_key(user_id) for user_id in user_ids if user_id is not None])
+
+
+def scope_queryset(queryset, role):
+    """
+    Ограничивает queryset записями, доступными роли: админу - все, клиенту - по его машинам,
+    сервисной компании - по закрепленным за ней машинам, остальным - ничего
+    """
+    client_field, company_field = OWNER_FIELDS[queryset.model]
+    if role.role == ROLE_ADMIN:
+        return queryset
+    if role.role == ROLE_CLIENT:
+        return queryset.filter(**{client_field: role.client_id})
+    if role.role == ROLE_SERVICE_COMPANY:
+        return queryset.filter(**{company_field: role.service_company_id})
+    return queryset.none()
@@ -0,0 +1,137 @@
+import random
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class _RoutingState:
+    """
+    Закрепление за основной базой в пределах запроса: pinned - читать из основной базы, wrote - была запись
+    """
+    __slots__ = ('pinned', 'wrote')
+
+    def __init__(self):
+        self.pinned = False
+        self.wrote = False
+
+
+# Состояние текущего запроса (потока или асинхронной задачи). Объект изменяемый, поэтому изменения, сделанные
+# в синхронном коде под sync_to_async, видны и асинхронному middleware. Обращение к ContextVar, в отличие
+# от asgiref Local, дешевое - db_for_write вызывается для каждой записи bulk_create
+_state = ContextVar('silant_routing_state', default=None)
+
+
+def _current_state():
+    state = _state.get()
+    if state is None:
+        state = _RoutingState()
+        _state.set(state)
+    return state
+
+# Cookie, с которой следующие запросы читают из основной базы, пока реплики догоняют записанное
+PIN_COOKIE = 'silant_primary'
+
+
+# Приложения, которые всегда читаются из основной базы: сессии, пользователи, группы и права должны
+# действовать сразу после входа и изменения, не дожидаясь реплик
+PRIMARY_APPS = getattr(settings, 'SILANT_DB_PRIMARY_APPS', ('sessions', 'auth', 'account'))
+
+
+def replicas():
+    return getattr(settings, 'SILANT_DB_REPLICAS', [])
+
+
+def pin_primary(wrote=False):
+    """
+    Все последующие чтения текущего запроса (или команды) идут в основную базу
+    """
+    state = _current_state()
+    state.pinned = True
+    if wrote:
+        state.wrote = True
+
+
+def unpin_primary():
+    """
+    Начинает новый запрос: чтения снова идут в реплики
+    """
+    _state.set(_RoutingState())
+
+
+def is_pinned():
+    return _current_state().pinned
+
+
+class ReplicaRouter:
+    """
+    Запись - в основную базу, чтение - в случайную реплику из SILANT_DB_REPLICAS. После первой записи
+    и внутри транзакции основной базы запрос читает из основной базы (чтение своих записей), как и PRIMARY_APPS
+    """
+
+    def db_for_read(self, model, **hints):
+        names = replicas()
+        if not names or is_pinned() or model._meta.app_label in PRIMARY_APPS:
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:  # транзакция должна видеть свои изменения
+            return DEFAULT_DB_ALIAS
+        return random.choice(names)
+
+    def db_for_write(self, model, **hints):
+        pin_primary(wrote=True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики - копии основной базы, связи между объектами из них допустимы
+        databases = {DEFAULT_DB_ALIAS, *replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схема реплик приходит с основной базы
+        return db not in replicas()
+
+
+class ReplicaMiddleware:
+    """
+    Изменяющие запросы (POST, PUT, PATCH, DELETE) и запросы с cookie PIN_COOKIE работают только с основной базой.
+    Если запрос что-то записал, следующие SILANT_DB_PIN_SECONDS секунд браузер тоже читает из основной базы -
+    например, список после сохранения формы. Работает и под WSGI, и под ASGI
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        self.process_request(request)
+        try:
+            return self.process_response(request, self.get_response(request))
+        finally:
+            unpin_primary()
+
+    async def __acall__(self, request):
+        self.process_request(request)
+        try:
+            return self.process_response(request, await self.get_response(request))
+        finally:
+            unpin_primary()
+
+    def process_request(self, request):
+        unpin_primary()
+        if request.method not in ('GET', 'HEAD', 'OPTIONS') or PIN_COOKIE in request.COOKIES:
+            pin_primary()
+
+    def process_response(self, request, response):
+        if replicas() and _current_state().wrote:
+            response.set_cookie(
+                PIN_COOKIE, '1', max_age=getattr(settings, 'SILANT_DB_PIN_SECONDS', 15), httponly=True, samesite='Lax',
+            )
+        return response
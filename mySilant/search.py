@@ -0,0 +1,91 @@
+import re
+
+from django.db import connections
+from django.db.models import BooleanField, F, FloatField, Func, Lookup, Q, Value
+from django.db.models.expressions import RawSQL
+
+from .models import ClaimSearchIndex
+
+# Полнотекстовый индекс рекламаций (описание отказа и запасные части), см. миграцию 0005_claim_search:
+# в SQLite - виртуальная таблица FTS5, которую триггеры обновляют при добавлении, изменении и удалении рекламаций,
+# в PostgreSQL - вычисляемый столбец tsvector с GIN-индексом
+CLAIM_FTS_TABLE = 'mySilant_claim_fts'
+CLAIM_SEARCH_VECTOR = 'search_vector'
+CLAIM_SEARCH_CONFIG = 'russian'
+
+# Слова запроса; * в конце слова - поиск по началу слова
+TERM = re.compile(r'(\w+)(\*?)')
+
+# Триггеры, которые обновляют индекс SQLite. Пересоздание таблицы рекламаций (AlterField и т.п. в SQLite) их удаляет,
+# поэтому наличие проверяет mySilant.checks
+CLAIM_FTS_TRIGGERS = (f'{CLAIM_FTS_TABLE}_insert', f'{CLAIM_FTS_TABLE}_delete', f'{CLAIM_FTS_TABLE}_update')
+# Строка индекса рекламации (ClaimSearchIndex) - соединение по rowid
+SQLITE_DOCUMENT = 'search_index__document'
+# bm25: чем меньше, тем точнее совпадение; совпадение в описании отказа весит вдвое больше, чем в запасных частях
+SQLITE_WEIGHTS = (Value(2.0), Value(1.0))
+POSTGRESQL_MATCH = f'"mySilant_claim"."{CLAIM_SEARCH_VECTOR}" @@ to_tsquery(\'{CLAIM_SEARCH_CONFIG}\', %s)'
+POSTGRESQL_RANK = f'-ts_rank("mySilant_claim"."{CLAIM_SEARCH_VECTOR}", to_tsquery(\'{CLAIM_SEARCH_CONFIG}\', %s))'
+
+
+class Match(Lookup):
+    """
+    Условие полнотекстового поиска FTS5: <скрытый столбец таблицы индекса> MATCH <запрос>
+    """
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', (*lhs_params, *rhs_params)
+
+
+class Bm25(Func):
+    function = 'bm25'
+    output_field = FloatField()
+
+
+ClaimSearchIndex._meta.get_field('document').register_lookup(Match)
+
+
+def parse_terms(text):
+    """
+    Слова запроса в нижнем регистре с признаком поиска по началу слова: 'Течь масл*' -> [('течь', False), ('масл', True)]
+    """
+    return [(word.lower(), bool(prefix)) for word, prefix in TERM.findall(text or '')]
+
+
+def sqlite_query(terms):
+    # Каждое слово - в кавычках (служебные слова FTS5 не действуют), все слова обязательны
+    return ' '.join(f'"{word}"*' if prefix else f'"{word}"' for word, prefix in terms)
+
+
+def postgresql_query(terms):
+    return ' & '.join(f'{word}:*' if prefix else word for word, prefix in terms)
+
+
+def search_claims(queryset, text):
+    """
+    Рекламации, в описании отказа или запасных частях которых есть все слова запроса, с оценкой совпадения
+    search_rank (чем меньше, тем точнее) - в порядке убывания точности. Сочетается с фильтрами и ролью
+    """
+    terms = parse_terms(text)
+    if not terms:
+        return queryset
+    vendor = connections[queryset.db].vendor
+    if vendor == 'sqlite':
+        # Соединение с индексом: SQLite начинает с MATCH по индексу и находит рекламации по первичному ключу
+        queryset = queryset.filter(**{f'{SQLITE_DOCUMENT}__match': sqlite_query(terms)}).annotate(
+            search_rank=Bm25(F(SQLITE_DOCUMENT), *SQLITE_WEIGHTS)
+        )
+    elif vendor == 'postgresql':
+        query = postgresql_query(terms)
+        queryset = queryset.filter(RawSQL(POSTGRESQL_MATCH, [query], BooleanField())).annotate(
+            search_rank=RawSQL(POSTGRESQL_RANK, [query], FloatField())
+        )
+    else:
+        # Без полнотекстового индекса - поиск подстрок, без оценки
+        condition = Q()
+        for word, prefix in terms:
+            condition &= Q(refusal_description__icontains=word) | Q(repair_parts__icontains=word)
+        return queryset.filter(condition).annotate(search_rank=Value(0.0)).order_by('refusal_date', 'id')
+    return queryset.order_by('search_rank', 'refusal_date', 'id')
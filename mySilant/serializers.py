@@ -1,8 +1,105 @@
+from operator import attrgetter
+
 from rest_framework import serializers
+from rest_framework.settings import api_settings, ISO_8601
+
 from .models import Machine, Maintenance, Claim
 
 
-class MachineSerializer(serializers.ModelSerializer):
+# Развернутый справочник (?expand=): любой справочник - это id, название и описание
+class ReferenceSerializer(serializers.Serializer):
+    id = serializers.IntegerField(read_only=True)
+    title = serializers.CharField(read_only=True)
+    description = serializers.CharField(read_only=True)
+
+
+# Развернутая машина в ТО и рекламациях (?expand=machine)
+class MachineReferenceSerializer(serializers.Serializer):
+    id = serializers.IntegerField(read_only=True)
+    number_machine = serializers.CharField(read_only=True)
+
+
+class ExpandableSerializerMixin:
+    """
+    Поля связанных объектов, которые можно развернуть параметром ?expand= (имя поля -> сериализатор
+    вложенного объекта). Какие поля развернуть, передается в контексте (expand)
+    """
+    expandable_fields = {}
+
+    def get_fields(self):
+        fields = super().get_fields()
+        for name in self.context.get('expand', ()):
+            if name in fields:
+                fields[name] = self.expandable_fields[name](read_only=True)
+        return fields
+
+
+class FieldsetSerializerMixin:
+    """
+    Выводит только поля, переданные в контексте (fieldset) - по параметрам ?fields= и ?omit=
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        fieldset = self.context.get('fieldset')
+        if fieldset is None:
+            return fields
+        return {name: field for name, field in fields.items() if name in fieldset}
+
+
+def _row_getter(field):
+    # Функция, возвращающая значение поля записи так же, как field.to_representation
+    if isinstance(field, serializers.BaseSerializer):
+        nested = RowSerializer(field)
+        get_related = attrgetter(field.source)
+
+        def get_nested(instance):
+            related = get_related(instance)
+            return None if related is None else nested.to_representation(related)
+        return get_nested
+    if isinstance(field, serializers.PrimaryKeyRelatedField) and not field.pk_field:
+        return attrgetter(f'{field.source}_id')
+    if isinstance(field, serializers.DateField) and getattr(field, 'format', api_settings.DATE_FORMAT) == ISO_8601:
+        get_date = attrgetter(field.source)
+        return lambda instance: value.isoformat() if (value := get_date(instance)) else None
+    if type(field) in (serializers.IntegerField, serializers.CharField) and '.' not in field.source:
+        return attrgetter(field.source)
+    # Остальные поля - как в сериализаторе
+    def get(instance):
+        value = field.get_attribute(instance)
+        return None if value is None else field.to_representation(value)
+    return get
+
+
+class RowSerializer:
+    """
+    Быстрый вывод записей только для чтения (списки API). Поля сериализатора разбираются один раз,
+    каждая запись собирается прямым чтением атрибутов - без обхода полей ModelSerializer на каждой строке.
+    Результат совпадает с serializer.data
+    """
+
+    def __init__(self, serializer):
+        self.getters = [(name, _row_getter(field)) for name, field in serializer.fields.items() if not field.write_only]
+
+    def to_representation(self, instance):
+        return {name: get(instance) for name, get in self.getters}
+
+    def many(self, instances):
+        to_representation = self.to_representation
+        return [to_representation(instance) for instance in instances]
+
+
+class MachineSerializer(FieldsetSerializerMixin, ExpandableSerializerMixin, serializers.ModelSerializer):
+    expandable_fields = {
+        'model_equipment': ReferenceSerializer,
+        'model_engine': ReferenceSerializer,
+        'model_transmission': ReferenceSerializer,
+        'model_driving_axle': ReferenceSerializer,
+        'model_steering_axle': ReferenceSerializer,
+        'client': ReferenceSerializer,
+        'service_company': ReferenceSerializer,
+    }
+
     class Meta:
         model = Machine
         fields = [
@@ -27,7 +124,41 @@ class MachineSerializer(serializers.ModelSerializer):
         ]
 
 
-class MaintenanceSerializer(serializers.ModelSerializer):
+# Технические характеристики машины для незарегистрированных пользователей
+class MachinePublicSerializer(FieldsetSerializerMixin, ExpandableSerializerMixin, serializers.ModelSerializer):
+    expandable_fields = {
+        'model_equipment': ReferenceSerializer,
+        'model_engine': ReferenceSerializer,
+        'model_transmission': ReferenceSerializer,
+        'model_driving_axle': ReferenceSerializer,
+        'model_steering_axle': ReferenceSerializer,
+    }
+
+    class Meta:
+        model = Machine
+        fields = [
+            'id',
+            'number_machine',
+            'model_equipment',
+            'model_engine',
+            'number_engine',
+            'model_transmission',
+            'number_transmission',
+            'model_driving_axle',
+            'number_driving_axle',
+            'model_steering_axle',
+            'number_steering_axle',
+        ]
+
+
+class MaintenanceSerializer(FieldsetSerializerMixin, ExpandableSerializerMixin, serializers.ModelSerializer):
+    expandable_fields = {
+        'type': ReferenceSerializer,
+        'maintenance_company': ReferenceSerializer,
+        'machine': MachineReferenceSerializer,
+        'service_company': ReferenceSerializer,
+    }
+
     class Meta:
         model = Maintenance
         fields = [
@@ -43,7 +174,14 @@ class MaintenanceSerializer(serializers.ModelSerializer):
         ]
 
 
-class ClaimSerializer(serializers.ModelSerializer):
+class ClaimSerializer(FieldsetSerializerMixin, ExpandableSerializerMixin, serializers.ModelSerializer):
+    expandable_fields = {
+        'refusal_node': ReferenceSerializer,
+        'recovery_method': ReferenceSerializer,
+        'machine': MachineReferenceSerializer,
+        'service_company': ReferenceSerializer,
+    }
+
     class Meta:
         model = Claim
         fields = [
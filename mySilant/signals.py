@@ -0,0 +1,182 @@
+from django.contrib.auth.models import User, Group
+from django.db.backends.signals import connection_created
+from django.db.models.signals import pre_save, post_save, post_delete, pre_delete, m2m_changed
+from django.dispatch import receiver
+
+from .models import (
+    Client, ServiceCompany, Machine, MachineSummary, Maintenance, Claim, Equipment, Engine, Transmission, DrivingAxle,
+    SteeringAxle, RefusalNode, TypeMaintenance
+)
+from .analytics import invalidate_reliability
+from .database import apply_sqlite_pragmas
+from .forecast import schedule_forecast_refresh, schedule_fleet_forecast_refresh
+from .list_cache import invalidate_lists
+from .references import REFERENCE_MODELS, invalidate_reference_bundle
+from .roles import invalidate_user_roles
+from .summaries import maintenance_added, claim_added, schedule_refresh
+from .timeline import invalidate_timelines
+from .timing import install_query_recorder
+
+
+# Настройка каждого нового соединения с базой: производственный режим SQLite
+connection_created.connect(apply_sqlite_pragmas, dispatch_uid='silant_sqlite_pragmas')
+# Замер SQL-запросов для TimingMiddleware
+connection_created.connect(install_query_recorder, dispatch_uid='silant_query_recorder')
+
+
+# Запоминаем прежнего пользователя клиента/сервисной компании, чтобы сбросить и его роль
+@receiver(pre_save, sender=Client)
+@receiver(pre_save, sender=ServiceCompany)
+def remember_previous_user_link(sender, instance, **kwargs):
+    if instance.pk:
+        instance._previous_user_link_id = sender.objects.filter(pk=instance.pk).values_list(
+            'user_link_id', flat=True
+        ).first()
+
+
+# Изменение клиента или сервисной компании меняет роль связанного пользователя
+@receiver(post_save, sender=Client)
+@receiver(post_save, sender=ServiceCompany)
+@receiver(post_delete, sender=Client)
+@receiver(post_delete, sender=ServiceCompany)
+def invalidate_owner_role(sender, instance, **kwargs):
+    invalidate_user_roles(instance.user_link_id, getattr(instance, '_previous_user_link_id', None))
+
+
+# Изменение пользователя (is_staff, is_superuser) или его удаление
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_role(sender, instance, **kwargs):
+    invalidate_user_roles(instance.pk)
+
+
+# Изменение состава групп пользователя
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidate_group_members_roles(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        # Меняются группы пользователя instance
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            invalidate_user_roles(instance.pk)
+    elif action in ('post_add', 'post_remove'):
+        # Меняются пользователи группы instance
+        invalidate_user_roles(*pk_set)
+    elif action == 'pre_clear':
+        invalidate_user_roles(*instance.user_set.values_list('pk', flat=True))
+
+
+# Переименование или удаление группы меняет членство ее пользователей в группе менеджеров
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def invalidate_group_roles(sender, instance, **kwargs):
+    invalidate_user_roles(*instance.user_set.values_list('pk', flat=True))
+
+
+# Новая машина - пустая сводка
+@receiver(post_save, sender=Machine)
+def create_machine_summary(sender, instance, created, **kwargs):
+    if created:
+        MachineSummary.objects.get_or_create(machine_id=instance.pk)
+
+
+# Прогноз ТО машины пересчитывается при ее сохранении (новая машина, смена даты отгрузки) и при изменении ее ТО
+@receiver(post_save, sender=Machine)
+def refresh_machine_forecast(sender, instance, **kwargs):
+    schedule_forecast_refresh(instance.pk)
+
+
+@receiver(post_save, sender=Maintenance)
+@receiver(post_delete, sender=Maintenance)
+def refresh_maintenance_forecast(sender, instance, **kwargs):
+    schedule_forecast_refresh(instance.machine_id, getattr(instance, '_previous_machine_id', None))
+
+
+# Периодичность вида ТО меняет прогнозы всех машин
+@receiver(post_save, sender=TypeMaintenance)
+@receiver(post_delete, sender=TypeMaintenance)
+def refresh_fleet_forecast(sender, **kwargs):
+    schedule_fleet_forecast_refresh()
+
+
+# Запоминаем прежних клиента и сервисную компанию записи (сбрасываются таблицы списков обоих), а для ТО/рекламации -
+# и прежнюю машину (при переносе на другую машину пересчитываются обе сводки)
+@receiver(pre_save, sender=Machine)
+@receiver(pre_save, sender=Maintenance)
+@receiver(pre_save, sender=Claim)
+def remember_previous_state(sender, instance, **kwargs):
+    if instance.pk:
+        fields = ('client_id', 'service_company_id') if sender is Machine else (
+            'client_id', 'service_company_id', 'machine_id'
+        )
+        previous = sender.objects.filter(pk=instance.pk).values_list(*fields).first()
+        if previous is not None:
+            instance._previous_owner_ids = previous[:2]
+            if sender is not Machine:
+                instance._previous_machine_id = previous[2]
+
+
+# Новое ТО или рекламация учитываются в сводке машины без пересчета, изменение - с пересчетом
+@receiver(post_save, sender=Maintenance)
+@receiver(post_save, sender=Claim)
+def update_machine_summary(sender, instance, created, **kwargs):
+    if created:
+        if sender is Maintenance:
+            maintenance_added(instance)
+        else:
+            claim_added(instance)
+    else:
+        schedule_refresh(instance.machine_id, getattr(instance, '_previous_machine_id', None))
+
+
+@receiver(post_delete, sender=Maintenance)
+@receiver(post_delete, sender=Claim)
+def refresh_machine_summary(sender, instance, **kwargs):
+    schedule_refresh(instance.machine_id)
+
+
+# Аналитика надежности зависит от машин (модели узлов, наработка), ТО (наработка), рекламаций и названий справочников
+@receiver(post_save, sender=Machine)
+@receiver(post_delete, sender=Machine)
+@receiver(post_save, sender=Maintenance)
+@receiver(post_delete, sender=Maintenance)
+@receiver(post_save, sender=Claim)
+@receiver(post_delete, sender=Claim)
+@receiver(post_save, sender=Equipment)
+@receiver(post_save, sender=Engine)
+@receiver(post_save, sender=Transmission)
+@receiver(post_save, sender=DrivingAxle)
+@receiver(post_save, sender=SteeringAxle)
+@receiver(post_save, sender=RefusalNode)
+def invalidate_reliability_cache(sender, **kwargs):
+    invalidate_reliability()
+
+
+# Изменение любого справочника меняет набор справочников
+def invalidate_reference_bundle_cache(sender, **kwargs):
+    invalidate_reference_bundle()
+
+
+for reference_model in REFERENCE_MODELS.values():
+    post_save.connect(invalidate_reference_bundle_cache, sender=reference_model)
+    post_delete.connect(invalidate_reference_bundle_cache, sender=reference_model)
+
+
+# Изменение машины, ТО или рекламации сбрасывает отрисованные таблицы областей видимости записи
+@receiver(post_save, sender=Machine)
+@receiver(post_save, sender=Maintenance)
+@receiver(post_save, sender=Claim)
+@receiver(post_delete, sender=Machine)
+@receiver(post_delete, sender=Maintenance)
+@receiver(post_delete, sender=Claim)
+def invalidate_list_tables(sender, instance, **kwargs):
+    invalidate_lists(
+        (instance.client_id, instance.service_company_id), getattr(instance, '_previous_owner_ids', (None, None))
+    )
+
+
+# Изменение или удаление ТО и рекламаций сбрасывает хронологию машины (и прежней машины при переносе записи)
+@receiver(post_save, sender=Maintenance)
+@receiver(post_save, sender=Claim)
+@receiver(post_delete, sender=Maintenance)
+@receiver(post_delete, sender=Claim)
+def invalidate_machine_timeline(sender, instance, **kwargs):
+    invalidate_timelines(instance.machine_id, getattr(instance, '_previous_machine_id', None))
@@ -0,0 +1,124 @@
+from django.db import transaction
+from django.db.models import BigIntegerField, Case, Count, F, Max, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Greatest
+
+from .analytics import invalidate_reliability
+from .models import Machine, MachineSummary, Maintenance, Claim
+
+# Сколько машин пересчитывается одним набором запросов (ограничение на число параметров в IN)
+REFRESH_CHUNK_SIZE = 500
+
+
+def refresh_machine_summaries(machine_ids=None):
+    """
+    Пересчитывает сводки по машинам из таблиц ТО и рекламаций запросами с группировкой.
+    Без machine_ids пересчитываются все машины
+    """
+    if machine_ids is None:
+        return _refresh(
+            Machine.objects.all(), Maintenance.objects.all(), Claim.objects.all(), MachineSummary.objects.all()
+        )
+    machine_ids = sorted(set(machine_ids))
+    count = 0
+    for start in range(0, len(machine_ids), REFRESH_CHUNK_SIZE):
+        chunk = machine_ids[start:start + REFRESH_CHUNK_SIZE]
+        count += _refresh(
+            Machine.objects.filter(pk__in=chunk),
+            Maintenance.objects.filter(machine_id__in=chunk),
+            Claim.objects.filter(machine_id__in=chunk),
+            MachineSummary.objects.filter(machine_id__in=chunk),
+        )
+    return count
+
+
+def _refresh(machines, maintenances, claims, summaries):
+    # Последнее ТО машины - по индексу (machine, maintenance_date)
+    latest = Maintenance.objects.filter(machine=OuterRef('pk')).order_by('-maintenance_date', '-pk')
+    rows = machines.order_by().annotate(
+        last_date=Subquery(latest.values('maintenance_date')[:1]),
+        last_type=Subquery(latest.values('type_id')[:1]),
+    ).values_list('pk', 'last_date', 'last_type')
+    result = {
+        pk: MachineSummary(machine_id=pk, last_maintenance_date=last_date, last_maintenance_type_id=last_type)
+        for pk, last_date, last_type in rows
+    }
+
+    for machine_id, operating_time in maintenances.order_by().values('machine_id').annotate(
+        max_operating_time=Max('operating_time')
+    ).values_list('machine_id', 'max_operating_time'):
+        if machine_id in result:
+            result[machine_id].operating_time = operating_time or 0
+
+    for machine_id, claim_count, total_downtime, operating_time, last_recovery_date in claims.order_by().values(
+        'machine_id'
+    ).annotate(
+        claim_count=Count('pk'),
+        total_downtime=Sum('downtime'),
+        max_operating_time=Max('operating_time'),
+        last_recovery_date=Max('recovery_date'),
+    ).values_list('machine_id', 'claim_count', 'total_downtime', 'max_operating_time', 'last_recovery_date'):
+        summary = result.get(machine_id)
+        if summary is None:
+            continue
+        summary.claim_count = claim_count
+        summary.total_downtime = total_downtime or 0
+        summary.operating_time = max(summary.operating_time, operating_time or 0)
+        summary.last_recovery_date = last_recovery_date
+
+    with transaction.atomic():
+        summaries.delete()
+        MachineSummary.objects.bulk_create(result.values(), batch_size=1000)
+    # Наработка машин входит в аналитику надежности
+    invalidate_reliability()
+    return len(result)
+
+
+def _not_earlier(field, value):
+    # Значение не раньше текущего значения поля сводки (или поле еще не заполнено)
+    return Q(**{f'{field}__isnull': True}) | Q(**{f'{field}__lte': value})
+
+
+def maintenance_added(maintenance):
+    """
+    Учитывает в сводке новое ТО одним UPDATE, без пересчета истории машины
+    """
+    latest = _not_earlier('last_maintenance_date', maintenance.maintenance_date)
+    updated = MachineSummary.objects.filter(machine_id=maintenance.machine_id).update(
+        operating_time=Greatest('operating_time', Value(maintenance.operating_time)),
+        last_maintenance_date=Case(
+            When(latest, then=Value(maintenance.maintenance_date)), default=F('last_maintenance_date')
+        ),
+        last_maintenance_type_id=Case(
+            When(latest, then=Value(maintenance.type_id)), default=F('last_maintenance_type_id'),
+            output_field=BigIntegerField(),
+        ),
+    )
+    if not updated:
+        refresh_machine_summaries([maintenance.machine_id])
+
+
+def claim_added(claim):
+    """
+    Учитывает в сводке новую рекламацию одним UPDATE, без пересчета истории машины
+    """
+    updated = MachineSummary.objects.filter(machine_id=claim.machine_id).update(
+        claim_count=F('claim_count') + 1,
+        total_downtime=F('total_downtime') + claim.downtime,
+        operating_time=Greatest('operating_time', Value(claim.operating_time)),
+        last_recovery_date=Case(
+            When(_not_earlier('last_recovery_date', claim.recovery_date), then=Value(claim.recovery_date)),
+            default=F('last_recovery_date'),
+        ),
+    )
+    if not updated:
+        refresh_machine_summaries([claim.machine_id])
+
+
+def schedule_refresh(*machine_ids):
+    """
+    Пересчитывает сводки машин после фиксации транзакции: при изменении и удалении ТО и рекламаций,
+    в том числе при каскадном удалении вместе с машиной
+    """
+    machine_ids = [machine_id for machine_id in machine_ids if machine_id is not None]
+    if machine_ids:
+        transaction.on_commit(lambda: refresh_machine_summaries(machine_ids))
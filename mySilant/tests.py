@@ -1,3 +1,791 @@
-from django.test import TestCase
+import datetime
+import io
+import json
+import tempfile
+from base64 import urlsafe_b64encode
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser, Group, User
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.test import AsyncClient, Client, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from . import profiling, timeline
+from .analytics import compute_reliability
+from .autocomplete import encode_cursor as encode_autocomplete_cursor
+from .checks import claim_search_triggers_check
+from .forecast import DEFAULT_USAGE_RATE, refresh_forecasts, submit_fleet_forecast_refresh
+from .filters import MachineFilter, MachinePreviewFilter
+from .generations import get_generation
+from .importers import ClaimImporter, MachineImporter, MaintenanceImporter, RowError
+from .list_cache import UNCACHED_TABLE, table_cache
+from .models import (
+    Machine, Maintenance, Claim, Client as ClientCompany, ServiceCompany, Equipment, Engine, Transmission, DrivingAxle,
+    SteeringAxle, MaintenanceCompany, TypeMaintenance, RefusalNode, RecoveryMethod, MachineAdmin
+)
+from .pagination import ClaimKeysetPagination, requested_page_size
+from .permissions import IsAdminOrManagerOrClientOrServiceCompany
+from .roles import (
+    GUEST, MANAGERS_GROUP, ROLE_ADMIN, ROLE_CLIENT, ROLE_NONE, ROLE_SERVICE_COMPANY, UserRole, get_user_role
+)
+from .search import search_claims
+
+
+def encode(cursor):
+    return urlsafe_b64encode(json.dumps(cursor).encode()).decode()
+
+
+def create_owner(model, username):
+    return model.objects.create(title=username, user_link=User.objects.create_user(username, password=username))
+
+
+def create_machine(number, client, service_company, **fields):
+    references = {
+        'model_equipment': Equipment.objects.get_or_create(title='ПД1,5')[0],
+        'model_engine': Engine.objects.get_or_create(title='Kubota D1803')[0],
+        'model_transmission': Transmission.objects.get_or_create(title='10VB-00106')[0],
+        'model_driving_axle': DrivingAxle.objects.get_or_create(title='20VD-00025')[0],
+        'model_steering_axle': SteeringAxle.objects.get_or_create(title='VS-30')[0],
+    }
+    return Machine.objects.create(**{
+        'number_machine': number, 'client': client, 'service_company': service_company,
+        'shipment_date': datetime.date(2022, 3, 1), 'number_engine': '1', 'number_transmission': '1',
+        'number_driving_axle': '1', 'number_steering_axle': '1', 'supply_contract': '1',
+        'end_consumer': 'ООО', 'shipping_address': 'Москва', **references, **fields,
+    })
+
+
+
+def create_maintenance(machine, date, operating_time=0, title='ТО-1'):
+    return Maintenance.objects.create(
+        machine=machine, type=TypeMaintenance.objects.get_or_create(title=title)[0], maintenance_date=date,
+        operating_time=operating_time, order_number='#1', order_date=date,
+        maintenance_company=MaintenanceCompany.objects.get_or_create(title='Силант')[0],
+    )
+
+
+def create_claim(machine, date, node='Двигатель', description='Отказ', repair_parts=''):
+    return Claim.objects.create(
+        machine=machine, refusal_date=date, recovery_date=date + datetime.timedelta(days=3),
+        refusal_node=RefusalNode.objects.get_or_create(title=node)[0], refusal_description=description,
+        recovery_method=RecoveryMethod.objects.get_or_create(title='Замена')[0], repair_parts=repair_parts,
+    )
+
+
+# Роль пользователя и ее сброс в кэше
+class RoleTest(TestCase):
+
+    def role(self, user):
+        # Новый объект пользователя: роль берется из кэша, а не из объекта
+        return get_user_role(User.objects.get(pk=user.pk))
+
+    def test_roles(self):
+        client = create_owner(ClientCompany, 'client')
+        service_company = create_owner(ServiceCompany, 'service')
+        self.assertEqual(self.role(User.objects.create_superuser('admin')), UserRole(ROLE_ADMIN))
+        self.assertEqual(self.role(client.user_link), UserRole(ROLE_CLIENT, client_id=client.pk))
+        self.assertEqual(
+            self.role(service_company.user_link), UserRole(ROLE_SERVICE_COMPANY, service_company_id=service_company.pk)
+        )
+        self.assertEqual(self.role(User.objects.create_user('user')), UserRole(ROLE_NONE))
+
+    def test_group_change_resets_role(self):
+        user = User.objects.create_user('manager')
+        self.assertFalse(self.role(user).is_manager)
+        managers = Group.objects.create(name=MANAGERS_GROUP)
+        user.groups.add(managers)
+        self.assertTrue(self.role(user).is_manager)
+        managers.user_set.remove(user)
+        self.assertFalse(self.role(user).is_manager)
+        user.groups.add(managers)
+        managers.name = 'Бывшие менеджеры'
+        managers.save()
+        self.assertFalse(self.role(user).is_manager)
+
+    def test_owner_change_resets_role(self):
+        client = create_owner(ClientCompany, 'client')
+        previous_user = client.user_link
+        user = User.objects.create_user('new')
+        self.assertEqual(self.role(user).role, ROLE_NONE)
+        self.assertEqual(self.role(previous_user).role, ROLE_CLIENT)
+        client.user_link = user
+        client.save()
+        self.assertEqual(self.role(user), UserRole(ROLE_CLIENT, client_id=client.pk))
+        self.assertEqual(self.role(previous_user).role, ROLE_NONE)
+        client.delete()
+        self.assertEqual(self.role(user).role, ROLE_NONE)
+        user.is_staff = True
+        user.save()
+        self.assertEqual(self.role(user).role, ROLE_ADMIN)
+
+
+# Права на записи API по роли
+class PermissionTest(TestCase):
+
+    def test_object_permission(self):
+        client, service_company = create_owner(ClientCompany, 'client'), create_owner(ServiceCompany, 'service')
+        other = create_owner(ClientCompany, 'other')
+        claim = create_claim(create_machine('SYN-0001', client, service_company), datetime.date(2023, 1, 1))
+        managers = Group.objects.create(name=MANAGERS_GROUP)
+        manager = User.objects.create_user('manager')
+        manager.groups.add(managers)
+        permission = IsAdminOrManagerOrClientOrServiceCompany()
+        for user, allowed in (
+            (User.objects.create_superuser('admin'), True),
+            (manager, True),
+            (client.user_link, True),
+            (service_company.user_link, True),
+            (other.user_link, False),
+            (AnonymousUser(), False),
+        ):
+            with self.subTest(user=user):
+                request = SimpleNamespace(user=user)
+                self.assertTrue(permission.has_permission(request, None))
+                self.assertEqual(permission.has_object_permission(request, None, claim), allowed)
+
+
+# Планы выборки: число запросов списков и карточек не зависит от числа записей.
+# Кэш - в памяти процесса: с DatabaseCache обращения к кэшу тоже были бы SQL-запросами
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class FetchPlanTest(TestCase):
+    # Сессия и пользователь, для таблиц - COUNT(*) и страница, для html - и варианты фильтров формы
+    QUERIES = {
+        '/silant/machines/': 9,
+        '/silant/maintenances/': 6,
+        '/silant/claims/': 7,
+        '/silant/api/machines/': 4,
+        '/silant/api/maintenance/': 4,
+        '/silant/api/claims/': 4,
+        '/silant/api/machines/?expand=client,service_company,model_engine': 4,
+        '/silant/api/claims/?expand=refusal_node,recovery_method': 4,
+    }
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'admin'))
+        self.client_company = create_owner(ClientCompany, 'client')
+        self.service_company = create_owner(ServiceCompany, 'service')
+        self.add_machines(2)
+
+    def add_machines(self, count):
+        for number in range(Machine.objects.count(), Machine.objects.count() + count):
+            machine = create_machine(f'SYN-{number}', self.client_company, self.service_company)
+            for day in (1, 2):
+                create_maintenance(machine, datetime.date(2023, 1, day), title=f'ТО-{day}')
+                create_claim(machine, datetime.date(2023, 2, day), node=f'Узел {day}')
+
+    def test_list_queries(self):
+        self.client.get('/silant/machines/')  # роль пользователя попадает в кэш
+        for url, queries in self.QUERIES.items():
+            with self.subTest(url=url), self.assertNumQueries(queries):
+                self.assertEqual(self.client.get(url).status_code, 200)
+        self.add_machines(4)
+        for url, queries in self.QUERIES.items():
+            with self.subTest(url=url, machines=6), self.assertNumQueries(queries):
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_detail_queries(self):
+        machine = Machine.objects.first()
+        for url in (f'/silant/machines/{machine.pk}', f'/silant/maintenances/{machine.maintenance_set.first().pk}',
+                    f'/silant/claims/{machine.claim_set.first().pk}', f'/silant/api/machines/{machine.pk}/'):
+            self.client.get(url)
+            with self.subTest(url=url), self.assertNumQueries(3):
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+
+# Курсор постраничного вывода по ключу
+class KeysetCursorTest(SimpleTestCase):
+
+    def decode(self, cursor):
+        request = Request(APIRequestFactory().get('/api/claims/', {'cursor': cursor}))
+        return ClaimKeysetPagination().decode_cursor(request)
+
+    def test_round_trip(self):
+        paginator = ClaimKeysetPagination()
+        paginator.base_url = 'http://testserver/api/claims/?pagination=cursor'
+        link = paginator.encode_cursor(SimpleNamespace(refusal_date=datetime.date(2023, 5, 17), pk=42), reverse=True)
+        cursor = Request(APIRequestFactory().get(link)).query_params['cursor']
+        self.assertEqual(self.decode(cursor), {'v': datetime.date(2023, 5, 17), 'id': 42, 'r': True})
+
+    def test_tampered_cursor(self):
+        for cursor in (
+            encode({'v': 'не дата', 'id': 1, 'r': 0}),
+            encode({'v': '2023-05-17', 'id': 10 ** 30, 'r': 0}),
+            encode({'v': '2023-05-17', 'id': -1, 'r': 0}),
+            encode({'v': '2023-05-17', 'id': 1}),
+            encode([1, 2]),
+            'не base64',
+        ):
+            with self.subTest(cursor=cursor), self.assertRaises(NotFound):
+                self.decode(cursor)
+
+
+class KeysetCursorApiTest(TestCase):
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'admin'))
+
+    # Страницы (списки id) по ссылкам next или previous, начиная с link, и ответ на последней странице
+    def walk(self, link, direction):
+        pages = []
+        while True:
+            response = self.client.get(link)
+            self.assertEqual(response.status_code, 200)
+            pages.append([row['id'] for row in response.json()['results']])
+            if not response.json()[direction]:
+                return pages, response
+            link = response.json()[direction]
+
+    def test_order_and_page_boundaries(self):
+        client, service_company = create_owner(ClientCompany, 'client'), create_owner(ServiceCompany, 'service')
+        # Несколько машин с одной датой отгрузки: внутри даты порядок - по id
+        machines = [
+            create_machine(f'SYN-{number}', client, service_company, shipment_date=datetime.date(2022, 3, day))
+            for number, day in enumerate((5, 1, 3, 3, 3, 1, 9))
+        ]
+        expected = [machine.pk for machine in sorted(machines, key=lambda machine: (machine.shipment_date, machine.pk))]
+        pages, last = self.walk('/silant/api/machines/?pagination=cursor&page_size=2&fields=id', 'next')
+        self.assertEqual(pages, [expected[0:2], expected[2:4], expected[4:6], expected[6:]])
+        # Обратно по ссылкам previous - те же страницы в обратном порядке
+        back, first = self.walk(last.json()['previous'], 'previous')
+        self.assertEqual(back, [expected[4:6], expected[2:4], expected[0:2]])
+        self.assertIsNotNone(first.json()['next'])
+
+    def test_page_size(self):
+        for value, size in (('2', 2), ('0', 3), ('-1', 3), ('abc', 3), ('5000', 1000)):
+            with self.subTest(page_size=value):
+                request = Request(APIRequestFactory().get('/api/claims/', {'page_size': value}))
+                self.assertEqual(requested_page_size(request, 3, 1000), size)
+
+    def test_tampered_cursor_is_not_found(self):
+        cursor = encode({'v': '2023-05-17', 'id': 10 ** 30, 'r': 0})
+        for url in ('/silant/api/claims/', '/silant/api/async/claims/'):
+            with self.subTest(url=url):
+                response = self.client.get(url, {'pagination': 'cursor', 'cursor': cursor})
+                self.assertEqual(response.status_code, 404)
+
+
+# Загрузка данных из файлов: строки с ошибками пропускаются и попадают в отчет
+class ImporterTest(TestCase):
+
+    def setUp(self):
+        client, service_company = create_owner(ClientCompany, 'client'), create_owner(ServiceCompany, 'service')
+        self.machine = create_machine('SYN-0012', client, service_company)
+        RefusalNode.objects.create(title='Двигатель')
+        RecoveryMethod.objects.create(title='Замена')
+
+    def claim(self, **fields):
+        return {
+            'machine': 'SYN-0012', 'refusal_date': '17.05.2023', 'operating_time': '120', 'refusal_node': 'Двигатель',
+            'refusal_description': 'Течь масла', 'recovery_method': 'Замена', 'recovery_date': '2023-05-20', **fields,
+        }
+
+    def test_claim_error_rows(self):
+        importer = ClaimImporter(batch_size=2).run([
+            self.claim(),
+            self.claim(machine='SYN-9999'),
+            self.claim(refusal_description=''),
+            self.claim(refusal_date='31.02.2023'),
+            self.claim(recovery_date='2023-05-01'),
+            self.claim(refusal_node='Кабина'),
+            self.claim(operating_time='-5'),
+            self.claim(operating_time='много'),
+            self.claim(repair_parts='Сальник'),
+        ])
+        self.assertEqual(importer.created, 2)
+        self.assertEqual(importer.errors, [
+            RowError(3, 'machine: нет машины с заводским номером "SYN-9999"'),
+            RowError(4, 'Не заполнены поля: refusal_description'),
+            RowError(5, 'refusal_date: некорректная дата "31.02.2023"'),
+            RowError(6, 'recovery_date: дата восстановления должна быть не раньше даты отказа'),
+            RowError(7, 'refusal_node: нет записи справочника "Кабина"'),
+            RowError(8, 'operating_time: число должно быть положительным'),
+            RowError(9, 'operating_time: некорректное число "много"'),
+        ])
+        claims = Claim.objects.filter(machine=self.machine).order_by('pk')
+        self.assertEqual([(claim.downtime, claim.client_id) for claim in claims], [(3, self.machine.client_id)] * 2)
+
+    def test_ambiguous_reference_and_duplicate_machine(self):
+        RefusalNode.objects.create(title='Двигатель')
+        importer = ClaimImporter().run([self.claim()])
+        self.assertEqual(importer.errors, [RowError(2, 'refusal_node: в справочнике несколько записей "Двигатель"')])
+        row = {column: 'ПД1,5' for column in MachineImporter.required}
+        importer = MachineImporter().run([{**row, 'number_machine': 'SYN-0012'}])
+        self.assertEqual(importer.errors[0], RowError(2, 'number_machine: машина "SYN-0012" уже есть'))
+
+    def test_dry_run(self):
+        importer = ClaimImporter(dry_run=True).run([self.claim(), self.claim(machine='')])
+        self.assertEqual((importer.created, importer.errors), (1, [RowError(3, 'Не заполнены поля: machine')]))
+        self.assertFalse(Claim.objects.exists())
+
+    def test_command_error_report(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path, report = Path(directory, 'claims.csv'), Path(directory, 'errors.csv')
+            rows = [self.claim(), self.claim(machine='SYN-9999')]
+            path.write_text('\n'.join([','.join(rows[0]), *(','.join(row.values()) for row in rows)]), encoding='utf-8')
+            call_command('import_data', 'claims', str(path), errors=str(report), stdout=io.StringIO())
+            self.assertEqual(
+                report.read_text(encoding='utf-8').splitlines(),
+                ['line,error', '3,"machine: нет машины с заводским номером ""SYN-9999"""'],
+            )
+        self.assertEqual(Claim.objects.count(), 1)
+
+
+# Выгрузка в CSV: формулы не выполняются в табличных редакторах, файл загружается обратно
+class ExportTest(TestCase):
+
+    def test_formulas_are_escaped_and_imported_back(self):
+        client, service_company = create_owner(ClientCompany, 'client'), create_owner(ServiceCompany, 'service')
+        machine = create_machine('SYN-0012', client, service_company)
+        descriptions = ['=HYPERLINK("http://example.com")', '-течь', "'=1+1", "'обычный текст", 'Течь масла']
+        for description in descriptions:
+            create_claim(machine, datetime.date(2023, 5, 17), description=description, repair_parts='@SUM(A1)')
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'admin'))
+        content = b''.join(self.client.get('/silant/claims/export/', {'format': 'csv'}).streaming_content).decode()
+        self.assertIn("'=HYPERLINK(", content)
+        self.assertIn("'-течь,Замена,'@SUM(A1)", content)
+
+        Claim.objects.all().delete()
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory, 'claims.csv')
+            path.write_text(content, encoding='utf-8')
+            call_command('import_data', 'claims', str(path), stdout=io.StringIO())
+        self.assertEqual(
+            sorted(Claim.objects.values_list('refusal_description', 'repair_parts')),
+            sorted((description, '@SUM(A1)') for description in descriptions),
+        )
+
+
+# Поиск машины по заводскому номеру для незарегистрированных пользователей
+class MachinePreviewFilterTest(TestCase):
+
+    def setUp(self):
+        client = create_owner(ClientCompany, 'client')
+        service_company = create_owner(ServiceCompany, 'service')
+        for number in ('SYN-0012', 'SYN-0013', 'ABC-1'):
+            create_machine(number, client, service_company)
+
+    def search(self, **params):
+        queryset = Machine.objects.order_by('number_machine_normalized')
+        return list(MachinePreviewFilter(params, queryset).qs.values_list('number_machine', flat=True))
+
+    def test_prefix(self):
+        self.assertEqual(self.search(number_machine='syn 001'), ['SYN-0012', 'SYN-0013'])
+
+    def test_exact(self):
+        self.assertEqual(self.search(number_machine='syn0012', match='exact'), ['SYN-0012'])
+        self.assertEqual(self.search(number_machine='SYN-001', match='exact'), [])
+
+    def test_empty_number_finds_nothing(self):
+        for value in ('-', ' ', ' - '):
+            with self.subTest(value=value):
+                self.assertEqual(self.search(number_machine=value), [])
+                response = self.client.get('/silant/api/machines/', {'number_machine': value})
+                self.assertEqual(response.json()['count'], 0)
+
+
+# Отбор и сортировка машин по сводке
+class MachineSummaryFilterTest(TestCase):
+
+    def setUp(self):
+        client, service_company = create_owner(ClientCompany, 'client'), create_owner(ServiceCompany, 'service')
+        self.idle = create_machine('SYN-0001', client, service_company)
+        self.busy = create_machine('SYN-0002', client, service_company)
+        self.broken = create_machine('SYN-0003', client, service_company)
+        create_maintenance(self.busy, datetime.date(2022, 6, 1), 700)
+        create_maintenance(self.broken, datetime.date(2023, 6, 1), 1500)
+        create_claim(self.broken, datetime.date(2023, 6, 2))
+        create_claim(self.broken, datetime.date.today())
+
+    def numbers(self, **params):
+        return [machine.number_machine for machine in MachineFilter(params, Machine.objects.order_by('pk')).qs]
+
+    def test_filters(self):
+        self.assertEqual(self.numbers(open_claims='true'), ['SYN-0003'])
+        self.assertEqual(self.numbers(open_claims='false'), ['SYN-0001', 'SYN-0002'])
+        self.assertEqual(self.numbers(min_claims='1'), ['SYN-0003'])
+        self.assertEqual(self.numbers(min_operating_time='1000'), ['SYN-0003'])
+        self.assertEqual(self.numbers(no_maintenance_since='2023-01-01'), ['SYN-0001', 'SYN-0002'])
+
+    def test_ordering(self):
+        self.assertEqual(self.numbers(ordering='-claim_count'), ['SYN-0003', 'SYN-0001', 'SYN-0002'])
+        self.assertEqual(self.numbers(ordering='-operating_time'), ['SYN-0003', 'SYN-0002', 'SYN-0001'])
+        self.assertEqual(self.numbers(ordering='last_maintenance_date'), ['SYN-0001', 'SYN-0002', 'SYN-0003'])
+
+
+# Аналитика надежности
+class ReliabilityTest(TestCase):
+
+    def test_component_failures_and_order(self):
+        client, service_company = create_owner(ClientCompany, 'client'), create_owner(ServiceCompany, 'service')
+        reliable = create_machine('SYN-0001', client, service_company)
+        failing = create_machine(
+            'SYN-0002', client, service_company, model_engine=Engine.objects.create(title='Kubota V2403')
+        )
+        spare = create_machine(
+            'SYN-0003', client, service_company, model_engine=Engine.objects.create(title='Kubota V3300')
+        )
+        create_maintenance(reliable, datetime.date(2022, 6, 1), 1000)
+        create_maintenance(failing, datetime.date(2022, 6, 1), 300)
+        # Отказ другого узла тоже относится к модели двигателя машины
+        create_claim(reliable, datetime.date(2022, 7, 1), node='Трансмиссия')
+        create_claim(failing, datetime.date(2022, 7, 1))
+        create_claim(failing, datetime.date(2022, 8, 1))
+        create_maintenance(spare, datetime.date(2022, 6, 1), 50)
+
+        engines = compute_reliability(UserRole(ROLE_ADMIN))['components']['engine']
+        self.assertEqual(
+            [(row['title'], row['failures'], row['mtbf']) for row in engines],
+            [('Kubota V2403', 2, 150.0), ('Kubota D1803', 1, 1000.0), ('Kubota V3300', 0, None)],
+        )
+        nodes = compute_reliability(UserRole(ROLE_ADMIN))['refusal_nodes']
+        self.assertEqual([(row['title'], row['failures']) for row in nodes], [('Двигатель', 2), ('Трансмиссия', 1)])
+
+
+# Полнотекстовый поиск рекламаций
+class ClaimSearchTest(TestCase):
+
+    def setUp(self):
+        client, service_company = create_owner(ClientCompany, 'client'), create_owner(ServiceCompany, 'service')
+        self.machine = create_machine('SYN-0001', client, service_company)
+
+    def found(self, text, queryset=None):
+        return list(search_claims(Claim.objects.all() if queryset is None else queryset, text))
+
+    def test_all_words_and_rank(self):
+        in_parts = create_claim(self.machine, datetime.date(2023, 1, 1), description='Шум', repair_parts='Подшипник')
+        in_description = create_claim(self.machine, datetime.date(2023, 2, 1), description='Разрушение подшипника')
+        create_claim(self.machine, datetime.date(2023, 3, 1), description='Течь масла')
+        self.assertEqual(self.found('подш*'), [in_description, in_parts])
+        self.assertEqual(self.found('шум подш*'), [in_parts])
+        self.assertEqual(self.found('подшипник'), [in_parts])
+        self.assertEqual(self.found('подш*', Claim.objects.filter(refusal_date__gte=datetime.date(2023, 2, 1))),
+                         [in_description])
+
+    def test_index_follows_changes(self):
+        claim = create_claim(self.machine, datetime.date(2023, 1, 1), description='Течь масла')
+        Claim.objects.filter(pk=claim.pk).update(refusal_description='Перегрев двигателя')
+        self.assertEqual(self.found('течь'), [])
+        self.assertEqual(self.found('перегрев'), [claim])
+        claim.delete()
+        self.assertEqual(self.found('перегрев'), [])
+
+    def test_triggers_check(self):
+        self.assertEqual(claim_search_triggers_check(None, databases=['default']), [])
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER "mySilant_claim_fts_update"')
+        errors = claim_search_triggers_check(None, databases=['default'])
+        self.assertEqual([error.id for error in errors], ['mySilant.E001'])
+        self.assertIn('mySilant_claim_fts_update', errors[0].msg)
+
+
+# Справочники одним запросом
+class ReferenceBundleTest(TestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'admin')
+        self.client_company = create_owner(ClientCompany, 'client')
+        create_owner(ServiceCompany, 'service')
+        Equipment.objects.create(title='ПД1,5')
+
+    def get(self, user, **headers):
+        self.client.force_login(user)
+        return self.client.get('/silant/api/references/', **headers)
+
+    def test_not_modified(self):
+        response = self.get(self.admin)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], f'"{response.json()["version"]}"')
+        self.assertEqual(self.get(self.admin, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        Equipment.objects.create(title='ПД2,0')
+        changed = self.get(self.admin, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], response['ETag'])
+
+    def test_owner_references_only_for_managers(self):
+        full = self.get(self.admin)
+        self.assertEqual([item['title'] for item in full.json()['references']['client']], ['client'])
+        public = self.get(self.client_company.user_link)
+        self.assertNotIn('client', public.json()['references'])
+        self.assertNotIn('service_company', public.json()['references'])
+        self.assertIn('equipment', public.json()['references'])
+        self.assertNotEqual(public['ETag'], full['ETag'])
+        self.assertEqual(self.get(self.client_company.user_link, HTTP_IF_NONE_MATCH=full['ETag']).status_code, 200)
+
+    def test_owner_autocomplete_only_for_managers(self):
+        self.client.force_login(self.client_company.user_link)
+        self.assertEqual(self.client.get('/silant/api/autocomplete/client/').status_code, 404)
+        self.assertEqual(self.client.get('/silant/api/autocomplete/equipment/').status_code, 200)
+        self.client.force_login(self.admin)
+        self.assertEqual(self.client.get('/silant/api/autocomplete/client/').json()['results'][0]['text'], 'client')
+
+
+# Кэш отрисованных таблиц списков
+class TableCacheTest(TestCase):
+
+    def setUp(self):
+        self.client_company = create_owner(ClientCompany, 'client')
+        self.service_company = create_owner(ServiceCompany, 'service')
+        self.machine = create_machine('SYN-0012', self.client_company, self.service_company)
+        self.role = get_user_role(self.client_company.user_link)
+
+    def key(self, role=None, page_number=1, **params):
+        return table_cache(role or self.role, MachineFilter(params, Machine.objects.all()), page_number)[0]
+
+    def test_key_uses_only_cleaned_filters(self):
+        key = self.key(model_equipment='1,2')
+        self.assertEqual(self.key(model_equipment='1,2', utm='x', page='7'), key)
+        self.assertNotEqual(self.key(model_equipment='1'), key)
+        self.assertEqual(self.key(model_equipment='abc'), self.key())
+        self.assertNotEqual(self.key(page_number=2), self.key())
+
+    def test_guest_tables_are_not_cached(self):
+        filterset = MachinePreviewFilter({'number_machine': 'SYN'}, Machine.objects.all())
+        self.assertEqual(table_cache(GUEST, filterset, 1), UNCACHED_TABLE)
+
+    def test_save_resets_owner_tables(self):
+        key = self.key()
+        other = create_owner(ClientCompany, 'other')
+        other_role = get_user_role(other.user_link)
+        other_key = self.key(other_role)
+        self.machine.end_consumer = 'ООО Ромашка'
+        self.machine.save()
+        self.assertNotEqual(self.key(), key)
+        self.assertEqual(self.key(other_role), other_key)
+
+
+# Асинхронное чтение API
+class AsyncReadTest(TestCase):
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'admin'))
+
+    def test_out_of_range_id_is_not_found(self):
+        for url in ('/silant/api/async/claims/', '/silant/api/async/machines/', '/silant/api/async/maintenance/'):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(f'{url}99999999999999999999999/').status_code, 404)
+                self.assertEqual(self.client.get(f'{url}1/').status_code, 404)
+
+
+# Фильтр по id справочника
+class IdListFilterTest(TestCase):
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'admin'))
+
+    def test_out_of_range_ids_are_rejected(self):
+        # Некорректный фильтр не применяется (как и прочие фильтры), а не приводит к ошибке сервера
+        for value in ('99999999999999999999999', '0', '-5', '1,abc'):
+            for url in ('/silant/api/claims/', '/silant/claims/'):
+                with self.subTest(value=value, url=url):
+                    self.assertEqual(self.client.get(url, {'refusal_node': value}).status_code, 200)
+
+    def test_valid_ids(self):
+        self.assertEqual(self.client.get('/silant/api/claims/', {'refusal_node': '1,2'}).status_code, 200)
+
+
+# Хронология машины
+class TimelineTest(TestCase):
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'admin'))
+
+    def test_invalid_machine_id_is_not_found(self):
+        for pk in ('abc', '0', '99999999999999999999999'):
+            with self.subTest(pk=pk):
+                self.assertEqual(self.client.get(f'/silant/api/machines/{pk}/timeline/').status_code, 404)
+
+    def test_import_resets_timeline(self):
+        client, service_company = create_owner(ClientCompany, 'client'), create_owner(ServiceCompany, 'service')
+        machine = create_machine('SYN-0012', client, service_company)
+        TypeMaintenance.objects.create(title='ТО-1')
+        MaintenanceCompany.objects.create(title='Силант')
+        generation = get_generation(f'timeline:{machine.pk}')
+        importer = MaintenanceImporter().run([{
+            'machine': 'SYN-0012', 'type': 'ТО-1', 'maintenance_date': '2023-05-17', 'operating_time': '120',
+            'order_number': '#1', 'order_date': '2023-05-16', 'maintenance_company': 'Силант',
+        }])
+        self.assertEqual((importer.created, importer.errors), (1, []))
+        self.assertEqual(Maintenance.objects.filter(machine=machine).count(), 1)
+        self.assertNotEqual(get_generation(f'timeline:{machine.pk}'), generation)
+
+    def test_tampered_cursor(self):
+        with self.assertRaises(ValueError):
+            timeline.decode_cursor(encode({'d': '2023-05-17', 't': timeline.EVENT_CLAIM, 'id': 10 ** 30}))
+
+
+# Прогноз ТО пересчитывается для всего парка (в фоне) при изменении вида ТО
+class TypeMaintenanceForecastTest(TestCase):
+
+    def test_fleet_refresh_on_change(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            maintenance_type = TypeMaintenance.objects.create(title='ТО-1 (200 м/час)', operating_interval=200)
+        self.assertEqual(callbacks, [submit_fleet_forecast_refresh])
+        with self.captureOnCommitCallbacks() as callbacks:
+            maintenance_type.delete()
+        self.assertEqual(callbacks, [submit_fleet_forecast_refresh])
+
+
+# Расчет прогноза ТО
+class ForecastTest(TestCase):
+
+    def setUp(self):
+        self.client_company = create_owner(ClientCompany, 'client')
+        self.service_company = create_owner(ServiceCompany, 'service')
+        self.first = TypeMaintenance.objects.create(title='ТО-1', operating_interval=200)
+        self.second = TypeMaintenance.objects.create(title='ТО-2', operating_interval=500)
+        TypeMaintenance.objects.create(title='Внеплановое')
+
+    def forecasts(self, machine):
+        refresh_forecasts()
+        return {
+            forecast.type_id: (forecast.usage_rate, forecast.due_operating_time, forecast.due_date)
+            for forecast in machine.maintenance_forecasts.all()
+        }
+
+    def test_rate_between_first_and_last_maintenance(self):
+        machine = create_machine('SYN-0001', self.client_company, self.service_company)
+        create_maintenance(machine, datetime.date(2022, 4, 1), 100)
+        create_maintenance(machine, datetime.date(2022, 4, 11), 200)
+        create_maintenance(machine, datetime.date(2022, 4, 11), 200, title='Внеплановое')
+        self.assertEqual(self.forecasts(machine), {
+            self.first.pk: (10.0, 400, datetime.date(2022, 5, 1)),
+            self.second.pk: (10.0, 500, datetime.date(2022, 5, 11)),
+        })
+
+    def test_single_maintenance_rate_from_shipment(self):
+        machine = create_machine('SYN-0001', self.client_company, self.service_company)
+        create_maintenance(machine, datetime.date(2022, 3, 11), 50)
+        self.assertEqual(self.forecasts(machine)[self.first.pk], (5.0, 250, datetime.date(2022, 4, 20)))
+
+    def test_default_rate_without_history(self):
+        machine = create_machine('SYN-0001', self.client_company, self.service_company)
+        days = -(-200 // DEFAULT_USAGE_RATE)
+        self.assertEqual(self.forecasts(machine)[self.first.pk], (
+            DEFAULT_USAGE_RATE, 200, datetime.date(2022, 3, 1) + datetime.timedelta(days=days)
+        ))
+
+    def test_full_refresh_resets_lists(self):
+        generation = get_generation('lists')
+        refresh_forecasts()
+        self.assertNotEqual(get_generation('lists'), generation)
+
+
+# Повтор записи при блокировке базы: в админке - всей транзакции формы
+@override_settings(SILANT_DB_LOCK_RETRY_DELAY=0)
+class LockRetryAdminTest(TransactionTestCase):
+
+    def test_admin_delete_is_retried(self):
+        client, service_company = create_owner(ClientCompany, 'client'), create_owner(ServiceCompany, 'service')
+        machine = create_machine('SYN-0001', client, service_company)
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'admin'))
+        attempts = []
+        delete_model = MachineAdmin.delete_model
+
+        def locked_once(admin, request, obj):
+            attempts.append(obj.pk)
+            if len(attempts) == 1:
+                raise OperationalError('database is locked')
+            return delete_model(admin, request, obj)
+
+        with mock.patch.object(MachineAdmin, 'delete_model', locked_once):
+            response = self.client.post(f'/admin/mySilant/machine/{machine.pk}/delete/', {'post': 'yes'})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(attempts, [machine.pk, machine.pk])
+        self.assertFalse(Machine.objects.exists())
+
+
+# Подсказки в формах
+class AutocompleteCursorTest(TestCase):
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'admin'))
+
+    def test_tampered_cursor_is_not_found(self):
+        for cursor in (encode_autocomplete_cursor('SYN', 10 ** 30), encode_autocomplete_cursor('SYN', 0), 'abc'):
+            with self.subTest(cursor=cursor):
+                response = self.client.get('/silant/api/autocomplete/machine/', {'cursor': cursor})
+                self.assertEqual(response.status_code, 404)
+
+
+# Заголовок Server-Timing
+@override_settings(SILANT_SERVER_TIMING=False)
+class ServerTimingTest(TestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'admin')
+
+    def test_hidden_from_anonymous_users(self):
+        response = Client().get('/silant/machines/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Server-Timing', response)
+
+    def test_shown_to_staff(self):
+        client = Client()
+        client.force_login(self.admin)
+        self.assertIn('db;dur=', client.get('/silant/machines/')['Server-Timing'])
+
+    async def test_shown_to_staff_under_asgi(self):
+        # Пользователь под ASGI загружается через sync_to_async; сессия - от обычного клиента
+        client = Client()
+        await sync_to_async(client.force_login)(self.admin)
+        async_client = AsyncClient()
+        async_client.cookies = client.cookies
+        response = await async_client.get('/silant/api/async/machines/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('db;dur=', response['Server-Timing'])
+        response = await AsyncClient().get('/silant/api/async/machines/')
+        self.assertNotIn('Server-Timing', response)
+
+
+# Журнал замеров: одна запись на запрос, медленный запрос - WARNING с самыми долгими SQL
+class TimingLogTest(TestCase):
+
+    def test_one_record_per_request(self):
+        with self.assertLogs('mySilant.timing', level='INFO') as logs:
+            Client().get('/silant/machines/')
+        self.assertEqual([record.levelname for record in logs.records], ['INFO'])
+        self.assertEqual(logs.records[0].timing['path'], '/silant/machines/')
+
+    @override_settings(SILANT_SLOW_REQUEST_MS=0)
+    def test_slow_request_warning(self):
+        with self.assertLogs('mySilant.timing', level='INFO') as logs:
+            Client().get('/silant/machines/')
+        self.assertEqual([record.levelname for record in logs.records], ['WARNING'])
+        self.assertIn('slow_queries', logs.records[0].timing)
+
+
+# Профилирование запросов сотрудников
+class ProfilingTest(TestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'admin')
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        patcher = mock.patch.object(profiling, 'PROFILE_DIR', Path(directory.name))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_staff_profile(self):
+        self.client.force_login(self.admin)
+        response = self.client.get('/silant/machines/', {'_profile': 'cpu'})
+        self.assertTrue(profiling.PROFILE_NAME.match(response['X-Silant-Profile']))
+
+    def test_anonymous_request_is_not_profiled(self):
+        self.assertNotIn('X-Silant-Profile', self.client.get('/silant/machines/', {'_profile': 'cpu'}))
+
+    async def test_staff_profile_under_asgi(self):
+        client = Client()
+        await sync_to_async(client.force_login)(self.admin)
+        async_client = AsyncClient()
+        async_client.cookies = client.cookies
+        response = await async_client.get('/silant/api/async/machines/', {'_profile': 'cpu'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(profiling.PROFILE_NAME.match(response['X-Silant-Profile']))
+        response = await AsyncClient().get('/silant/api/async/machines/', {'_profile': 'cpu'})
+        self.assertNotIn('X-Silant-Profile', response)
@@ -0,0 +1,121 @@
+import datetime
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import CharField, F, Q, Value
+
+from .generations import get_generations, bump_generation, generation_cache_timeout
+from .models import Maintenance, Claim, MAX_ID
+
+# Время хранения страниц хронологии в кэше (в секундах), по умолчанию - сутки.
+# При изменении ТО и рекламаций машины ее хронология сбрасывается сменой поколения
+# (только с общим для процессов кэшем, см. generation_cache_timeout)
+TIMELINE_CACHE_TIMEOUT = generation_cache_timeout(
+    getattr(settings, 'SILANT_TIMELINE_CACHE_TIMEOUT', 60 * 60 * 24)
+)
+# Событий на странице, если не задан ?page_size=
+TIMELINE_PAGE_SIZE = getattr(settings, 'SILANT_TIMELINE_PAGE_SIZE', 100)
+
+EVENT_MAINTENANCE = 'maintenance'
+EVENT_CLAIM = 'claim'
+
+# Поля события в ответе
+EVENT_FIELDS = ('type', 'id', 'date', 'operating_time', 'title', 'description')
+
+
+def _events(queryset, kind, date_field, title_field, description_field):
+    # Одна часть UNION: одинаковые по порядку и именам столбцы для ТО и рекламаций
+    return queryset.annotate(
+        event_type=Value(kind, output_field=CharField()),
+        event_id=F('id'),
+        event_date=F(date_field),
+        event_operating_time=F('operating_time'),
+        event_title=F(title_field),
+        event_description=F(description_field),
+    ).values_list(
+        'event_type', 'event_id', 'event_date', 'event_operating_time', 'event_title', 'event_description'
+    ).order_by()
+
+
+def _after(date_field, kind, cursor):
+    """
+    Условие "после курсора" для части UNION: события упорядочены по (дата, тип, id)
+    """
+    if cursor is None:
+        return Q()
+    date, cursor_kind, cursor_id = cursor
+    if kind > cursor_kind:
+        return Q(**{f'{date_field}__gte': date})
+    if kind < cursor_kind:
+        return Q(**{f'{date_field}__gt': date})
+    # В пределах той же даты - по id; условие сохраняет чтение диапазона индекса по дате
+    return Q(**{f'{date_field}__gte': date}) & ~Q(**{date_field: date, 'id__lte': cursor_id})
+
+
+def timeline_queryset(machine_id, cursor=None):
+    """
+    ТО и рекламации машины одним запросом UNION ALL в порядке дат. Каждая часть читается по индексу
+    (машина, дата) начиная с курсора - (дата, тип, id) последнего события предыдущей страницы
+    """
+    maintenances = _events(
+        Maintenance.objects.filter(_after('maintenance_date', EVENT_MAINTENANCE, cursor), machine_id=machine_id),
+        EVENT_MAINTENANCE, 'maintenance_date', 'type__title', 'order_number',
+    )
+    claims = _events(
+        Claim.objects.filter(_after('refusal_date', EVENT_CLAIM, cursor), machine_id=machine_id),
+        EVENT_CLAIM, 'refusal_date', 'refusal_node__title', 'refusal_description',
+    )
+    return maintenances.union(claims, all=True).order_by('event_date', 'event_type', 'event_id')
+
+
+def encode_cursor(event):
+    cursor = {'d': event['date'].isoformat(), 't': event['type'], 'id': event['id']}
+    return urlsafe_b64encode(json.dumps(cursor, separators=(',', ':')).encode('ascii')).decode('ascii')
+
+
+def decode_cursor(encoded):
+    """
+    (дата, тип, id) из курсора; ValueError - если курсор некорректен
+    """
+    try:
+        cursor = json.loads(urlsafe_b64decode(encoded.encode('ascii')))
+        date, kind, event_id = datetime.date.fromisoformat(cursor['d']), cursor['t'], int(cursor['id'])
+    except (TypeError, ValueError, KeyError, UnicodeEncodeError, AttributeError):
+        raise ValueError('Некорректный курсор')
+    if kind not in (EVENT_MAINTENANCE, EVENT_CLAIM) or not 0 < event_id <= MAX_ID:
+        raise ValueError('Некорректный курсор')
+    return date, kind, event_id
+
+
+def build_timeline_page(machine_id, cursor, page_size):
+    rows = list(timeline_queryset(machine_id, cursor)[:page_size + 1])
+    events = [dict(zip(EVENT_FIELDS, row)) for row in rows[:page_size]]
+    for event in events:
+        # UNION в SQLite возвращает даты строками
+        if isinstance(event['date'], str):
+            event['date'] = datetime.date.fromisoformat(event['date'])
+    next_cursor = encode_cursor(events[-1]) if len(rows) > page_size else None
+    return events, next_cursor
+
+
+def get_timeline_page(machine_id, encoded_cursor, page_size):
+    """
+    Страница хронологии машины из кэша: события и курсор следующей страницы (None - страница последняя)
+    """
+    cursor = decode_cursor(encoded_cursor) if encoded_cursor else None
+    generations = get_generations(f'timeline:{machine_id}', 'references')
+    key = f'silant:timeline:{machine_id}:{":".join(map(str, generations))}:{page_size}:{encoded_cursor or ""}'
+    page = cache.get(key)
+    if page is None:
+        page = build_timeline_page(machine_id, cursor, page_size)
+        cache.set(key, page, TIMELINE_CACHE_TIMEOUT)
+    return page
+
+
+def invalidate_timelines(*machine_ids):
+    """
+    Сбрасывает хронологию машин - при изменении и удалении их ТО и рекламаций
+    """
+    bump_generation(*{f'timeline:{machine_id}' for machine_id in machine_ids if machine_id is not None})
@@ -0,0 +1,96 @@
+import time
+
+from asgiref.local import Local
+
+# Замеры текущего запроса. Local виден и в потоках, где под ASGI выполняются синхронные запросы к базе
+_current = Local()
+
+
+class RequestTimings:
+    """
+    Замеры одного запроса: SQL-запросы (время, текст), начало и конец работы представления и отрисовки шаблона
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.view_started = None
+        self.render_started = None
+        self.render_ended = None
+        self.queries = []
+
+    def view_start(self):
+        self.view_started = time.perf_counter()
+
+    def render_start(self):
+        self.render_started = time.perf_counter()
+
+    def render_end(self):
+        self.render_ended = time.perf_counter()
+
+    def summary(self):
+        """
+        Время (мс) всего запроса, представления, отрисовки и базы, количество SQL-запросов
+        """
+        ended = time.perf_counter()
+        view_ended = self.render_started or ended
+        return {
+            'total_ms': round((ended - self.started) * 1000, 1),
+            'view_ms': round((view_ended - self.view_started) * 1000, 1) if self.view_started else 0,
+            'render_ms': round((self.render_ended - self.render_started) * 1000, 1) if self.render_ended else 0,
+            'db_ms': round(sum(duration for duration, sql in self.queries) * 1000, 1),
+            'queries': len(self.queries),
+        }
+
+    def slowest_queries(self, count):
+        return [
+            {'ms': round(duration * 1000, 1), 'sql': sql}
+            for duration, sql in sorted(self.queries, key=lambda query: query[0], reverse=True)[:count]
+        ]
+
+
+def start_request_timings():
+    _current.timings = RequestTimings()
+    return _current.timings
+
+
+def stop_request_timings():
+    _current.timings = None
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Обертка выполнения SQL (execute_wrapper): время запроса записывается в замеры текущего запроса
+    """
+    timings = getattr(_current, 'timings', None)
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.queries.append((time.perf_counter() - started, sql))
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    """
+    Подключает record_query к каждому соединению с базой (сигнал connection_created)
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def view_name(request):
+    """
+    Имя представления запроса: MachineList, ClaimViewSet.list, machine_search
+    """
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return None
+    func = match.func
+    view_class = getattr(func, 'cls', None)  # ViewSet и APIView
+    if view_class is not None:
+        actions = getattr(func, 'actions', None)
+        action = actions.get(request.method.lower()) if actions else None
+        return f'{view_class.__name__}.{action}' if action else view_class.__name__
+    view_class = getattr(func, 'view_class', None)
+    return view_class.__name__ if view_class is not None else getattr(func, '__name__', match.view_name)
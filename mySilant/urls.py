@@ -6,25 +6,39 @@ router = DefaultRouter()
 router.register(r'machines', MachineViewSet)
 router.register(r'maintenance', MaintenanceViewSet)
 router.register(r'claims', ClaimViewSet)
+router.register(r'analytics/reliability', ReliabilityViewSet, basename='reliability')
 
 
 urlpatterns = [
     path('api/', include(router.urls)),
+    path('api/references/', ReferenceBundleView.as_view(), name='reference_bundle'),
+    path('api/autocomplete/<str:source>/', AutocompleteView.as_view(), name='autocomplete'),
+    path('api/async/machines/', MachineAsyncRead.as_view(), name='async_machine_list'),
+    path('api/async/machines/<int:pk>/', MachineAsyncRead.as_view(), name='async_machine_detail'),
+    path('api/async/maintenance/', MaintenanceAsyncRead.as_view(), name='async_maintenance_list'),
+    path('api/async/maintenance/<int:pk>/', MaintenanceAsyncRead.as_view(), name='async_maintenance_detail'),
+    path('api/async/claims/', ClaimAsyncRead.as_view(), name='async_claim_list'),
+    path('api/async/claims/<int:pk>/', ClaimAsyncRead.as_view(), name='async_claim_detail'),
     path('machines/', MachineList.as_view(), name='machine_list'),
+    path('machines/export/', MachineExport.as_view(), name='machine_export'),
     path('machines/<int:pk>', MachineDetail.as_view(), name='machine_detail'),
     path('machines/create/', MachineCreate.as_view(), name='maсhine_create'),
     path('machines/<int:pk>/edit/', MachineEdit.as_view(), name='machine_edit'),
     path('machines/<int:pk>/delete/', MachineDelete.as_view(), name='machine_delete'),
     path('maintenances/', MaintenanceList.as_view(), name='maintenance_list'),
+    path('maintenances/export/', MaintenanceExport.as_view(), name='maintenance_export'),
     path('maintenances/<int:pk>', MaintenanceDetail.as_view(), name='maintenance_detail'),
     path('maintenances/create/', MaintenanceCreate.as_view(), name='maintenance_create'),
     path('maintenances/<int:pk>/edit/', MaintenanceEdit.as_view(), name='maintenance_edit'),
     path('maintenances/<int:pk>/delete/', MaintenanceDelete.as_view(), name='maintenance_delete'),
     path('claims/', ClaimList.as_view(), name='claim_list'),
+    path('claims/export/', ClaimExport.as_view(), name='claim_export'),
     path('claims/<int:pk>', ClaimDetail.as_view(), name='claim_detail'),
     path('claims/create/', ClaimCreate.as_view(), name='claim_create'),
     path('claims/<int:pk>/edit/', ClaimEdit.as_view(), name='claim_edit'),
     path('claims/<int:pk>/delete/', ClaimDelete.as_view(), name='claim_delete'),
+    path('profiles/', ProfileList.as_view(), name='profile_list'),
+    path('profiles/<str:name>', ProfileDownload.as_view(), name='profile_download'),
     path('equipments/<int:pk>', EquipmentDetail.as_view(), name='equipment_detail'),
     path('engines/<int:pk>', EngineDetail.as_view(), name='engine_detail'),
     path('transmissions/<int:pk>', TransmissionDetail.as_view(), name='transmission_detail'),
@@ -1,61 +1,107 @@
 import requests
+from asgiref.sync import sync_to_async
 from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import APIException, NotFound, ValidationError
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.utils.urls import replace_query_param
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from rest_framework.permissions import IsAuthenticated, SAFE_METHODS
+from django.http import (
+    HttpResponse, JsonResponse, StreamingHttpResponse, HttpResponseBadRequest, FileResponse, Http404
+)
+from django.utils.cache import get_conditional_response, patch_cache_control
 from django.views.generic import (
-    ListView, DetailView, CreateView, UpdateView, DeleteView
+    View, ListView, DetailView, CreateView, UpdateView, DeleteView, TemplateView
 )
+from django.views.generic.list import MultipleObjectMixin
 from django.urls import reverse_lazy
-from django.contrib.auth.mixins import PermissionRequiredMixin
+from django.contrib.auth.mixins import PermissionRequiredMixin, UserPassesTestMixin
 
 from .models import (
     Machine, Maintenance, Claim, Client, ServiceCompany, Equipment, Engine, Transmission, DrivingAxle, SteeringAxle,
-    MaintenanceCompany, TypeMaintenance, RefusalNode, RecoveryMethod
+    MaintenanceCompany, TypeMaintenance, RefusalNode, RecoveryMethod, MAX_ID
 )
 from .filters import MachineFilter, MaintenanceFilter, ClaimFilter, MachinePreviewFilter
 from .forms import MachineForm, MaintenanceForm, ClaimForm
-from .serializers import MachineSerializer, MaintenanceSerializer, ClaimSerializer
+from .serializers import (
+    MachineSerializer, MachinePublicSerializer, MaintenanceSerializer, ClaimSerializer, RowSerializer
+)
 from .permissions import IsAdminOrManager, IsClient, IsServiceCompany, IsAdminOrManagerOrClientOrServiceCompany
+from .roles import get_request_role, scope_queryset
+from .fetch_plans import (
+    apply_fetch_plan, fieldset_fetch_plan, expand_fetch_plan, MACHINE_PREVIEW_PLAN, MACHINE_LIST_PLAN,
+    MACHINE_DETAIL_PLAN, MAINTENANCE_LIST_PLAN, MAINTENANCE_DETAIL_PLAN, CLAIM_LIST_PLAN, CLAIM_DETAIL_PLAN,
+    MACHINE_LINK_PLAN, MACHINE_API_PLAN, MACHINE_PUBLIC_API_PLAN, MAINTENANCE_API_PLAN, CLAIM_API_PLAN
+)
+from .exports import (
+    export_rows, EXPORT_FORMATS, MACHINE_EXPORT_COLUMNS, MAINTENANCE_EXPORT_COLUMNS, CLAIM_EXPORT_COLUMNS
+)
+from .analytics import get_reliability
+from .references import OWNER_REFERENCES, get_reference_bundle, has_owner_references
+from .list_cache import table_cache
+from .profiling import list_profiles, profile_path
+from .timeline import get_timeline_page, TIMELINE_PAGE_SIZE
+from .autocomplete import (
+    get_autocomplete_page, AUTOCOMPLETE_SOURCES, AUTOCOMPLETE_PAGE_SIZE, AUTOCOMPLETE_MAX_PAGE_SIZE
+)
+from .pagination import (
+    KeysetPagination, KeysetPaginationMixin, MachineKeysetPagination, MaintenanceKeysetPagination, ClaimKeysetPagination,
+    requested_page_size
+)
+
+
+# Ограничивает записи, доступные в представлении, ролью пользователя и применяет план выборки
+class RoleQuerysetMixin:
+    fetch_plan = None  # связанные объекты и поля, которые выводятся в шаблоне или сериализаторе
+
+    def get_queryset(self):
+        queryset = scope_queryset(super().get_queryset(), get_request_role(self.request))
+        return apply_fetch_plan(queryset, self.get_fetch_plan())
+
+    def get_fetch_plan(self, plan=None):
+        return self.fetch_plan if plan is None else plan
+
+
+# Ключ и время хранения отрисованной таблицы списка в кэше (тег cache в шаблоне)
+class TableCacheMixin:
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        page = context.get('page_obj')
+        context['table_cache_key'], context['table_cache_timeout'] = table_cache(
+            get_request_role(self.request), self.filterset, page.number if page else 1
+        )
+        return context
 
 
 # Вывод списка машин
-class MachineList(ListView):
+class MachineList(TableCacheMixin, ListView):
     model = Machine  # выводим информацию о машинах
     ordering = 'shipment_date'  # сортировка по дате создания
     template_name = 'machines.html'  # шаблон для вывода
     context_object_name = 'machines'  # имя списка, по которому будет обращение из html-шаблона
     paginate_by = 5  # количество машин на странице
+    fetch_plan = MACHINE_LIST_PLAN  # план выборки для таблицы машин
+    preview_fetch_plan = MACHINE_PREVIEW_PLAN  # план выборки для незарегистрированных пользователей
 
     # Переопределяем функцию получения списка машин
     def get_queryset(self):
         user = self.request.user
         if user.is_authenticated:
-            # Если пользователь зарегистрирован
-            clients = Client.objects.all()
-            companies = ServiceCompany.objects.all()
-            users_clients = []
-            users_companies = []
-            queryset = Machine.objects.none()
-            for client in clients:
-                users_clients.append(client.user_link)
-            for company in companies:
-                users_companies.append(company.user_link)
-            if user.is_superuser == 1 or user.is_staff == 1:  # если админ или менеджер - доступны все машины
-                queryset = super().get_queryset()
-            elif user in users_clients:  # если клиент - доступны соответствующие машины
-                queryset = Machine.objects.filter(client__user_link=user).order_by('shipment_date')
-            elif user in users_companies:  # если сервисная компания - доступны соответствующие машины
-                queryset = Machine.objects.filter(service_company__user_link=user).order_by('shipment_date')
+            # Если пользователь зарегистрирован - доступны машины согласно его роли
+            queryset = scope_queryset(super().get_queryset(), get_request_role(self.request))
+            queryset = apply_fetch_plan(queryset, self.fetch_plan)
             self.filterset = MachineFilter(self.request.GET, queryset)  # сохраняем фильтрацию в объекте класса
         else:
             # Если пользователь не зарегистрирован - ограниченный фильтр по всем машинам
-            if not self.request.GET.__contains__('number_machine'):
-                queryset = super().get_queryset()
-                queryset = Machine.objects.none()  # если в строке поиска пусто, то пустой queryset
+            if self.request.GET.get('number_machine'):
+                # если что-то есть в строке поиска, ищем по индексу номера, найденные машины - по порядку номеров
+                queryset = super().get_queryset().order_by('number_machine_normalized')
+                queryset = apply_fetch_plan(queryset, self.preview_fetch_plan)
             else:
-                if self.request.GET.get('number_machine') != '':
-                    queryset = super().get_queryset()  # если что-то есть в строке поиска, получаем обычный запрос
-                else:
-                    queryset = super().get_queryset()
-                    queryset = Machine.objects.none()  # если отправлен пустой запрос, то пустой queryset
+                queryset = Machine.objects.none()  # если в строке поиска пусто, то пустой queryset
             self.filterset = MachinePreviewFilter(self.request.GET, queryset)  # сохраняем фильтрацию в объекте класса
         return self.filterset.qs  # возвращаем отфильтрованный список машин
 
@@ -65,34 +111,40 @@ class MachineList(ListView):
         return context
 
 
+# Потоковая выгрузка списка в CSV или JSONL (?format=csv|jsonl) с учетом роли и фильтров списка
+class ExportView(PermissionRequiredMixin, RoleQuerysetMixin, MultipleObjectMixin, View):
+    filterset_class = None
+    columns = None  # колонки выгрузки: имя -> поле запроса
+    filename = None
+
+    def get(self, request, *args, **kwargs):
+        export_format = request.GET.get('format', 'csv')
+        if export_format not in EXPORT_FORMATS:
+            return HttpResponseBadRequest('Формат выгрузки: csv или jsonl')
+        stream, content_type, extension = EXPORT_FORMATS[export_format]
+        queryset = self.filterset_class(request.GET, self.get_queryset()).qs
+        response = StreamingHttpResponse(stream(export_rows(queryset, self.columns), self.columns),
+                                         content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{self.filename}.{extension}"'
+        return response
+
+
+# Выгрузка списка машин
+class MachineExport(ExportView):
+    permission_required = 'mySilant.view_machine'  # должны быть права на просмотр
+    queryset = Machine.objects.order_by('shipment_date', 'id')
+    filterset_class = MachineFilter
+    columns = MACHINE_EXPORT_COLUMNS
+    filename = 'machines'
+
+
 # Подробности по каждой машине
-class MachineDetail(PermissionRequiredMixin, DetailView):
+class MachineDetail(PermissionRequiredMixin, RoleQuerysetMixin, DetailView):
     permission_required = 'mySilant.view_machine'  # должны быть права на просмотр
     model = Machine  # выводим машины
     template_name = 'machine.html'  # шаблон для вывода
     context_object_name = 'machine'  # имя списка, по которому будет обращение из html-шаблона
-
-    def get_queryset(self):
-        user = self.request.user
-        clients = Client.objects.all()
-        companies = ServiceCompany.objects.all()
-        users_clients = []
-        users_companies = []
-        queryset = Machine.objects.none()
-        for client in clients:
-            users_clients.append(client.user_link)
-        for company in companies:
-            users_companies.append(company.user_link)
-        if user.is_superuser == 1 or user.is_staff == 1:
-            # Если админ или менеджер - доступны все машины
-            queryset = super().get_queryset()
-        elif user in users_clients:
-            # Если клиент - доступны соответствующие машины
-            queryset = Machine.objects.filter(client__user_link=user)
-        elif user in users_companies:
-            # Если сервисная компания - доступны соответствующие машины
-            queryset = Machine.objects.filter(service_company__user_link=user)
-        return queryset
+    fetch_plan = MACHINE_DETAIL_PLAN
 
 
 # Создание записи о новой машине с проверкой прав
@@ -122,35 +174,18 @@ class MachineDelete(PermissionRequiredMixin, DeleteView):
 
 
 # Вывод списка ТО с проверкой прав
-class MaintenanceList(PermissionRequiredMixin, ListView):
+class MaintenanceList(PermissionRequiredMixin, RoleQuerysetMixin, TableCacheMixin, ListView):
     permission_required = 'mySilant.view_maintenance'  # должны быть права на просмотр
     model = Maintenance  # выводим информацию о ТО
     ordering = 'maintenance_date'  # сортировка по дате создания
     template_name = 'maintenances.html'  # шаблон для вывода
     context_object_name = 'maintenances'  # имя списка, по которому будет обращение из html-шаблона
     paginate_by = 15  # количество ТО на странице
+    fetch_plan = MAINTENANCE_LIST_PLAN
 
     # Переопределяем функцию получения списка ТО
     def get_queryset(self):
-        user = self.request.user
-        clients = Client.objects.all()
-        companies = ServiceCompany.objects.all()
-        users_clients = []
-        users_companies = []
-        queryset = Maintenance.objects.none()
-        for client in clients:
-            users_clients.append(client.user_link)
-        for company in companies:
-            users_companies.append(company.user_link)
-        if user.is_superuser == 1 or user.is_staff == 1:
-            # Если админ или менеджер - доступны все ТО
-            queryset = super().get_queryset()
-        elif user in users_clients:
-            # Если клиент - доступны соответствующие ТО
-            queryset = Maintenance.objects.filter(machine__client__user_link=user).order_by('maintenance_date')
-        elif user in users_companies:
-            # Если сервисная компания - доступны соответствующие ТО
-            queryset = Maintenance.objects.filter(service_company__user_link=user).order_by('maintenance_date')
+        queryset = super().get_queryset()  # записи, доступные роли пользователя
         self.filterset = MaintenanceFilter(self.request.GET, queryset)  # сохраняем фильтрацию в объекте класса
         return self.filterset.qs  # возвращаем отфильтрованный список машин
 
@@ -160,35 +195,22 @@ class MaintenanceList(PermissionRequiredMixin, ListView):
         return context
 
 
+# Выгрузка списка ТО
+class MaintenanceExport(ExportView):
+    permission_required = 'mySilant.view_maintenance'  # должны быть права на просмотр
+    queryset = Maintenance.objects.order_by('maintenance_date', 'id')
+    filterset_class = MaintenanceFilter
+    columns = MAINTENANCE_EXPORT_COLUMNS
+    filename = 'maintenances'
+
+
 # Подробности по каждому ТО с проверкой прав
-class MaintenanceDetail(PermissionRequiredMixin, DetailView):
+class MaintenanceDetail(PermissionRequiredMixin, RoleQuerysetMixin, DetailView):
     permission_required = 'mySilant.view_maintenance'  # должны быть права на просмотр
     model = Maintenance  # выводим ТО
     template_name = 'maintenance.html'  # шаблон для вывода
     context_object_name = 'maintenance'  # имя списка, по которому будет обращение из html-шаблона
-
-    # Переопределяем функцию получения данных о ТО
-    def get_queryset(self):
-        user = self.request.user
-        clients = Client.objects.all()
-        companies = ServiceCompany.objects.all()
-        users_clients = []
-        users_companies = []
-        queryset = Maintenance.objects.none()
-        for client in clients:
-            users_clients.append(client.user_link)
-        for company in companies:
-            users_companies.append(company.user_link)
-        if user.is_superuser == 1 or user.is_staff == 1:
-            # Если админ или менеджер - доступны все ТО
-            queryset = super().get_queryset()
-        elif user in users_clients:
-            # Если клиент - доступны соответствующие ТО
-            queryset = Maintenance.objects.filter(machine__client__user_link=user)
-        elif user in users_companies:
-            # Если сервисная компания - доступны соответствующие ТО
-            queryset = Maintenance.objects.filter(service_company__user_link=user)
-        return queryset
+    fetch_plan = MAINTENANCE_DETAIL_PLAN
 
 
 # Создание записи о новом ТО с проверкой прав
@@ -209,36 +231,13 @@ class MaintenanceCreate(PermissionRequiredMixin, CreateView):
 
 
 # Редактирование записи о ТО с проверкой прав
-class MaintenanceEdit(PermissionRequiredMixin, UpdateView):
+class MaintenanceEdit(PermissionRequiredMixin, RoleQuerysetMixin, UpdateView):
     permission_required = 'mySilant.change_maintenance'  # должны быть права на редактирование записи
     form_class = MaintenanceForm
     model = Maintenance
     template_name = 'maintenance_edit.html'  # шаблон для вывода
     success_url = reverse_lazy('maintenance_list')  # после редактирования записи возвращаемся на страницу с перечнем
 
-    # Переопределяем функцию получения данных о ТО
-    def get_queryset(self):
-        user = self.request.user
-        clients = Client.objects.all()
-        companies = ServiceCompany.objects.all()
-        users_clients = []
-        users_companies = []
-        queryset = Maintenance.objects.none()
-        for client in clients:
-            users_clients.append(client.user_link)
-        for company in companies:
-            users_companies.append(company.user_link)
-        if user.is_superuser == 1 or user.is_staff == 1:
-            # Если админ или менеджер - доступны все ТО
-            queryset = super().get_queryset()
-        elif user in users_clients:
-            # Если клиент - доступны соответствующие ТО
-            queryset = Maintenance.objects.filter(machine__client__user_link=user)
-        elif user in users_companies:
-            # Если сервисная компания - доступны соответствующие ТО
-            queryset = Maintenance.objects.filter(service_company__user_link=user)
-        return queryset
-
     def get_form_kwargs(self):
         kwargs = super().get_form_kwargs()
         # Добавляем текущего пользователя, чтобы в init класса формы выводить только машины этого пользователя
@@ -249,66 +248,27 @@ class MaintenanceEdit(PermissionRequiredMixin, UpdateView):
 
 
 # Удаление записи о ТО с проверкой прав
-class MaintenanceDelete(PermissionRequiredMixin, DeleteView):
+class MaintenanceDelete(PermissionRequiredMixin, RoleQuerysetMixin, DeleteView):
     permission_required = 'mySilant.delete_maintenance'  # должны быть права на удаление записи
     model = Maintenance
     template_name = 'maintenance_delete.html'  # шаблон для вывода
     success_url = reverse_lazy('maintenance_list')  # после удаления записи возвращаемся на страницу с перечнем
-
-    # Переопределяем функцию получения данных о ТО
-    def get_queryset(self):
-        user = self.request.user
-        clients = Client.objects.all()
-        companies = ServiceCompany.objects.all()
-        users_clients = []
-        users_companies = []
-        queryset = Maintenance.objects.none()
-        for client in clients:
-            users_clients.append(client.user_link)
-        for company in companies:
-            users_companies.append(company.user_link)
-        if user.is_superuser == 1 or user.is_staff == 1:
-            # Если админ или менеджер - доступны все ТО
-            queryset = super().get_queryset()
-        elif user in users_clients:
-            # Если клиент - доступны соответствующие ТО
-            queryset = Maintenance.objects.filter(machine__client__user_link=user)
-        elif user in users_companies:
-            # Если сервисная компания - доступны соответствующие ТО
-            queryset = Maintenance.objects.filter(service_company__user_link=user)
-        return queryset
+    fetch_plan = MACHINE_LINK_PLAN
 
 
 # Вывод списка рекламаций с проверкой прав
-class ClaimList(PermissionRequiredMixin, ListView):
+class ClaimList(PermissionRequiredMixin, RoleQuerysetMixin, TableCacheMixin, ListView):
     permission_required = 'mySilant.view_claim'  # должны быть права на просмотр
     model = Claim  # выводим информацию о рекламациях
     ordering = 'refusal_date'  # сортировка по дате отказа
     template_name = 'claims.html'  # шаблон для вывода
     context_object_name = 'claims'  # имя списка, по которому будет обращение из html-шаблона
     paginate_by = 10  # количество рекламаций на странице
+    fetch_plan = CLAIM_LIST_PLAN
 
     # Переопределяем функцию получения списка рекламаций
     def get_queryset(self):
-        user = self.request.user
-        clients = Client.objects.all()
-        companies = ServiceCompany.objects.all()
-        users_clients = []
-        users_companies = []
-        queryset = Claim.objects.none()
-        for client in clients:
-            users_clients.append(client.user_link)
-        for company in companies:
-            users_companies.append(company.user_link)
-        if user.is_superuser == 1 or user.is_staff == 1:
-            # Если админ или менеджер - доступны все рекламации
-            queryset = super().get_queryset()
-        elif user in users_clients:
-            # Если клиент - доступны рекламации на машины этого клиента
-            queryset = Claim.objects.filter(machine__client__user_link=user).order_by('refusal_date')
-        elif user in users_companies:
-            # Если сервисная компания - доступны соответствующие рекламации
-            queryset = Claim.objects.filter(service_company__user_link=user).order_by('refusal_date')
+        queryset = super().get_queryset()  # записи, доступные роли пользователя
         self.filterset = ClaimFilter(self.request.GET, queryset)  # сохраняем фильтрацию в объекте класса
         return self.filterset.qs  # возвращаем отфильтрованный список рекламаций
 
@@ -318,35 +278,22 @@ class ClaimList(PermissionRequiredMixin, ListView):
         return context
 
 
+# Выгрузка списка рекламаций
+class ClaimExport(ExportView):
+    permission_required = 'mySilant.view_claim'  # должны быть права на просмотр
+    queryset = Claim.objects.order_by('refusal_date', 'id')
+    filterset_class = ClaimFilter
+    columns = CLAIM_EXPORT_COLUMNS
+    filename = 'claims'
+
+
 # Подробности по каждой рекламации
-class ClaimDetail(PermissionRequiredMixin, DetailView):
+class ClaimDetail(PermissionRequiredMixin, RoleQuerysetMixin, DetailView):
     permission_required = 'mySilant.view_claim'  # должны быть права на просмотр
     model = Claim  # выводим рекламации
     template_name = 'claim.html'  # шаблон для вывода
     context_object_name = 'claim'  # имя списка, по которому будет обращение из html-шаблона
-
-    # Переопределяем функцию получения данных о рекламации
-    def get_queryset(self):
-        user = self.request.user
-        clients = Client.objects.all()
-        companies = ServiceCompany.objects.all()
-        users_clients = []
-        users_companies = []
-        queryset = Claim.objects.none()
-        for client in clients:
-            users_clients.append(client.user_link)
-        for company in companies:
-            users_companies.append(company.user_link)
-        if user.is_superuser == 1 or user.is_staff == 1:
-            # Если админ или менеджер - доступны все рекламации
-            queryset = super().get_queryset()
-        elif user in users_clients:
-            # Если клиент - доступны рекламации на машины этого клиента
-            queryset = Claim.objects.filter(machine__client__user_link=user)
-        elif user in users_companies:
-            # Если сервисная компания - доступны соответствующие рекламации
-            queryset = Claim.objects.filter(service_company__user_link=user)
-        return queryset
+    fetch_plan = CLAIM_DETAIL_PLAN
 
 
 # Создание записи о новой рекламации с проверкой прав
@@ -367,36 +314,13 @@ class ClaimCreate(PermissionRequiredMixin, CreateView):
 
 
 # Редактирование записи о рекламации с проверкой прав
-class ClaimEdit(PermissionRequiredMixin, UpdateView):
+class ClaimEdit(PermissionRequiredMixin, RoleQuerysetMixin, UpdateView):
     permission_required = 'mySilant.change_claim'  # должны быть права на редактирование записи
     form_class = ClaimForm
     model = Claim
     template_name = 'claim_edit.html'  # шаблон для вывода
     success_url = reverse_lazy('claim_list')  # после редактирования записи возвращаемся на страницу с перечнем
 
-    # Переопределяем функцию получения данных о рекламации
-    def get_queryset(self):
-        user = self.request.user
-        clients = Client.objects.all()
-        companies = ServiceCompany.objects.all()
-        users_clients = []
-        users_companies = []
-        queryset = Claim.objects.none()
-        for client in clients:
-            users_clients.append(client.user_link)
-        for company in companies:
-            users_companies.append(company.user_link)
-        if user.is_superuser == 1 or user.is_staff == 1:
-            # Если админ или менеджер - доступны все рекламации
-            queryset = super().get_queryset()
-        elif user in users_clients:
-            # Если клиент - доступны рекламации на машины этого клиента
-            queryset = Claim.objects.filter(machine__client__user_link=user)
-        elif user in users_companies:
-            # Если сервисная компания - доступны соответствующие рекламации
-            queryset = Claim.objects.filter(service_company__user_link=user)
-        return queryset
-
     def get_form_kwargs(self):
         kwargs = super().get_form_kwargs()
         # Добавляем текущего пользователя, чтобы в init класса формы выводить только машины этого пользователя
@@ -407,34 +331,12 @@ class ClaimEdit(PermissionRequiredMixin, UpdateView):
 
 
 # Удаление записи о рекламации с проверкой прав
-class ClaimDelete(PermissionRequiredMixin, DeleteView):
+class ClaimDelete(PermissionRequiredMixin, RoleQuerysetMixin, DeleteView):
     permission_required = 'mySilant.delete_claim'  # должны быть права на удаление записи
     model = Claim
     template_name = 'claim_delete.html'  # шаблон для вывода
     success_url = reverse_lazy('claim_list')  # после удаления записи возвращаемся на страницу с перечнем
-
-    # Переопределяем функцию получения данных о рекламации
-    def get_queryset(self):
-        user = self.request.user
-        clients = Client.objects.all()
-        companies = ServiceCompany.objects.all()
-        users_clients = []
-        users_companies = []
-        queryset = Claim.objects.none()
-        for client in clients:
-            users_clients.append(client.user_link)
-        for company in companies:
-            users_companies.append(company.user_link)
-        if user.is_superuser == 1 or user.is_staff == 1:
-            # Если админ или менеджер - доступны все рекламации
-            queryset = super().get_queryset()
-        elif user in users_clients:
-            # Если клиент - доступны рекламации на машины этого клиента
-            queryset = Claim.objects.filter(machine__client__user_link=user)
-        elif user in users_companies:
-            # Если сервисная компания - доступны соответствующие рекламации
-            queryset = Claim.objects.filter(service_company__user_link=user)
-        return queryset
+    fetch_plan = MACHINE_LINK_PLAN
 
 
 # Справочное описание модели техники
@@ -525,76 +427,144 @@ class RecoveryMethodDetail(PermissionRequiredMixin, DetailView):
     context_object_name = 'reference'  # имя списка, по которому будет обращение из html-шаблона
 
 
-class MachineViewSet(viewsets.ModelViewSet):
-    queryset = Machine.objects.all()
+# Чтение API: выбор полей (?fields=number_machine,shipment_date или ?omit=options), развертывание связанных
+# объектов (?expand=model_engine,client) и быстрый вывод списков
+class ApiReadMixin:
+    fields_query_param = 'fields'
+    omit_query_param = 'omit'
+    expand_query_param = 'expand'
+
+    def get_query_names(self, param):
+        # Имена полей из параметра запроса через запятую. Только для чтения: при изменении записи
+        # сериализатор принимает и выводит все поля
+        if self.request.method not in SAFE_METHODS:
+            return ()
+        value = self.request.query_params.get(param, '')
+        return tuple(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+
+    def get_fieldset(self):
+        """
+        Выводимые поля по ?fields= и ?omit= в порядке сериализатора; None - все поля
+        """
+        if not hasattr(self, '_fieldset'):
+            available = self.get_serializer_class().Meta.fields
+            fields, omit = self.get_query_names(self.fields_query_param), self.get_query_names(self.omit_query_param)
+            for param, names in ((self.fields_query_param, fields), (self.omit_query_param, omit)):
+                unknown = [name for name in names if name not in available]
+                if unknown:
+                    raise ValidationError({param: f'Неизвестные поля: {", ".join(unknown)}'})
+            self._fieldset = None
+            if fields or omit:
+                fields = fields or available
+                self._fieldset = tuple(name for name in available if name in fields and name not in omit)
+        return self._fieldset
+
+    def get_expand(self):
+        """
+        Поля, которые нужно развернуть во вложенные объекты (из тех, что выводятся)
+        """
+        if not hasattr(self, '_expand'):
+            names = self.get_query_names(self.expand_query_param)
+            unknown = [name for name in names if name not in self.get_serializer_class().expandable_fields]
+            if unknown:
+                raise ValidationError({self.expand_query_param: f'Нельзя развернуть поля: {", ".join(unknown)}'})
+            fieldset = self.get_fieldset()
+            self._expand = tuple(name for name in names if fieldset is None or name in fieldset)
+        return self._expand
+
+    def get_fetch_plan(self, plan=None):
+        # Из базы читаются только выводимые поля (и поле сортировки для курсора), развернутые объекты
+        # загружаются тем же запросом, что и страница
+        plan = self.fetch_plan if plan is None else plan
+        keep = (getattr(self.paginator, 'ordering_field', None),)
+        plan = fieldset_fetch_plan(plan, self.get_fieldset(), keep)
+        return expand_fetch_plan(plan, self.get_serializer_class(), self.get_expand())
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['fieldset'] = self.get_fieldset()
+        context['expand'] = self.get_expand()
+        return context
+
+    def list(self, request, *args, **kwargs):
+        # Список только читается - строки собираются быстрым выводом, а не ModelSerializer
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        rows = RowSerializer(self.get_serializer()).many(queryset if page is None else page)
+        if page is not None:
+            return self.get_paginated_response(rows)
+        return Response(rows)
+
+
+class MachineViewSet(KeysetPaginationMixin, ApiReadMixin, viewsets.ModelViewSet):
+    queryset = Machine.objects.order_by('shipment_date')
     serializer_class = MachineSerializer
+    keyset_pagination_class = MachineKeysetPagination  # ?pagination=cursor
+    fetch_plan = MACHINE_API_PLAN
+    preview_fetch_plan = MACHINE_PUBLIC_API_PLAN
 
     def get_queryset(self):
         user = self.request.user
         if user.is_authenticated:
-            # Если пользователь зарегистрирован
-            clients = Client.objects.all()
-            companies = ServiceCompany.objects.all()
-            users_clients = []
-            users_companies = []
-            queryset = Machine.objects.none()
-            for client in clients:
-                users_clients.append(client.user_link)
-            for company in companies:
-                users_companies.append(company.user_link)
-            if user.is_superuser == 1 or user.is_staff == 1:  # если админ или менеджер - доступны все машины
-                queryset = super().get_queryset()
-            elif user in users_clients:  # если клиент - доступны соответствующие машины
-                queryset = Machine.objects.filter(client__user_link=user).order_by('shipment_date')
-            elif user in users_companies:  # если сервисная компания - доступны соответствующие машины
-                queryset = Machine.objects.filter(service_company__user_link=user).order_by('shipment_date')
+            # Если пользователь зарегистрирован - доступны машины согласно его роли
+            queryset = scope_queryset(super().get_queryset(), get_request_role(self.request))
+            queryset = apply_fetch_plan(queryset, self.get_fetch_plan())
             self.filterset = MachineFilter(self.request.GET, queryset)  # сохраняем фильтрацию в объекте класса
         else:
             # Если пользователь не зарегистрирован - ограниченный фильтр по всем машинам
-            if not self.request.GET.__contains__('number_machine'):
-                queryset = super().get_queryset()
-                queryset = Machine.objects.none()  # если в строке поиска пусто, то пустой queryset
+            if self.request.GET.get('number_machine'):
+                # если что-то есть в строке поиска, ищем по индексу номера, найденные машины - по порядку номеров
+                queryset = super().get_queryset().order_by('number_machine_normalized')
+                queryset = apply_fetch_plan(queryset, self.get_fetch_plan(self.preview_fetch_plan))
             else:
-                if self.request.GET.get('number_machine') != '':
-                    queryset = super().get_queryset()  # если что-то есть в строке поиска, получаем обычный запрос
-                else:
-                    queryset = super().get_queryset()
-                    queryset = Machine.objects.none()  # если отправлен пустой запрос, то пустой queryset
+                queryset = Machine.objects.none()  # если в строке поиска пусто, то пустой queryset
             self.filterset = MachinePreviewFilter(self.request.GET, queryset)  # сохраняем фильтрацию в объекте класса
         return self.filterset.qs  # возвращаем отфильтрованный список машин
 
+    def get_serializer_class(self):
+        # Незарегистрированным пользователям - только технические характеристики
+        if not self.request.user.is_authenticated:
+            return MachinePublicSerializer
+        return super().get_serializer_class()
+
     def get_permissions(self):
-        if self.action in ['list', 'retrieve']:
+        if self.action in ['list', 'retrieve', 'timeline']:
             return [IsAdminOrManagerOrClientOrServiceCompany()]
         else:
             return [IsAdminOrManager()]
 
-
-
-class MaintenanceViewSet(viewsets.ModelViewSet):
-    queryset = Maintenance.objects.all()
+    # Хронология машины: ТО и рекламации в порядке дат, постранично по курсору (?cursor=, ?page_size=)
+    @action(detail=True)
+    def timeline(self, request, pk=None):
+        # id из адреса проверяется до запроса к базе
+        try:
+            pk = int(pk)
+        except (TypeError, ValueError):
+            raise NotFound()
+        if not 0 < pk <= MAX_ID:
+            raise NotFound()
+        machines = scope_queryset(Machine.objects.filter(pk=pk), get_request_role(request))
+        if not machines.exists():
+            raise NotFound()
+        page_size = requested_page_size(request, TIMELINE_PAGE_SIZE, KeysetPagination.max_page_size)
+        try:
+            events, next_cursor = get_timeline_page(pk, request.query_params.get('cursor'), page_size)
+        except ValueError as error:
+            raise NotFound(str(error))
+        next_url = None
+        if next_cursor is not None:
+            next_url = replace_query_param(request.build_absolute_uri(), 'cursor', next_cursor)
+        return Response({'machine': pk, 'next': next_url, 'results': events})
+
+
+class MaintenanceViewSet(KeysetPaginationMixin, ApiReadMixin, RoleQuerysetMixin, viewsets.ModelViewSet):
+    queryset = Maintenance.objects.order_by('maintenance_date')
     serializer_class = MaintenanceSerializer
+    keyset_pagination_class = MaintenanceKeysetPagination  # ?pagination=cursor
+    fetch_plan = MAINTENANCE_API_PLAN
 
     def get_queryset(self):
-        user = self.request.user
-        clients = Client.objects.all()
-        companies = ServiceCompany.objects.all()
-        users_clients = []
-        users_companies = []
-        queryset = Maintenance.objects.none()
-        for client in clients:
-            users_clients.append(client.user_link)
-        for company in companies:
-            users_companies.append(company.user_link)
-        if user.is_superuser == 1 or user.is_staff == 1:
-            # Если админ или менеджер - доступны все ТО
-            queryset = super().get_queryset()
-        elif user in users_clients:
-            # Если клиент - доступны соответствующие ТО
-            queryset = Maintenance.objects.filter(machine__client__user_link=user).order_by('maintenance_date')
-        elif user in users_companies:
-            # Если сервисная компания - доступны соответствующие ТО
-            queryset = Maintenance.objects.filter(service_company__user_link=user).order_by('maintenance_date')
+        queryset = super().get_queryset()  # записи, доступные роли пользователя
         self.filterset = MaintenanceFilter(self.request.GET, queryset)  # сохраняем фильтрацию в объекте класса
         return self.filterset.qs  # возвращаем отфильтрованный список машин
 
@@ -605,30 +575,14 @@ class MaintenanceViewSet(viewsets.ModelViewSet):
             return [IsAdminOrManager()]
 
 
-class ClaimViewSet(viewsets.ModelViewSet):
-    queryset = Claim.objects.all()
+class ClaimViewSet(KeysetPaginationMixin, ApiReadMixin, RoleQuerysetMixin, viewsets.ModelViewSet):
+    queryset = Claim.objects.order_by('refusal_date')
     serializer_class = ClaimSerializer
+    keyset_pagination_class = ClaimKeysetPagination  # ?pagination=cursor
+    fetch_plan = CLAIM_API_PLAN
 
     def get_queryset(self):
-        user = self.request.user
-        clients = Client.objects.all()
-        companies = ServiceCompany.objects.all()
-        users_clients = []
-        users_companies = []
-        queryset = Claim.objects.none()
-        for client in clients:
-            users_clients.append(client.user_link)
-        for company in companies:
-            users_companies.append(company.user_link)
-        if user.is_superuser == 1 or user.is_staff == 1:
-            # Если админ или менеджер - доступны все рекламации
-            queryset = super().get_queryset()
-        elif user in users_clients:
-            # Если клиент - доступны рекламации на машины этого клиента
-            queryset = Claim.objects.filter(machine__client__user_link=user).order_by('refusal_date')
-        elif user in users_companies:
-            # Если сервисная компания - доступны соответствующие рекламации
-            queryset = Claim.objects.filter(service_company__user_link=user).order_by('refusal_date')
+        queryset = super().get_queryset()  # записи, доступные роли пользователя
         self.filterset = ClaimFilter(self.request.GET, queryset)  # сохраняем фильтрацию в объекте класса
         return self.filterset.qs  # возвращаем отфильтрованный список рекламаций
 
@@ -637,3 +591,129 @@ class ClaimViewSet(viewsets.ModelViewSet):
             return [IsAdminOrManagerOrClientOrServiceCompany()]
         else:
             return [IsAdminOrManager()]
+
+
+# Аналитика надежности по моделям узлов и узлам отказа - только чтение, в рамках роли, как рекламации
+class ReliabilityViewSet(viewsets.ViewSet):
+
+    def list(self, request):
+        return Response(get_reliability(get_request_role(request)))
+
+    def get_permissions(self):
+        return [IsAdminOrManagerOrClientOrServiceCompany()]
+
+
+# Все справочники одним ответом (клиенты и сервисные компании - только администраторам и менеджерам).
+# ETag - версия содержимого: если у клиента та же версия, отвечаем 304 без тела
+class ReferenceBundleView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        version, body = get_reference_bundle(get_request_role(request))
+        etag = f'"{version}"'
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = HttpResponse(body, content_type='application/json')
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)  # клиент хранит набор, но проверяет версию
+        return response
+
+
+# Подсказки для полей форм (машина, справочники): варианты по введенному тексту постранично, машины - в пределах
+# роли пользователя. Форма выводит только выбранное значение, а варианты запрашивает виджет AutocompleteSelect
+class AutocompleteView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, source):
+        role = get_request_role(request)
+        if source not in AUTOCOMPLETE_SOURCES or source in OWNER_REFERENCES and not has_owner_references(role):
+            raise NotFound()
+        source = AUTOCOMPLETE_SOURCES[source]
+        page_size = requested_page_size(request, AUTOCOMPLETE_PAGE_SIZE, AUTOCOMPLETE_MAX_PAGE_SIZE)
+        text = request.query_params.get('q', '').strip()
+        try:
+            results, next_cursor = get_autocomplete_page(
+                source, role, text, request.query_params.get('cursor'), page_size
+            )
+        except ValueError as error:
+            raise NotFound(str(error))
+        next_url = None
+        if next_cursor is not None:
+            next_url = replace_query_param(request.build_absolute_uri(), 'cursor', next_cursor)
+        return Response({'next': next_url, 'results': results})
+
+
+# Асинхронное чтение API (ASGI): список и запись ViewSet'а. Права, роль, фильтры, план выборки, сериализатор
+# и постраничный вывод - те же, что у ViewSet'а, но записи читаются асинхронным ORM и не занимают поток.
+# Изменение записей - через синхронные ViewSet'ы
+class AsyncReadView(View):
+    viewset_class = None
+
+    async def get(self, request, pk=None):
+        action = 'list' if pk is None else 'retrieve'
+        viewset = self.viewset_class(
+            action_map={'get': action}, args=(), kwargs={} if pk is None else {'pk': pk}, format_kwarg=None
+        )
+        viewset.request = viewset.initialize_request(request)
+        try:
+            queryset, serializer_class = await sync_to_async(self.prepare)(viewset)
+            context = viewset.get_serializer_context()
+            if pk is None:
+                paginator = viewset.paginator
+                page = await paginator.apaginate_queryset(queryset, viewset.request, view=viewset)
+                rows = RowSerializer(serializer_class(context=context)).many(page)
+                data = paginator.get_paginated_response(rows).data
+            else:
+                if pk > MAX_ID:  # <int:pk> пропускает любое число, а id в базе не больше MAX_ID
+                    raise NotFound()
+                instance = await queryset.filter(pk=pk).afirst()
+                if instance is None:
+                    raise NotFound()
+                data = serializer_class(instance, context=context).data
+        except APIException as exc:
+            return JsonResponse({'detail': exc.detail}, status=exc.status_code)
+        return JsonResponse(data, encoder=JSONEncoder, json_dumps_params={'ensure_ascii': False})
+
+    @staticmethod
+    def prepare(viewset):
+        # Синхронная часть: пользователь из сессии, роль, проверка прав и построение (ленивого) queryset
+        viewset.check_permissions(viewset.request)
+        return viewset.filter_queryset(viewset.get_queryset()), viewset.get_serializer_class()
+
+
+class MachineAsyncRead(AsyncReadView):
+    viewset_class = MachineViewSet
+
+
+class MaintenanceAsyncRead(AsyncReadView):
+    viewset_class = MaintenanceViewSet
+
+
+class ClaimAsyncRead(AsyncReadView):
+    viewset_class = ClaimViewSet
+
+
+# Снимки профилирования запросов (ProfilingMiddleware) - только для сотрудников
+class StaffRequiredMixin(UserPassesTestMixin):
+    def test_func(self):
+        return self.request.user.is_staff
+
+
+# Список последних снимков
+class ProfileList(StaffRequiredMixin, TemplateView):
+    template_name = 'profiles.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['profiles'] = list_profiles()
+        return context
+
+
+# Скачивание снимка: <имя> - профиль cProfile (.prof, для pstats и snakeviz), <имя>?format=json - описание
+class ProfileDownload(StaffRequiredMixin, View):
+    def get(self, request, name):
+        suffix = '.json' if request.GET.get('format') == 'json' else '.prof'
+        path = profile_path(name, suffix)
+        if path is None:
+            raise Http404('Снимок не найден')
+        return FileResponse(open(path, 'rb'), as_attachment=True, filename=path.name)
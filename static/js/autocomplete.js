@@ -0,0 +1,48 @@
+// Поля с подсказками (виджет AutocompleteSelect): варианты запрашиваются по мере ввода текста,
+// в скрытое поле формы записывается id выбранного варианта
+document.addEventListener('DOMContentLoaded', function () {
+    document.querySelectorAll('input[data-autocomplete]').forEach(function (input) {
+        var target = document.getElementById(input.dataset.target);
+        var list = document.getElementById(input.getAttribute('list'));
+        var options = {};  // подпись -> id показанных вариантов
+        var timer = null;
+
+        if (input.dataset.value) {
+            options[input.value] = input.dataset.value;
+        }
+
+        function select() {
+            target.value = Object.prototype.hasOwnProperty.call(options, input.value) ? options[input.value] : '';
+        }
+
+        function load() {
+            var url = new URL(input.dataset.autocomplete, window.location.href);
+            url.searchParams.set('q', input.value);
+            fetch(url, {credentials: 'same-origin', headers: {'Accept': 'application/json'}})
+                .then(function (response) {
+                    return response.ok ? response.json() : {results: []};
+                })
+                .then(function (data) {
+                    list.innerHTML = '';
+                    data.results.forEach(function (item) {
+                        options[item.text] = item.id;
+                        var option = document.createElement('option');
+                        option.value = item.text;
+                        list.appendChild(option);
+                    });
+                    select();
+                });
+        }
+
+        input.addEventListener('input', function () {
+            select();
+            clearTimeout(timer);
+            timer = setTimeout(load, 250);
+        });
+        input.addEventListener('focus', function () {
+            if (!list.children.length) {
+                load();
+            }
+        });
+    });
+});